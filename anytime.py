@@ -0,0 +1,161 @@
+'''
+ Copyright (C) 2020 Cristian Ioan Vasile <cvasile@lehigh.edu>
+ Explainable Robotics Lab (ERL), Autonomous and Intelligent Robotics (AIR) Lab,
+ Lehigh University
+ See license.txt file for license information.
+'''
+
+import logging
+import threading
+try:
+    from queue import Queue
+except ImportError: # Python 2
+    from Queue import Queue
+
+import numpy as np
+
+from gurobipy import GRB
+
+from route_planning import build_model, optimize, log_status
+from solution import PlanSolution
+
+
+def incumbent_callback(on_incumbent, cancel=None):
+    '''Returns a Gurobi callback that decodes each improving incumbent found by
+    the solver into a `PlanSolution`, and passes it to `on_incumbent`. The
+    optimization is terminated if the event `cancel` is set, or if
+    `on_incumbent` returns True.
+
+    Note
+    ----
+    The values of the state and transition variables, and of the robustness
+    variable are retrieved with a single `cbGetSolution` call per incumbent.
+    The registry of planning variables is `model._variables`.
+    '''
+    state = {'objective': None}
+
+    def callback(model, where):
+        if cancel is not None and cancel.is_set():
+            model.terminate()
+            return
+        if where != GRB.Callback.MIPSOL:
+            return
+        if getattr(model, '_rejected', False):
+            return # cut off by lazy constraints
+
+        objective = model.cbGet(GRB.Callback.MIPSOL_OBJ)
+        best = state['objective']
+        if best is not None and model.ModelSense * (objective - best) >= 0:
+            return # not an improvement
+        state['objective'] = objective
+
+        variables = model._variables
+        state_vars, edge_vars = variables.state_vars, variables.edge_vars
+        rho = getattr(model, '_rho', None)
+        handles = state_vars.ravel().tolist() + edge_vars.ravel().tolist()
+        if rho is not None:
+            handles.append(rho)
+        values = np.array(model.cbGetSolution(handles), dtype=np.float64)
+
+        robustness = float(values[-1]) if rho is not None else None
+        state_values = values[:state_vars.size].reshape(state_vars.shape)
+        edge_values = values[state_vars.size:state_vars.size+edge_vars.size]
+        edge_values = edge_values.reshape(edge_vars.shape)
+
+        bound = model.cbGet(GRB.Callback.MIPSOL_OBJBND)
+        gap = abs(bound - objective) / max(abs(objective), 1e-10)
+        solution = PlanSolution.from_values(variables, state_values,
+                        edge_values, status=GRB.Status.INPROGRESS,
+                        objective=objective, robustness=robustness, gap=gap)
+        logging.info('Incumbent with objective %f and gap %f', objective, gap)
+        if on_incumbent(solution):
+            model.terminate()
+
+    return callback
+
+def solve_anytime(m, on_incumbent, time_limit=None, mip_gap=None,
+                  cancel=None):
+    '''Optimizes the model `m` built by `build_model`, and passes each improving
+    incumbent plan to `on_incumbent` as soon as it is found, see
+    `incumbent_callback`. The callbacks registered with the model are also
+    called, see `optimize`.
+
+    Input
+    -----
+    - The Gurobi model variable.
+    - The function called with each improving incumbent. The optimization is
+    stopped if it returns True.
+    - The time limit in seconds (default: no limit).
+    - The relative MIP gap at which the optimization stops (default: solver
+    default).
+    - Event used to cancel the optimization (default: no cancellation).
+
+    Output
+    ------
+    The Gurobi model.
+    '''
+    if time_limit is not None:
+        m.Params.TimeLimit = time_limit
+    if mip_gap is not None:
+        m.Params.MIPGap = mip_gap
+    optimize(m, incumbent_callback(on_incumbent, cancel))
+    log_status(m)
+    return m
+
+def route_planning_anytime(ts, agents, formula, time_limit=None, mip_gap=None,
+                           cancel=None, **kwargs):
+    '''Generator of the improving incumbent plans for agents `agents' moving in
+    a transition system `ts' such that the CaTL specification `formula' is
+    satisfied. The solver runs in a background thread, and the plans are
+    yielded as they are found.
+
+    Input
+    -----
+    - The transition system, agents, and CaTL specification formula, see
+    `route_planning`.
+    - The time limit in seconds (default: no limit).
+    - The relative MIP gap at which the optimization stops (default: solver
+    default).
+    - Event used to cancel the optimization (default: a new event). The
+    optimization is also cancelled when the generator is closed.
+    - Other keyword arguments are passed to `build_model`.
+
+    Output
+    ------
+    The incumbent plans as `PlanSolution` objects with `objective`,
+    `robustness`, and `gap` set. The last plan yielded is the final solution of
+    the model with the status of the optimization. Errors raised by the solver
+    thread are re-raised after the last incumbent.
+    '''
+    m = build_model(ts, agents, formula, **kwargs)
+    if cancel is None:
+        cancel = threading.Event()
+
+    queue = Queue()
+    done = object()
+    errors = []
+
+    def solve():
+        try:
+            solve_anytime(m, queue.put, time_limit, mip_gap, cancel)
+            if m.SolCount > 0:
+                queue.put(PlanSolution.from_model(m))
+        except Exception as error: # re-raised by the consumer
+            errors.append(error)
+        finally:
+            queue.put(done)
+
+    thread = threading.Thread(target=solve, name='route-planning')
+    thread.daemon = True
+    thread.start()
+    try:
+        while True:
+            solution = queue.get()
+            if solution is done:
+                break
+            yield solution
+    finally:
+        cancel.set()
+        thread.join()
+    if errors:
+        raise errors[0]
@@ -0,0 +1,60 @@
+'''
+ Copyright (C) 2020 Cristian Ioan Vasile <cvasile@lehigh.edu>
+ Explainable Robotics Lab (ERL), Autonomous and Intelligent Robotics (AIR) Lab,
+ Lehigh University
+ See license.txt file for license information.
+'''
+
+import sys
+
+from lomap import Ts
+
+from compact_ts import CompactTs
+from lazy_constraints import LAZY_MODES
+from route_planning import build_model, optimize
+
+
+def model_size(m):
+    '''Returns the number of variables, constraints, and non-zeros of model
+    `m`.
+    '''
+    m.update()
+    return m.NumVars, m.NumConstrs, m.NumNZs
+
+def benchmark_lazy(ts_filename='farm.yaml', time_limit=600):
+    '''Compares the size of the model, the size of the presolved root LP, and
+    the solve time for the modes of adding the proposition constraints.
+    '''
+    ts = CompactTs.from_ts(Ts.load(ts_filename))
+
+    agents = [('q1', {'UV', 'Mo'}), ('q1', {'UV', 'Mo'}),
+              ('q2', {'Vis', 'Mo'}),
+              ('q4', {'IR', 'UV'}), ('q4', {'Vis', 'UV'}),
+              ('q5', {'Vis', 'Mo'}),
+              ('q6', {'IR', 'UV'}),
+              ('q8', {'Vis', 'IR'}),
+              ('q9', {'Vis', 'UV'}),
+              ('q10', {'Vis', 'IR'}), ('q10', {'Vis', 'IR'})]
+
+    specification = ('F[0, 10] T(2, blue, {(IR, 1), (Vis, 1)})'
+                     '&& F[0, 10] T(2, orange, {(UV, 2), (Mo, 1)})'
+                     '&& G[5, 15] F[0, 5] T(1, green, {(Vis, 1)})'
+                     '&& F[10, 20] T(3, yellow, {(IR, 2), (UV, 1)})'
+                     '&& G[0, 20] L(red, {(Mo, 2)})')
+
+    print('{:>10} {:>8} {:>8} {:>8} {:>8} {:>8} {:>8} {:>10} {:>8}'.format(
+        'mode', 'vars', 'constrs', 'nzs', 'p.vars', 'p.constr', 'p.nzs',
+        'objective', 'time'))
+    for lazy in LAZY_MODES:
+        m = build_model(ts, agents, specification, lazy=lazy)
+        m.Params.OutputFlag = 0
+        m.Params.TimeLimit = time_limit
+        size = model_size(m)
+        presolved = model_size(m.presolve())
+        optimize(m)
+        objective = m.ObjVal if m.SolCount > 0 else float('nan')
+        print('{:>10} {:>8} {:>8} {:>8} {:>8} {:>8} {:>8} {:>10.3f} {:>8.2f}'
+              .format(str(lazy), *(size + presolved + (objective, m.Runtime))))
+
+if __name__ == '__main__':
+    benchmark_lazy(*sys.argv[1:2])
@@ -0,0 +1,177 @@
+'''
+ Copyright (C) 2020 Cristian Ioan Vasile <cvasile@lehigh.edu>
+ Explainable Robotics Lab (ERL), Autonomous and Intelligent Robotics (AIR) Lab,
+ Lehigh University
+ See license.txt file for license information.
+'''
+
+import logging
+import time
+
+import numpy as np
+
+from gurobipy import GRB
+
+from catl import CATLFormula
+from compact_ts import CompactTs
+from feasibility import check_feasibility, INF
+from route_planning import build_model, optimize
+from solution import PlanSolution
+
+
+class BisectionResult(object):
+    '''Result of the robustness bisection. The best robustness threshold for
+    which a plan was found is `robustness`, and the corresponding plan is
+    `solution`. The interval [`robustness`, `upper`) contains the maximum
+    robustness, i.e., the thresholds at least `upper` were proven infeasible
+    or are infeasible by the static analysis of the specification. The list of
+    (threshold, status, runtime) triplets of the feasibility problems solved
+    is stored in `iterations`.
+    '''
+
+    def __init__(self, robustness, upper, solution, iterations):
+        '''Constructor'''
+        self.robustness = robustness
+        self.upper = upper
+        self.solution = solution
+        self.iterations = iterations
+
+    @property
+    def feasible(self):
+        return self.solution is not None
+
+    def __str__(self):
+        return 'Robustness: {} in [{}, {}) after {} iterations'.format(
+                    self.robustness, self.robustness, self.upper,
+                    len(self.iterations))
+
+
+def set_robustness_threshold(m, rho):
+    '''Shifts the thresholds of the predicates of the specification by `rho`,
+    i.e., sets the constraints z_{prop}_{cap}_k <= z_{prop}_{state}_{cap}_k
+    stored in `m._min_prop` to z_{prop}_{cap}_k <= z_{prop}_{state}_{cap}_k
+    - rho. The constraints of the resource predicates stored in `m._min_res`
+    are shifted in the same way. Only the right-hand sides of the constraints
+    are changed.
+    '''
+    constraints = m._min_prop + getattr(m, '_min_res', [])
+    if not constraints:
+        return
+    senses = np.array(m.getAttr('Sense', constraints))
+    # the constraints are stored either as z - z_state <= 0 or as
+    # z_state - z >= 0
+    rhs = np.where(senses == GRB.LESS_EQUAL, -rho, rho)
+    m.setAttr('RHS', constraints, rhs.tolist())
+
+def solve_threshold(m, rho, deadline=None):
+    '''Solves the feasibility problem for robustness threshold `rho`.
+
+    Output
+    ------
+    True if a plan was found, False if the problem is infeasible, and None if
+    the time budget ran out before deciding.
+    '''
+    set_robustness_threshold(m, rho)
+    if deadline is not None:
+        remaining = deadline - time.time()
+        if remaining <= 0:
+            return None
+        m.Params.TimeLimit = remaining
+    optimize(m)
+    if m.SolCount > 0:
+        return True
+    if m.Status in (GRB.Status.INFEASIBLE, GRB.Status.INF_OR_UNBD):
+        return False
+    return None
+
+def robustness_bisection(ts, agents, formula, time_bound=None,
+                         time_limit=None, tolerance=1, **kwargs):
+    '''Maximizes the robustness of the CaTL specification `formula` by
+    bisection over feasibility problems. The thresholds of the predicates are
+    shifted by the robustness threshold rho, and only the right-hand sides of
+    the constraints are updated between iterations such that the solver reuses
+    the model.
+
+    Input
+    -----
+    - The transition system specifying the environment, either a `lomap.Ts`
+    object or its compact form `CompactTs`.
+    - List of agents, see `route_planning`.
+    - The CaTL specification formula.
+    - The time bound used in the encoding (default: computed from CaTL formula).
+    - The time budget in seconds (default: no limit).
+    - The precision of the robustness threshold, which must be positive
+    (default: 1). For the default integer precision the thresholds are
+    integral.
+    - Other keyword arguments are passed to `build_model`.
+
+    Output
+    ------
+    The result of the bisection, see `BisectionResult`. If the time budget runs
+    out, the best threshold found so far is returned.
+
+    Note
+    ----
+    The search interval is bounded from above by the static robustness bound of
+    `check_feasibility`. The variables z_{prop}_{cap}_k of the STL formula may
+    become negative, such that predicates under disjunctions can be violated.
+    The limit predicates (L) are not shifted, since the variables of the STL
+    formula are bounded only from above by the proposition-state variables.
+    The proposition constraints must be added to the model, i.e., the lazy
+    constraint mode 'callback' is not supported.
+    '''
+    if not tolerance > 0:
+        raise ValueError('The tolerance must be positive, got {}!'.format(
+                                                                    tolerance))
+    deadline = None if time_limit is None else time.time() + time_limit
+
+    ast = CATLFormula.from_formula(formula)
+    if not isinstance(ts, CompactTs):
+        ts = CompactTs.from_ts(ts)
+
+    report = check_feasibility(ts, agents, ast, kwargs.get('resources'))
+    if report.infeasible:
+        logging.error('%s', report)
+        return BisectionResult(None, report.robustness_upper, None, [])
+    upper = report.robustness_upper
+    if upper == INF:
+        upper = len(agents)
+    upper = upper + tolerance # exclusive upper bound
+
+    if kwargs.get('lazy') == 'callback':
+        raise ValueError('The robustness threshold can not be shifted for '
+                         'lazy constraint callbacks!')
+    kwargs['robust'] = False
+    m = build_model(ts, agents, formula, time_bound=time_bound,
+                    stl_lower_bound=-upper, **kwargs)
+    # stop at the first plan found
+    m.Params.SolutionLimit = 1
+
+    lower, best, iterations = 0, None, []
+    rho = lower
+    while True:
+        start = time.time()
+        feasible = solve_threshold(m, rho, deadline)
+        iterations.append((rho, m.Status, time.time() - start))
+        logging.info('Robustness threshold %s: %s', rho,
+                     {True: 'feasible', False: 'infeasible'}.get(feasible,
+                                                                 'unknown'))
+        if feasible is None:
+            break
+        if feasible:
+            lower = rho
+            best = PlanSolution.from_model(m)
+            best.robustness = rho
+        else:
+            upper = rho
+            if best is None: # infeasible for zero robustness
+                break
+        if upper - lower <= tolerance:
+            break
+        rho = lower + (upper - lower) / 2.0
+        if tolerance >= 1:
+            rho = int(np.floor(rho))
+
+    if best is None:
+        return BisectionResult(None, upper, None, iterations)
+    return BisectionResult(lower, upper, best, iterations)
@@ -9,7 +9,8 @@
 import itertools as it
 from collections import namedtuple
 
-from antlr4 import InputStream, CommonTokenStream, TerminalNode
+from antlr4 import InputStream, CommonTokenStream, TerminalNode, Token
+from antlr4.error.ErrorListener import ErrorListener
 
 from catlLexer import catlLexer
 from catlParser import catlParser
@@ -34,6 +35,31 @@ class Operation(object):
         '''Gets custom string representation for each operation.'''
         return cls.opnames[op]
 
+class CATLSyntaxError(ValueError):
+    '''Syntax error in a CATL formula at the given line and column.'''
+
+    def __init__(self, formula, line, column, message):
+        '''Constructor'''
+        ValueError.__init__(self, 'line {}:{} {}'.format(line, column, message))
+        self.formula = formula
+        self.line = line
+        self.column = column
+        self.message = message
+
+
+class CATLErrorListener(ErrorListener):
+    '''ANTLR error listener that raises a `CATLSyntaxError` at the first
+    syntax error instead of printing it.
+    '''
+
+    def __init__(self, formula):
+        '''Constructor'''
+        ErrorListener.__init__(self)
+        self.formula = formula
+
+    def syntaxError(self, recognizer, offendingSymbol, line, column, msg, e):
+        raise CATLSyntaxError(self.formula, line, column, msg)
+
 CapabilityRequest = namedtuple('CapabilityRequest', ['capability', 'count'])
 ResourceRequest = namedtuple('ResourceRequest', ['resource', 'quantity'])
 
@@ -100,7 +126,9 @@ class CATLFormula(object):
 
     def propositions(self):
         '''Computes the set of propositions involved in the CATL formula.'''
-        if self.op in (Operation.PRED, Operation.LIMIT):
+        if self.op == Operation.BOOL:
+            return set()
+        elif self.op in (Operation.PRED, Operation.LIMIT):
             return {self.proposition}
         elif self.op in (Operation.AND, Operation.OR):
             return set.union(*[child.propositions() for child in self.children])
@@ -111,7 +139,9 @@ class CATLFormula(object):
 
     def capabilities(self):
         '''Computes the set of capabilities involved in the CATL formula.'''
-        if self.op in (Operation.PRED, Operation.LIMIT):
+        if self.op == Operation.BOOL:
+            return set()
+        elif self.op in (Operation.PRED, Operation.LIMIT):
             return {cr.capability for cr in self.capability_requests}
         elif self.op in (Operation.AND, Operation.OR):
             return set.union(*[child.capabilities() for child in self.children])
@@ -122,7 +152,9 @@ class CATLFormula(object):
 
     def resources(self):
         '''Computes the set of resources involved in the CATL formula.'''
-        if self.op in (Operation.PRED, Operation.LIMIT):
+        if self.op == Operation.BOOL:
+            return set()
+        elif self.op in (Operation.PRED, Operation.LIMIT):
             return {cr.resource for cr in self.resource_requests}
         elif self.op in (Operation.AND, Operation.OR):
             return set.union(*[child.resources() for child in self.children])
@@ -189,12 +221,15 @@ class CATLFormula(object):
         return self.__string
 
     @classmethod
-    def from_formula(cls, formula):
+    def from_formula(cls, formula, strict=False):
         '''Creates a CATLFormula object from a formula string.
 
         Parameters
         ----------
         formula (str) CATL formula
+        strict (bool) raise a `CATLSyntaxError` at the first syntax error, or
+            if the formula is followed by extraneous input, instead of
+            printing the errors and recovering
 
         Returns
         -------
@@ -203,7 +238,16 @@ class CATLFormula(object):
         lexer = catlLexer(InputStream(formula))
         tokens = CommonTokenStream(lexer)
         parser = catlParser(tokens)
+        if strict:
+            listener = CATLErrorListener(formula)
+            for recognizer in (lexer, parser):
+                recognizer.removeErrorListeners()
+                recognizer.addErrorListener(listener)
         t = parser.catlProperty()
+        if strict and tokens.LA(1) != Token.EOF:
+            token = tokens.LT(1)
+            raise CATLSyntaxError(formula, token.line, token.column,
+                                  "extraneous input '{}'".format(token.text))
         return CATLAbstractSyntaxTreeExtractor().visit(t)
 
 
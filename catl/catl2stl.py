@@ -33,6 +33,11 @@ def catl2stl(catl_ast):
 
         T(d, \pi, \{(c_1, n_1), \ldots,(c_m, n_m)\}) \equiv
         \box_{[0, d]} \bigcup_{i=1}^{m} (z_{\pi, c_i} \geq n_i)
+
+    Similarly, the resource requests (h, q) of tasks and limits are translated
+    to the predicates ``z_{\pi,h} \geq q'' and ``z_{\pi,h} \leq q'',
+    respectively, over the variables "z_{proposition}_{resource}". Thus, the
+    names of resources and capabilities must be distinct.
     '''
     if catl_ast.op == CATLOperation.BOOL:
         return STLFormula(STLOperation.BOOL, value=catl_ast.value)
@@ -42,6 +47,10 @@ def catl2stl(catl_ast):
             [STLFormula(STLOperation.PRED, relation=STLRelOperation.GE,
                         variable=var.format(cap=cap), threshold=th)
                                for cap, th in catl_ast.capability_requests]
+        conjunction_terms += \
+            [STLFormula(STLOperation.PRED, relation=STLRelOperation.GE,
+                        variable=var.format(cap=res), threshold=q)
+                               for res, q in catl_ast.resource_requests]
         child = STLFormula(STLOperation.AND, children=conjunction_terms)
 
         return STLFormula(STLOperation.ALWAYS, low=0, high=catl_ast.duration,
@@ -52,6 +61,10 @@ def catl2stl(catl_ast):
             [STLFormula(STLOperation.PRED, relation=STLRelOperation.LE,
                         variable=var.format(cap=cap), threshold=th)
                                for cap, th in catl_ast.capability_requests]
+        conjunction_terms += \
+            [STLFormula(STLOperation.PRED, relation=STLRelOperation.LE,
+                        variable=var.format(cap=res), threshold=q)
+                               for res, q in catl_ast.resource_requests]
         return STLFormula(STLOperation.AND, children=conjunction_terms)
     elif catl_ast.op in (CATLOperation.AND, CATLOperation.OR):
         children = [catl2stl(ch) for ch in catl_ast.children]
@@ -80,6 +93,73 @@ def catl2stl(catl_ast):
         return STLFormula(STLOperation.UNTIL, left=left, right=right,
                           low=catl_ast.low, high=catl_ast.high)
 
+def stl_encoding_size(stl_formula, t=0, robust=True):
+    '''Estimates the size of the MILP encoding of the STL formula at time `t`
+    computed by `stl2milp`. The encodings of equal subformulae at the same time
+    are shared.
+
+    Output
+    ------
+    Dictionary with the estimated numbers of binary satisfaction variables
+    `variables`, of constraints `constraints`, and of nonzero coefficients
+    `nonzeros`, the number of signal variables `signals`, i.e., pairs
+    (z_{proposition}_{capability}, time), and the dictionary from signal names
+    to their numbers of time steps `variable_signals`.
+    '''
+    encoded = set()
+    variable_signals = dict()
+    num_variables, num_constraints, num_nonzeros = 0, 0, 0
+    stack = [(stl_formula, t)]
+    while stack:
+        key = stack.pop()
+        if key in encoded:
+            continue
+        encoded.add(key)
+        formula, t = key
+        num_variables += 1
+        if formula.op == STLOperation.PRED:
+            count = variable_signals.get(formula.variable, 0)
+            variable_signals[formula.variable] = count + 1
+            num_constraints += 2
+            num_nonzeros += 2 * (3 if robust else 2)
+        elif formula.op == STLOperation.BOOL:
+            num_constraints += 1
+            num_nonzeros += 1
+        elif formula.op in (STLOperation.AND, STLOperation.OR):
+            num_constraints += len(formula.children) + 1
+            num_nonzeros += 3 * len(formula.children) + 1
+            stack.extend((child, t) for child in formula.children)
+        elif formula.op == STLOperation.NOT:
+            num_constraints += 1
+            num_nonzeros += 2
+            stack.append((formula.child, t))
+        elif formula.op == STLOperation.IMPLIES:
+            # z >= 1 - z_left, and z >= z_right
+            num_constraints += 2
+            num_nonzeros += 4
+            stack.extend([(formula.left, t), (formula.right, t)])
+        elif formula.op in (STLOperation.EVENT, STLOperation.ALWAYS):
+            times = range(int(formula.low), int(formula.high) + 1)
+            num_constraints += len(times) + 1
+            num_nonzeros += 3 * len(times) + 1
+            stack.extend((formula.child, t + tau) for tau in times)
+        elif formula.op == STLOperation.UNTIL:
+            # one auxiliary variable y per time tau of the right subformula
+            # bounded from above by the right subformula at tau and by the left
+            # subformula at the times up to tau, and from below by their
+            # conjunction, i.e., tau + 3 rows with 3 * tau + 7 nonzeros
+            times = range(int(formula.low), int(formula.high) + 1)
+            num_variables += len(times)
+            num_constraints += len(times) + 1 + sum(tau + 3 for tau in times)
+            num_nonzeros += 3 * len(times) + 1 \
+                            + sum(3 * tau + 7 for tau in times)
+            stack.extend((formula.right, t + tau) for tau in times)
+            stack.extend((formula.left, t + tau)
+                         for tau in range(int(formula.high) + 1))
+    return {'variables': num_variables, 'constraints': num_constraints,
+            'nonzeros': num_nonzeros,
+            'signals': sum(variable_signals.values()),
+            'variable_signals': variable_signals}
 
 if __name__ == '__main__':
     formulae = (
@@ -9,78 +9,68 @@ import logging
 logger = logging.getLogger(__name__)
 logger.addHandler(logging.NullHandler())
 
+import numpy as np
 
-def check_initial_states(ts, agents):
+
+def check_initial_states(variables, agents):
     '''Checks if the initial states of the nodes of the environmental graph are
     satisfied in the MILP solution.  The functions assumes that the gurobipy
-    model was solved, and the variables are stored in the node and edge
-    attributes of the transition system graph `ts.g`.
+    model was solved, and the solution values were retrieved in the registry of
+    planning variables, see `PlanningVariables.read_values`.
     Input
     -----
-    - The transition system specifying the environment.
+    - The registry of planning variables.
     - The list of agents given as a list of pairs of locations (states), and
     capability sets.
     '''
-    initial_locations, _ = zip(*agents)
-    capability_distribution = {state: dict() for state in initial_locations}
-    for agent in agents:
-        state, agent_class = agent
-        agent_class = frozenset(agent_class)
-        if agent_class not in capability_distribution[state]:
-            capability_distribution[state][agent_class] = 0
-        capability_distribution[state][agent_class] += 1
+    ts = variables.ts
+    capability_distribution = np.zeros((ts.num_states, variables.num_classes))
+    for state, agent_class in agents:
+        i = ts.state_index[str(state)]
+        j = variables.class_index[frozenset(agent_class)]
+        capability_distribution[i, j] += 1
 
-    for node, data in ts.g.nodes(data=True):
-        for agent_class, var in data['vars'][0].items():
-            if (node in capability_distribution
-                and agent_class in capability_distribution[node]):
-                value = capability_distribution[node][agent_class]
-                assert var.x == value, (node, agent_class, var, value)
-            else:
-                assert var.x == 0, (node, agent_class, var, 0)
+    values = variables.state_values[:, :, 0]
+    for i, j in zip(*np.nonzero(values != capability_distribution)):
+        assert False, (ts.states[i], variables.classes[j], values[i, j],
+                       capability_distribution[i, j])
 
-def check_flow_constraints(ts, agents, time_bound):
+def check_flow_constraints(variables, time_bound):
     '''Checks if the flow constraints at each state and each time are satisfied
     in the MILP solution.  The functions assumes that the gurobipy model was
-    solved, and the variables are stored in the node and edge attributes of the
-    transition system graph `ts.g`.
+    solved, and the solution values were retrieved in the registry of planning
+    variables, see `PlanningVariables.read_values`.
     Input
     -----
-    - The transition system specifying the environment.
-    - The list of agents given as a list of pairs of locations (states), and
-    capability sets.
+    - The registry of planning variables.
+    - The time bound.
     '''
-    _, agent_classes = zip(*agents)
-    agent_classes = set([frozenset(agent_class)
-                         for agent_class in agent_classes])
+    ts = variables.ts
+    sources, targets, weights = ts.sources, ts.targets, ts.weights
+    loops = set(sources[sources == targets].tolist())
+    assert loops == set(range(ts.num_states))
 
-    for t in range(time_bound+1):
-        for node, node_data in ts.g.nodes(data=True):
-            assert ts.g.has_edge(node, node)
-            for agent_class in agent_classes:
-                departing = 0
-                for _, _, edge_data in ts.g.out_edges([node], data=True):
-                    if t < time_bound:
-                        departing += edge_data['vars'][t][agent_class].x
-
-                arriving = 0
-                for _, _, edge_data in ts.g.in_edges([node], data=True):
-                    past = t - edge_data['weight']
-                    if past >= 0:
-                        arriving += edge_data['vars'][past][agent_class].x
+    edge_values = variables.edge_values
+    num_states, num_classes, _ = variables.state_values.shape
+    departing = np.zeros((num_states, num_classes, time_bound+1))
+    arriving = np.zeros((num_states, num_classes, time_bound+1))
+    for w in np.unique(weights).tolist():
+        if w > time_bound:
+            continue
+        edges = np.flatnonzero(weights == w)
+        # transitions departing at time t arrive at time t + w
+        np.add.at(departing[:, :, :time_bound+1-w], sources[edges],
+                  edge_values[edges, :, :time_bound+1-w])
+        np.add.at(arriving[:, :, w:], targets[edges],
+                  edge_values[edges, :, :time_bound+1-w])
 
+    for t in range(time_bound+1):
+        for i, u in enumerate(ts.states.tolist()):
+            for j, agent_class in enumerate(variables.classes):
                 logger.debug('time: %d, node: %s, agent_class: %s, value: %s',
-                             t, node, agent_class,
-                             node_data['vars'][t][agent_class])
-                dep = [(u, v, t, edge_data['vars'][t][agent_class].x)
-                       for u, v, edge_data in ts.g.out_edges([node], data=True)
-                           if t < time_bound]
-                logger.debug('departing: %d, %s', departing, dep)
-                arv = [(u, v, t - edge_data['weight'],
-                        edge_data['vars'][t - edge_data['weight']][agent_class].x)
-                       for u, v, edge_data in ts.g.in_edges([node], data=True)
-                           if t - edge_data['weight'] >= 0]
-                logger.debug('arriving: %d, %s', arriving, arv)
+                             t, u, agent_class, variables.state_values[i, j, t])
+                logger.debug('departing: %d, arriving: %d',
+                             departing[i, j, t], arriving[i, j, t])
 
                 if 0 < t < time_bound:
-                    assert departing == arriving
+                    assert departing[i, j, t] == arriving[i, j, t]
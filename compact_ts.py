@@ -0,0 +1,198 @@
+'''
+ Copyright (C) 2020 Cristian Ioan Vasile <cvasile@lehigh.edu>
+ Explainable Robotics Lab (ERL), Autonomous and Intelligent Robotics (AIR) Lab,
+ Lehigh University
+ See license.txt file for license information.
+'''
+
+import os
+import sys
+import json
+
+import numpy as np
+
+from lomap import Ts
+
+
+class CompactTs(object):
+    '''Array representation of a transition system.
+
+    The states are identified by their indices in `states`, and the
+    transitions by their indices in the CSR adjacency arrays, i.e., the
+    transitions leaving state `i` are `indptr[i]:indptr[i+1]`, and transition
+    `e` leads to state `indices[e]` and has weight (duration) `weights[e]`.
+    The transitions entering state `i` are listed in
+    `in_indices[in_indptr[i]:in_indptr[i+1]]`.
+    The labels of the states are stored as bitsets over `propositions` packed
+    into bytes, one row per state.
+    '''
+
+    FORMAT = 'catl-compact-ts'
+    VERSION = 1
+    ARRAYS = ('states', 'propositions', 'bitsets', 'indptr', 'indices',
+              'weights', 'in_indptr', 'in_indices')
+
+    def __init__(self, name, states, propositions, bitsets, indptr, indices,
+                 weights, in_indptr=None, in_indices=None):
+        '''Constructor'''
+        self.name = name
+        self.states = states
+        self.propositions = propositions
+        self.bitsets = bitsets
+        self.indptr = indptr
+        self.indices = indices
+        self.weights = weights
+
+        if in_indptr is None or in_indices is None:
+            in_indices = np.argsort(indices, kind='mergesort')
+            in_degree = np.bincount(indices, minlength=len(states))
+            in_indptr = np.zeros(len(states) + 1, dtype=np.int64)
+            np.cumsum(in_degree, out=in_indptr[1:])
+        self.in_indptr = in_indptr
+        self.in_indices = in_indices
+
+        self.__state_index = None
+        self.__sources = None
+        self.__labels = None
+
+    @property
+    def num_states(self):
+        return len(self.states)
+
+    @property
+    def num_edges(self):
+        return len(self.indices)
+
+    @property
+    def targets(self):
+        '''Returns the array of destination states of transitions.'''
+        return self.indices
+
+    @property
+    def sources(self):
+        '''Returns the array of source states of transitions.'''
+        if self.__sources is None:
+            self.__sources = np.repeat(np.arange(self.num_states),
+                                       np.diff(self.indptr))
+        return self.__sources
+
+    @property
+    def state_index(self):
+        '''Returns the dictionary from state identifiers to indices.'''
+        if self.__state_index is None:
+            self.__state_index = {u: i for i, u in
+                                  enumerate(self.states.tolist())}
+        return self.__state_index
+
+    @property
+    def labels(self):
+        '''Returns the boolean matrix of labels with shape
+        (number of states, number of propositions).
+        '''
+        if self.__labels is None:
+            # slicing instead of `count`, which requires numpy 1.17
+            labels = np.unpackbits(self.bitsets, axis=1)
+            self.__labels = labels[:, :len(self.propositions)].astype(bool)
+        return self.__labels
+
+    def out_edges(self, i):
+        '''Returns the indices of the transitions leaving state `i`.'''
+        return np.arange(self.indptr[i], self.indptr[i+1])
+
+    def in_edges(self, i):
+        '''Returns the indices of the transitions entering state `i`.'''
+        return self.in_indices[self.in_indptr[i]:self.in_indptr[i+1]]
+
+    def state_propositions(self, i):
+        '''Returns the set of propositions labeling state `i`.'''
+        return set(self.propositions[self.labels[i]].tolist())
+
+    def proposition_states(self, prop):
+        '''Returns the indices of the states labeled by proposition `prop`.'''
+        p, = np.flatnonzero(self.propositions == prop)
+        return np.flatnonzero(self.labels[:, p])
+
+    @classmethod
+    def from_ts(cls, ts):
+        '''Creates the array representation of a `lomap.Ts` transition system.
+        State identifiers are converted to strings.
+        '''
+        states = [u for u in ts.g.nodes()]
+        state_index = {u: i for i, u in enumerate(states)}
+        propositions = sorted(set.union(set(), *[set(d.get('prop', set()))
+                                        for _, d in ts.g.nodes(data=True)]))
+        prop_index = {p: j for j, p in enumerate(propositions)}
+
+        labels = np.zeros((len(states), len(propositions)), dtype=bool)
+        for u, d in ts.g.nodes(data=True):
+            for p in d.get('prop', set()):
+                labels[state_index[u], prop_index[p]] = True
+
+        edges = np.array(sorted((state_index[u], state_index[v],
+                                 int(d['weight']))
+                                for u, v, d in ts.g.edges(data=True)),
+                         dtype=np.int64).reshape(-1, 3)
+        sources, targets, weights = [np.ascontiguousarray(column)
+                                     for column in edges.T]
+        indptr = np.zeros(len(states) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(sources, minlength=len(states)), out=indptr[1:])
+
+        return cls(ts.name, np.array([str(u) for u in states]),
+                   np.array(propositions, dtype=np.str_),
+                   np.packbits(labels, axis=1), indptr, targets, weights)
+
+    def scale(self, factor):
+        '''Returns the transition system with the durations of the transitions
+        divided by `factor` and rounded up, i.e., for a time step `factor`
+        times longer.
+        '''
+        weights = -(-np.asarray(self.weights) // int(factor))
+        return CompactTs(self.name, self.states, self.propositions,
+                         self.bitsets, self.indptr, self.indices,
+                         np.maximum(weights, 1), self.in_indptr,
+                         self.in_indices)
+
+    def save(self, path):
+        '''Saves the transition system in the directory `path`.'''
+        if not os.path.isdir(path):
+            os.makedirs(path)
+        for name in self.ARRAYS:
+            np.save(os.path.join(path, name + '.npy'), getattr(self, name))
+        meta = {'format': self.FORMAT, 'version': self.VERSION,
+                'name': self.name}
+        with open(os.path.join(path, 'meta.json'), 'w') as fout:
+            json.dump(meta, fout)
+
+    @classmethod
+    def load(cls, path, mmap=True):
+        '''Loads a transition system saved in the directory `path`. The arrays
+        are memory mapped if `mmap` is set.
+        '''
+        with open(os.path.join(path, 'meta.json'), 'r') as fin:
+            meta = json.load(fin)
+        if meta.get('format') != cls.FORMAT:
+            raise ValueError('"{}" is not a compact transition system!'
+                             .format(path))
+        mmap_mode = 'r' if mmap else None
+        arrays = {name: np.load(os.path.join(path, name + '.npy'),
+                                mmap_mode=mmap_mode)
+                  for name in cls.ARRAYS}
+        return cls(meta['name'], **arrays)
+
+
+def convert(ts_filename, path):
+    '''Converts a transition system saved in the `lomap` YAML format to the
+    compact binary format.
+    '''
+    ts = CompactTs.from_ts(Ts.load(ts_filename))
+    ts.save(path)
+    return ts
+
+
+if __name__ == '__main__':
+    if len(sys.argv) != 3:
+        print('Usage: python compact_ts.py <ts.yaml> <output directory>')
+        sys.exit(1)
+    ts = convert(sys.argv[1], sys.argv[2])
+    print('Converted {} states and {} transitions'.format(ts.num_states,
+                                                          ts.num_edges))
@@ -0,0 +1,235 @@
+'''
+ Copyright (C) 2020 Cristian Ioan Vasile <cvasile@lehigh.edu>
+ Explainable Robotics Lab (ERL), Autonomous and Intelligent Robotics (AIR) Lab,
+ Lehigh University
+ See license.txt file for license information.
+'''
+
+import logging
+
+import numpy as np
+
+from catl import CATLFormula, Operation
+from compact_ts import CompactTs
+from route_planning import build_model, optimize, log_status
+from solution import PlanSolution
+
+
+def conjuncts(ast):
+    '''Returns the list of conjuncts of the top-level conjunction of the
+    formula.
+    '''
+    if ast.op == Operation.AND:
+        return [term for child in ast.children for term in conjuncts(child)]
+    return [ast]
+
+def conjunction(formulae):
+    '''Returns the conjunction of the list of formulae.'''
+    if len(formulae) == 1:
+        return formulae[0]
+    return CATLFormula(Operation.AND, children=list(formulae))
+
+def time_window(ast):
+    '''Returns the active time window [start, end] of the formula, i.e., the
+    formula depends only on the team states at times between start and end.
+    '''
+    if ast.op in (Operation.EVENT, Operation.ALWAYS, Operation.UNTIL):
+        start = ast.low
+        if ast.op == Operation.UNTIL: # the left formula is active from 0
+            start = 0
+        return int(start), int(ast.bound())
+    elif ast.op in (Operation.AND, Operation.OR):
+        windows = [time_window(child) for child in ast.children]
+        return min(w[0] for w in windows), max(w[1] for w in windows)
+    return 0, int(ast.bound())
+
+def shift_formula(ast, offset):
+    '''Shifts the formula back in time by `offset`, i.e., the returned formula
+    holds at time 0 if and only if `ast` holds at time `offset`. The intervals
+    of the outermost temporal operators are shifted, and must start at least at
+    `offset`.
+    '''
+    if offset == 0:
+        return ast
+    if ast.op in (Operation.EVENT, Operation.ALWAYS):
+        if ast.low < offset:
+            raise ValueError('Can not shift formula {} by {}!'.format(ast,
+                                                                      offset))
+        return CATLFormula(ast.op, low=ast.low - offset,
+                           high=ast.high - offset, child=ast.child)
+    elif ast.op in (Operation.AND, Operation.OR):
+        return CATLFormula(ast.op, children=[shift_formula(child, offset)
+                                             for child in ast.children])
+    elif ast.op == Operation.IMPLIES:
+        return CATLFormula(ast.op, left=shift_formula(ast.left, offset),
+                           right=shift_formula(ast.right, offset))
+    elif ast.op == Operation.NOT:
+        return CATLFormula(ast.op, child=shift_formula(ast.child, offset))
+    raise ValueError('Can not shift formula {} by {}!'.format(ast, offset))
+
+def time_windows(ast):
+    '''Groups the conjuncts of the formula into windows with disjoint active
+    time windows.
+
+    Output
+    ------
+    List of tuples (start, end, conjuncts) sorted by start time, where
+    [start, end] is the union of the active time windows of the conjuncts.
+    Consecutive windows satisfy that the start of a window is strictly larger
+    than the end of the previous window.
+    '''
+    terms = sorted(((time_window(term), term) for term in conjuncts(ast)),
+                   key=lambda item: item[0])
+    windows = []
+    for (start, end), term in terms:
+        if windows and start <= windows[-1][1]:
+            low, high, group = windows[-1]
+            windows[-1] = (low, max(high, end), group + [term])
+        else:
+            windows.append((start, end, [term]))
+    return windows
+
+def agents_from_team_state(team_state, states, classes):
+    '''Returns the list of agents (q, cap) corresponding to the team state
+    given as an integer array of shape (states, classes).
+    '''
+    agents = []
+    for i, j in zip(*np.nonzero(team_state)):
+        agents.extend([(states[i], set(classes[j]))] * int(team_state[i, j]))
+    return agents
+
+def stitch(solutions, offsets):
+    '''Concatenates the solutions of consecutive windows starting at the given
+    global time offsets into a solution over the full horizon.
+    '''
+    first, last = solutions[0], solutions[-1]
+    for solution in solutions[1:]:
+        assert np.array_equal(solution.class_codes, first.class_codes), \
+                                                    'Mismatched agent classes!'
+    time_bound = offsets[-1] + last.time_bound
+    num_states, num_classes = first.team_state.shape[:2]
+    team_state = np.zeros((num_states, num_classes, time_bound+1),
+                          dtype=np.int64)
+    flows = np.zeros((first.flows.shape[0], num_classes, time_bound),
+                     dtype=np.int64)
+    for offset, solution in zip(offsets, solutions):
+        horizon = solution.time_bound
+        team_state[:, :, offset:offset+horizon+1] = solution.team_state
+        flows[:, :, offset:offset+horizon] = solution.flows
+
+    def combine(name, function):
+        values = [getattr(solution, name) for solution in solutions]
+        if any(value is None for value in values):
+            return None
+        return function(values)
+
+    return PlanSolution(first.states, first.sources, first.targets,
+                        first.weights, first.capabilities, first.class_codes,
+                        first.class_capabilities, team_state, flows,
+                        status=last.status,
+                        objective=combine('objective', sum),
+                        robustness=combine('robustness', min),
+                        gap=combine('gap', max))
+
+def solve_window(ts, agents, formula, time_bound, **kwargs):
+    '''Solves the planning problem over a window with horizon `time_bound`. The
+    transitions that are not completed within the horizon are disabled, such
+    that all agents are at states at the end of the window.
+
+    Output
+    ------
+    The solution of the window, or None if no plan satisfying the formula was
+    found, i.e., the model is infeasible or the robustness is negative.
+    '''
+    m = build_model(ts, agents, formula, time_bound=time_bound, **kwargs)
+    edge_vars = m._variables.edge_vars
+    in_flight = (np.asarray(ts.weights)[:, np.newaxis]
+                 + np.arange(time_bound)[np.newaxis, :]) > time_bound
+    in_flight = np.broadcast_to(in_flight[:, np.newaxis, :], edge_vars.shape)
+    handles = edge_vars[in_flight].tolist()
+    m.setAttr('UB', handles, [0] * len(handles))
+
+    optimize(m)
+    log_status(m)
+    solution = PlanSolution.from_model(m) if m.SolCount > 0 else None
+    m.dispose()
+    if solution is not None and solution.robustness is not None \
+                                            and solution.robustness < 0:
+        return None
+    return solution
+
+def route_planning_decomposed(ts, agents, formula, backtrack=True, **kwargs):
+    '''Performs route planning by solving the conjuncts of the CaTL
+    specification `formula` with disjoint active time windows in sequence. The
+    team state at the end of a window is the initial team state of the next
+    window. If a window is infeasible, it is merged with the previous window
+    and the merged window is solved again, if `backtrack` is set.
+
+    Input
+    -----
+    - The transition system, agents, and CaTL specification formula, see
+    `route_planning`.
+    - Flag indicating whether to merge infeasible windows with the previous
+    windows (default: true).
+    - Other keyword arguments are passed to `build_model`.
+
+    Output
+    ------
+    The plan over the full horizon as a `PlanSolution`, or None if no plan was
+    found. The objective of the plan is the sum of the objectives of the
+    windows, and the robustness is the minimum robustness of the windows.
+
+    Note
+    ----
+    The models of the windows are disposed after they are solved, such that
+    the peak memory depends on the longest window. Resources are not supported,
+    since the resource levels are not carried between the windows.
+    '''
+    if 'time_bound' in kwargs:
+        raise ValueError('The time bounds are computed for each window!')
+    if kwargs.get('resources'):
+        raise ValueError('Resources are not supported by the temporal '
+                         'decomposition!')
+    if not isinstance(ts, CompactTs):
+        ts = CompactTs.from_ts(ts)
+    if isinstance(formula, CATLFormula):
+        ast = formula
+    else:
+        ast = CATLFormula.from_formula(formula)
+
+    windows = time_windows(ast)
+    groups = [terms for _, _, terms in windows]
+    ends = [end for _, end, _ in windows]
+    logging.info('Temporal decomposition into %d windows', len(groups))
+
+    # stacks of the offsets and solutions of the solved windows
+    offsets, solutions = [], []
+    window = 0
+    while window < len(groups):
+        offset = ends[window-1] if window > 0 else 0
+        current_agents = (agents if window == 0 else
+                          agents_from_team_state(
+                              solutions[-1].team_state[:, :, -1],
+                              ts.states.tolist(), solutions[-1].classes))
+        window_formula = shift_formula(conjunction(groups[window]), offset)
+        logging.info('Window %d: time interval [%d, %d]', window, offset,
+                     ends[window])
+        solution = solve_window(ts, current_agents, window_formula,
+                                ends[window] - offset, **kwargs)
+        if solution is not None:
+            offsets.append(offset)
+            solutions.append(solution)
+            window += 1
+        elif backtrack and window > 0:
+            logging.info('Window %d is infeasible, merging with window %d',
+                         window, window-1)
+            groups[window-1:window+1] = [groups[window-1] + groups[window]]
+            ends[window-1:window+1] = [ends[window]]
+            offsets.pop()
+            solutions.pop()
+            window -= 1
+        else:
+            logging.error('Window %d is infeasible', window)
+            return None
+
+    return stitch(solutions, offsets)
@@ -0,0 +1,393 @@
+'''
+ Copyright (C) 2020 Cristian Ioan Vasile <cvasile@lehigh.edu>
+ Explainable Robotics Lab (ERL), Autonomous and Intelligent Robotics (AIR) Lab,
+ Lehigh University
+ See license.txt file for license information.
+'''
+
+from collections import defaultdict
+import logging
+
+import numpy as np
+import scipy.sparse as sp
+from scipy.sparse.csgraph import dijkstra
+
+from catl import Operation
+from fleet import Fleet
+
+
+INF = float('inf')
+
+
+class InfeasibleSpecification(Exception):
+    '''Raised when the static analysis proves that a CaTL specification can not
+    be satisfied by the given team of agents.
+    '''
+
+    def __init__(self, report):
+        Exception.__init__(self, 'Infeasible specification: '
+                           + '; '.join(str(fault) for fault in report.faults))
+        self.report = report
+
+
+class Fault(object):
+    '''Explanation of why a subformula can not be satisfied.'''
+
+    def __init__(self, formula, reason):
+        self.formula = formula
+        self.reason = reason
+
+    def __str__(self):
+        return '{}: {}'.format(self.formula, self.reason)
+
+    __repr__ = __str__
+
+
+class FeasibilityReport(object):
+    '''Result of the static analysis of a CaTL specification.
+
+    The robustness of the specification is contained in the interval
+    [`robustness_lower`, `robustness_upper`]. The specification is proven
+    infeasible if the upper bound is negative, or if concurrent tasks require
+    more agents than available. The faults explain which subformulae are
+    responsible.
+    '''
+
+    def __init__(self, robustness_lower, robustness_upper, faults):
+        self.robustness_lower = robustness_lower
+        self.robustness_upper = robustness_upper
+        self.faults = faults
+
+    @property
+    def infeasible(self):
+        return bool(self.faults)
+
+    def __str__(self):
+        s = 'Robustness bounds: [{}, {}]'.format(self.robustness_lower,
+                                                 self.robustness_upper)
+        if self.infeasible:
+            s += '\nInfeasible:\n' + '\n'.join('  ' + str(fault)
+                                                for fault in self.faults)
+        return s
+
+
+def travel_times(ts, sources):
+    '''Computes the shortest travel times from the given states to all states.
+
+    Input
+    -----
+    - The transition system specifying the environment in compact form.
+    - Array of state indices.
+
+    Output
+    ------
+    Array of shape (sources, states) of shortest travel times. Unreachable
+    states have infinite travel times.
+    '''
+    graph = sp.csr_matrix((np.asarray(ts.weights, dtype=np.float64),
+                           np.asarray(ts.indices), np.asarray(ts.indptr)),
+                          shape=(ts.num_states, ts.num_states))
+    return np.atleast_2d(dijkstra(graph, directed=True,
+                                  indices=np.asarray(sources)))
+
+
+class CapabilityReachability(object):
+    '''Computes upper bounds on the number of agents with a capability that can
+    be at states labeled by a proposition at a given time.
+
+    The agents are grouped by their initial states, and the shortest travel
+    times are computed once from each initial state.
+    '''
+
+    def __init__(self, ts, agents):
+        '''Constructor'''
+        self.ts = ts
+        if isinstance(agents, Fleet):
+            counts = agents.capability_counts(ts)
+            self.starts = np.flatnonzero(counts.sum(axis=1))
+            self.capabilities = list(agents.capabilities)
+            self.capability_index = {c: n for n, c
+                                     in enumerate(self.capabilities)}
+            self.counts = counts[self.starts]
+        else:
+            self.__count_agents(agents)
+        self.totals = self.counts.sum(axis=0)
+        if len(self.starts):
+            self.times = travel_times(ts, self.starts)
+        else:
+            self.times = np.zeros((0, ts.num_states))
+        self.__prop_states = dict()
+
+    def __count_agents(self, agents):
+        '''Counts the agents with each capability at each initial state given
+        the list of agents (q, cap).
+        '''
+        ts = self.ts
+        starts = defaultdict(lambda: defaultdict(int))
+        for state, capabilities in agents:
+            for c in capabilities:
+                starts[ts.state_index[str(state)]][c] += 1
+        self.starts = np.array(sorted(starts), dtype=np.int64)
+        self.capabilities = sorted(set.union(set(), *[set(caps)
+                                                      for _, caps in agents]))
+        self.capability_index = {c: n for n, c in enumerate(self.capabilities)}
+        # number of agents with each capability at each initial state
+        self.counts = np.zeros((len(self.starts), len(self.capabilities)),
+                               dtype=np.int64)
+        for s, state in enumerate(self.starts.tolist()):
+            for c, n in starts[state].items():
+                self.counts[s, self.capability_index[c]] = n
+
+    def total(self, capability):
+        '''Returns the number of agents with the given capability.'''
+        if capability not in self.capability_index:
+            return 0
+        return int(self.totals[self.capability_index[capability]])
+
+    def prop_states(self, prop):
+        '''Returns the indices of the states labeled by `prop`.'''
+        if prop not in self.__prop_states:
+            self.__prop_states[prop] = self.ts.proposition_states(prop)
+        return self.__prop_states[prop]
+
+    def count(self, prop, capability, time):
+        '''Returns an upper bound on the number of agents with `capability` that
+        can be at each state labeled by `prop` at `time`.
+        '''
+        if capability not in self.capability_index:
+            return 0
+        states = self.prop_states(prop)
+        if len(states) == 0:
+            return 0
+        counts = self.counts[:, self.capability_index[capability]]
+        reachable = self.times[:, states] <= time
+        # agents are needed at every state labeled by the proposition
+        per_state = int(np.min(counts.dot(reachable)))
+        # each agent can be at a single labeled state
+        pooled = int(counts.dot(reachable.any(axis=1))) // len(states)
+        return min(per_state, pooled)
+
+
+class SpecificationAnalyzer(object):
+    '''Static analyzer computing bounds on the robustness of CaTL formulae with
+    respect to the team of agents and the travel times in the environment,
+    without building the MILP.
+
+    The robustness of a task T(d, p, {(c, n)}) is the number of agents with
+    capability `c` at the states labeled by `p` minus `n`, and the robustness
+    of a limit L(p, {(c, n)}) is `n` minus that number of agents. Resource
+    requests (h, q) are bounded similarly by the total amount of resource `h`.
+    Subformulae are evaluated over windows of possible evaluation times to
+    account for travel times.
+    '''
+
+    def __init__(self, ts, agents, resources=None):
+        '''Constructor'''
+        self.ts = ts
+        self.reachability = CapabilityReachability(ts, agents)
+        # total amount of each resource, see `PlanningVariables.set_resources`
+        self.resource_totals = {r: float(sum(d.get('initial', dict()).values()))
+                                for r, d in (resources or dict()).items()}
+
+    def resource_total(self, resource):
+        '''Returns the total amount of the given resource.'''
+        return self.resource_totals.get(resource, 0)
+
+    def analyze(self, ast):
+        '''Computes the feasibility report of the given CaTL formula.'''
+        faults = []
+        upper = self.upper(ast, 0, 0, faults)
+        lower = self.lower(ast, 0, 0)
+        faults.extend(self.concurrency_faults(ast))
+        report = FeasibilityReport(lower, upper, faults)
+        logging.debug('Feasibility analysis: %s', report)
+        return report
+
+    def upper(self, ast, t_min, t_max, faults):
+        '''Computes an upper bound of the robustness of the formula `ast` for
+        evaluation times in [t_min, t_max], and adds the explanations to
+        `faults` if the bound is negative.
+        '''
+        reach = self.reachability
+        if ast.op == Operation.BOOL:
+            value = INF if ast.value else -INF
+            if not ast.value:
+                faults.append(Fault(ast, 'false'))
+            return value
+        elif ast.op == Operation.PRED:
+            # the task must hold at its start time, bounded by t_max
+            value = INF
+            for c, n in ast.capability_requests:
+                available = reach.count(ast.proposition, c, t_max)
+                value = min(value, available - n)
+                if available < n:
+                    faults.append(Fault(ast, self.explain(ast.proposition, c, n,
+                                                          available, t_max)))
+            for h, q in ast.resource_requests:
+                total = self.resource_total(h)
+                value = min(value, total - q)
+                if total < q:
+                    faults.append(Fault(ast, 'requires {} of resource {} at '
+                        'the states labeled {}, but only {} is available'
+                        .format(q, h, ast.proposition, total)))
+            return value
+        elif ast.op == Operation.LIMIT:
+            return min([n for _, n in ast.capability_requests]
+                       + [q for _, q in ast.resource_requests] or [INF])
+        elif ast.op == Operation.AND:
+            children = []
+            for child in ast.children:
+                child_faults = []
+                children.append(self.upper(child, t_min, t_max, child_faults))
+                faults.extend(child_faults)
+            return min(children)
+        elif ast.op == Operation.OR:
+            child_faults = []
+            value = max([self.upper(child, t_min, t_max, child_faults)
+                         for child in ast.children])
+            if value < 0:
+                faults.extend(child_faults)
+            return value
+        elif ast.op == Operation.NOT:
+            value = -self.lower(ast.child, t_min, t_max)
+            if value < 0:
+                faults.append(Fault(ast, 'the negated subformula is always '
+                                         'satisfied'))
+            return value
+        elif ast.op == Operation.IMPLIES:
+            left = -self.lower(ast.left, t_min, t_max)
+            child_faults = []
+            right = self.upper(ast.right, t_min, t_max, child_faults)
+            value = max(left, right)
+            if value < 0:
+                faults.append(Fault(ast, 'the antecedent is always satisfied'))
+                faults.extend(child_faults)
+            return value
+        elif ast.op == Operation.EVENT:
+            return self.upper(ast.child, t_min + ast.low, t_max + ast.high,
+                              faults)
+        elif ast.op == Operation.ALWAYS:
+            # the child must hold at the beginning of the interval
+            return self.upper(ast.child, t_min + ast.low, t_max + ast.low,
+                              faults)
+        elif ast.op == Operation.UNTIL:
+            return self.upper(ast.right, t_min + ast.low, t_max + ast.high,
+                              faults)
+        raise ValueError('Unknown operation {}!'.format(ast.op))
+
+    def lower(self, ast, t_min, t_max):
+        '''Computes a lower bound of the robustness of the formula `ast` for
+        evaluation times in [t_min, t_max].
+        '''
+        reach = self.reachability
+        if ast.op == Operation.BOOL:
+            return INF if ast.value else -INF
+        elif ast.op == Operation.PRED:
+            return -max([n for _, n in ast.capability_requests]
+                        + [q for _, q in ast.resource_requests])
+        elif ast.op == Operation.LIMIT:
+            return min([n - reach.total(c) for c, n in ast.capability_requests]
+                       + [q - self.resource_total(h)
+                          for h, q in ast.resource_requests] or [INF])
+        elif ast.op == Operation.AND:
+            return min([self.lower(ch, t_min, t_max) for ch in ast.children])
+        elif ast.op == Operation.OR:
+            return max([self.lower(ch, t_min, t_max) for ch in ast.children])
+        elif ast.op == Operation.NOT:
+            return -self.upper(ast.child, t_min, t_max, [])
+        elif ast.op == Operation.IMPLIES:
+            return max(-self.upper(ast.left, t_min, t_max, []),
+                       self.lower(ast.right, t_min, t_max))
+        elif ast.op == Operation.EVENT:
+            return self.lower(ast.child, t_min + ast.low, t_max + ast.low)
+        elif ast.op == Operation.ALWAYS:
+            return self.lower(ast.child, t_min + ast.low, t_max + ast.high)
+        elif ast.op == Operation.UNTIL:
+            return min(self.lower(ast.left, t_min, t_max + ast.low),
+                       self.lower(ast.right, t_min + ast.low, t_max + ast.low))
+        raise ValueError('Unknown operation {}!'.format(ast.op))
+
+    def explain(self, prop, capability, n, available, time):
+        '''Returns the reason why not enough agents are available.'''
+        num_states = len(self.reachability.prop_states(prop))
+        total = self.reachability.total(capability)
+        if total < n * num_states:
+            return ('requires {} agent(s) with capability {} at each of the {} '
+                    'state(s) labeled {}, but the team has only {}'.format(
+                        n, capability, num_states, prop, total))
+        return ('requires {} agent(s) with capability {} at each state labeled '
+                '{}, but at most {} can be there by time {}'.format(
+                    n, capability, prop, available, time))
+
+    def definite_tasks(self, ast, t_min=0, t_max=0):
+        '''Returns the tasks in `ast` that must hold over definite time
+        intervals as a list of tuples (start, end, task). Only conjunctions,
+        always, and eventually operators with singular intervals are traversed.
+        '''
+        if t_min != t_max:
+            return []
+        if ast.op == Operation.PRED:
+            return [(t_min, t_min + ast.duration, ast)]
+        elif ast.op == Operation.AND:
+            return [task for child in ast.children
+                         for task in self.definite_tasks(child, t_min, t_max)]
+        elif ast.op == Operation.ALWAYS and ast.child.op == Operation.PRED:
+            return [(t_min + ast.low, t_min + ast.high + ast.child.duration,
+                     ast.child)]
+        elif ast.op == Operation.EVENT and ast.low == ast.high:
+            return self.definite_tasks(ast.child, t_min + ast.low,
+                                       t_max + ast.low)
+        return []
+
+    def concurrency_faults(self, ast):
+        '''Checks that the tasks that must hold at the same time do not require
+        more agents with a capability than available in the team. Each state
+        labeled by a task's proposition needs the requested number of agents.
+        '''
+        tasks = self.definite_tasks(ast)
+        times = sorted({start for start, _, _ in tasks})
+        faults = []
+        reported = set()
+        for time in times:
+            # maximum request per (proposition, capability) at this time
+            requests = defaultdict(int)
+            active = defaultdict(list)
+            for start, end, task in tasks:
+                if start <= time <= end:
+                    for c, n in task.capability_requests:
+                        key = (task.proposition, c)
+                        requests[key] = max(requests[key], n)
+                        active[c].append(task)
+            required = defaultdict(int)
+            for (prop, c), n in requests.items():
+                required[c] += n * len(self.reachability.prop_states(prop))
+            for c, n in required.items():
+                total = self.reachability.total(c)
+                key = (c, tuple(sorted(set(map(str, active[c])))))
+                if n > total and len(active[c]) > 1 and key not in reported:
+                    reported.add(key)
+                    formula = ' && '.join(key[1])
+                    faults.append(Fault(formula, 'concurrent tasks at time {} '
+                        'require {} agent(s) with capability {}, but the team '
+                        'has only {}'.format(time, n, c, total)))
+        return faults
+
+
+def check_feasibility(ts, agents, ast, resources=None):
+    '''Analyzes the CaTL specification `ast` with respect to the team of agents
+    and the environment. See `SpecificationAnalyzer`.
+
+    Input
+    -----
+    - The transition system specifying the environment in compact form.
+    - List of agents, where agents are tuples (q, cap), q is the initial state
+    of the agent, and cap is the set of capabilities.
+    - The AST of the CaTL specification formula.
+    - The resources carried by the agents (default: none), see
+    `route_planning`.
+
+    Output
+    ------
+    The feasibility report.
+    '''
+    return SpecificationAnalyzer(ts, agents, resources).analyze(ast)
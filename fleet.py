@@ -0,0 +1,233 @@
+'''
+ Copyright (C) 2020 Cristian Ioan Vasile <cvasile@lehigh.edu>
+ Explainable Robotics Lab (ERL), Autonomous and Intelligent Robotics (AIR) Lab,
+ Lehigh University
+ See license.txt file for license information.
+'''
+
+import re
+import csv
+import itertools
+from collections import defaultdict
+
+import numpy as np
+
+
+MAX_CAPABILITIES = 64
+
+
+class Fleet(object):
+    '''Array representation of a fleet of agents.
+
+    Agent `a` starts at state `states[a]` and has the set of capabilities
+    encoded by the bitmask `masks[a]`, i.e., capability `capabilities[k]` is
+    encoded by bit k. The capabilities are sorted, such that the encoding
+    matches `compute_capability_bitmap`.
+    '''
+
+    def __init__(self, states, masks, capabilities):
+        '''Constructor'''
+        self.states = np.asarray(states, dtype=np.str_)
+        self.masks = np.asarray(masks, dtype=np.uint64)
+        self.capabilities = list(capabilities)
+        assert len(self.states) == len(self.masks), 'Mismatched fleet arrays!'
+        assert self.capabilities == sorted(self.capabilities), \
+                                            'The capabilities must be sorted!'
+        self.__classes = None
+
+    def __len__(self):
+        return len(self.states)
+
+    def __iter__(self):
+        '''Iterates over the agents as tuples (q, cap), see `route_planning`.'''
+        classes = self.class_capability_sets()
+        _, inverse = self.classes()
+        for state, j in zip(self.states.tolist(), inverse.tolist()):
+            yield state, set(classes[j])
+
+    @classmethod
+    def from_masks(cls, states, masks, capabilities):
+        '''Creates the fleet from bitmasks over a list of capabilities in
+        arbitrary order. The bits are reordered such that the capabilities are
+        sorted.
+        '''
+        if len(capabilities) > MAX_CAPABILITIES:
+            raise ValueError('At most {} capabilities are supported!'
+                             .format(MAX_CAPABILITIES))
+        order = sorted(range(len(capabilities)), key=lambda k: capabilities[k])
+        masks = np.asarray(masks, dtype=np.uint64)
+        sorted_masks = np.zeros_like(masks)
+        for position, k in enumerate(order):
+            bit = (masks >> np.uint64(k)) & np.uint64(1)
+            sorted_masks |= bit << np.uint64(position)
+        return cls(states, sorted_masks, [capabilities[k] for k in order])
+
+    @classmethod
+    def from_agents(cls, agents):
+        '''Creates the fleet from a list of agents (q, cap).'''
+        encoder = CapabilityEncoder()
+        states, masks = [], []
+        for state, capabilities in agents:
+            states.append(state)
+            masks.append(encoder.encode(capabilities))
+        return cls.from_masks(states, masks, encoder.capabilities)
+
+    @classmethod
+    def from_csv(cls, filename, delimiter=',', chunk_size=1<<16):
+        '''Reads the fleet from a CSV manifest with one agent per row given by
+        the initial state and the capabilities separated by spaces or
+        semicolons, e.g.,
+
+            state,capabilities
+            q1,UV;Mo
+            q4,IR UV
+
+        The manifest is streamed in chunks of `chunk_size` rows, each chunk is
+        converted to a string array, and the capability strings are encoded
+        once per distinct string.
+        '''
+        encoder = CapabilityEncoder()
+        states = [np.array([], dtype=np.str_)]
+        masks = [np.array([], dtype=np.uint64)]
+        with open(filename, 'r') as fin:
+            rows = ((row + [''])[:2]
+                    for row in csv.reader(fin, delimiter=delimiter)
+                    if row and not row[0].startswith('#'))
+            header = True
+            while True:
+                chunk = list(itertools.islice(rows, chunk_size))
+                if not chunk:
+                    break
+                table = np.char.strip(np.array(chunk, dtype=np.str_))
+                if header and table[0, 0] == 'state':
+                    table = table[1:]
+                header = False
+                texts, inverse = np.unique(table[:, 1], return_inverse=True)
+                codes = np.array([encoder.encode_string(text)
+                                  for text in texts.tolist()], dtype=np.uint64)
+                states.append(table[:, 0])
+                masks.append(codes[inverse.ravel()])
+        return cls.from_masks(np.concatenate(states), np.concatenate(masks),
+                              encoder.capabilities)
+
+    @classmethod
+    def from_npz(cls, filename):
+        '''Loads the fleet from an NPZ file with the arrays `states`, `masks`,
+        and `capabilities`. The bits of the masks correspond to the order of the
+        capabilities in the file.
+        '''
+        with np.load(filename) as data:
+            return cls.from_masks(data['states'], data['masks'],
+                                  data['capabilities'].tolist())
+
+    def save_npz(self, filename):
+        '''Saves the fleet to an NPZ file.'''
+        np.savez_compressed(filename, states=self.states, masks=self.masks,
+                            capabilities=np.array(self.capabilities,
+                                                  dtype=np.str_))
+
+    def classes(self):
+        '''Returns the pair of the sorted array of class encodings, and the array
+        of the class indices of the agents.
+        '''
+        if self.__classes is None:
+            self.__classes = np.unique(self.masks, return_inverse=True)
+        return self.__classes
+
+    def class_capability_sets(self):
+        '''Returns the list of the capability sets of the classes.'''
+        codes, _ = self.classes()
+        return [frozenset(c for k, c in enumerate(self.capabilities)
+                          if (code >> k) & 1) for code in codes.tolist()]
+
+    def class_capabilities(self):
+        '''Returns the boolean matrix of shape (classes, capabilities)
+        indicating which capabilities each class has.
+        '''
+        codes, _ = self.classes()
+        bits = np.arange(len(self.capabilities), dtype=np.uint64)
+        return ((codes[:, np.newaxis] >> bits) & np.uint64(1)).astype(bool)
+
+    def state_indices(self, ts):
+        '''Returns the indices of the initial states of the agents in the
+        compact transition system `ts`.
+        '''
+        unique, inverse = np.unique(self.states, return_inverse=True)
+        try:
+            index = np.array([ts.state_index[str(u)]
+                              for u in unique.tolist()],
+                             dtype=np.int64)
+        except KeyError as error:
+            raise ValueError('State {} not in TS!'.format(error))
+        return index[inverse]
+
+    def distribution(self, ts):
+        '''Returns the integer array of shape (states, classes) of the number of
+        agents of each class at each state of the compact transition system.
+        '''
+        codes, inverse = self.classes()
+        flat = self.state_indices(ts) * len(codes) + inverse
+        counts = np.bincount(flat, minlength=ts.num_states * len(codes))
+        return counts.reshape(ts.num_states, len(codes))
+
+    def capability_counts(self, ts):
+        '''Returns the integer array of shape (states, capabilities) of the
+        number of agents with each capability at each state.
+        '''
+        return self.distribution(ts).dot(
+                                self.class_capabilities().astype(np.int64))
+
+    def capability_bitmap(self):
+        '''Returns the capability encoding, see `compute_capability_bitmap`.'''
+        return {c: 1<<k for k, c in enumerate(self.capabilities)}
+
+    def agent_classes(self):
+        '''Returns the agent classes, see `compute_agent_classes`.'''
+        codes, _ = self.classes()
+        return dict(zip(self.class_capability_sets(), codes.tolist()))
+
+    def capability_distribution(self, ts):
+        '''Returns the initial distribution of the agent classes, see
+        `compute_initial_capability_distribution`.
+        '''
+        codes, _ = self.classes()
+        counts = self.distribution(ts)
+        states = ts.states.tolist()
+        distribution = {u: defaultdict(int) for u in states}
+        for i, j in zip(*np.nonzero(counts)):
+            distribution[states[i]][int(codes[j])] = int(counts[i, j])
+        return distribution
+
+
+class CapabilityEncoder(object):
+    '''Assigns bits to capabilities in the order they are encountered, and
+    memoizes the encodings of capability sets.
+    '''
+
+    SEPARATORS = re.compile(r'[;\s]+')
+
+    def __init__(self):
+        '''Constructor'''
+        self.capabilities = []
+        self.bits = dict()
+        self.memo = dict()
+
+    def encode(self, capabilities):
+        '''Returns the bitmask of the set of capabilities.'''
+        mask = 0
+        for c in capabilities:
+            if c not in self.bits:
+                if len(self.bits) == MAX_CAPABILITIES:
+                    raise ValueError('At most {} capabilities are supported!'
+                                     .format(MAX_CAPABILITIES))
+                self.bits[c] = len(self.capabilities)
+                self.capabilities.append(c)
+            mask |= 1 << self.bits[c]
+        return mask
+
+    def encode_string(self, text):
+        '''Returns the bitmask of the capabilities listed in `text`.'''
+        if text not in self.memo:
+            capabilities = [c for c in self.SEPARATORS.split(text.strip()) if c]
+            self.memo[text] = self.encode(capabilities)
+        return self.memo[text]
@@ -0,0 +1,349 @@
+'''
+ Copyright (C) 2020 Cristian Ioan Vasile <cvasile@lehigh.edu>
+ Explainable Robotics Lab (ERL), Autonomous and Intelligent Robotics (AIR) Lab,
+ Lehigh University
+ See license.txt file for license information.
+'''
+
+import logging
+
+from gurobipy import Model as GRBModel
+
+from stl import Operation as STLOperation
+from stl.stl2milp import stl2milp
+from catl import CATLFormula
+from catl import catl2stl
+from compact_ts import CompactTs
+from route_planning import compute_planning_variables, create_system_variables
+from route_planning import add_system_constraints, add_proposition_constraints
+from route_planning import add_travel_time_objective, extract_propositions
+from route_planning import optimize, log_status
+
+
+def check_stl2milp(stl_milp):
+    '''Checks that the MILP encoding object exposes the memoization used by
+    `IncrementalEncoder`.
+    '''
+    variables = getattr(stl_milp, 'variables', None)
+    if not isinstance(variables, dict) \
+            or not callable(getattr(stl_milp, 'to_milp', None)) \
+            or not hasattr(stl_milp, 'model'):
+        raise TypeError('Incompatible stl2milp version: incremental encoding '
+                        'requires the `variables` memoization dictionary, and '
+                        'the `to_milp` method and `model` attribute!')
+
+
+class RecordingModel(object):
+    '''Proxy of a Gurobi model that records the variables and constraints
+    added through it in the lists `added_vars` and `added_constrs`.
+    '''
+
+    def __init__(self, model):
+        '''Constructor'''
+        self.model = model
+        self.added_vars = []
+        self.added_constrs = []
+
+    def addVar(self, *args, **kwargs):
+        v = self.model.addVar(*args, **kwargs)
+        self.added_vars.append(v)
+        return v
+
+    def addConstr(self, *args, **kwargs):
+        c = self.model.addConstr(*args, **kwargs)
+        self.added_constrs.append(c)
+        return c
+
+    def __getattr__(self, name):
+        return getattr(self.model, name)
+
+    def record(self):
+        '''Returns the variables and constraints recorded so far, and resets
+        the records.
+        '''
+        recorded = self.added_vars, self.added_constrs
+        self.added_vars, self.added_constrs = [], []
+        return recorded
+
+
+class IncrementalEncoder(object):
+    '''Incremental MILP encoding of a specification given as a set of blocks,
+    i.e., CaTL formulae with time offsets. The encoding of each STL subformula
+    at each time, i.e., its satisfaction variable and constraints, is shared by
+    all blocks, and is reference counted. Updating the blocks encodes only the
+    subformulae that are not encoded yet, and removes the encodings that are no
+    longer used from the live model.
+
+    Note
+    ----
+    The encoder relies on the memoization of `stl2milp`, i.e., the dictionary
+    `variables` from subformulae to dictionaries from times to satisfaction
+    variables, the method `to_milp`, and the attribute `model`, see
+    `check_stl2milp`. The encodings of subformulae that were encoded outside of
+    the encoder, or with unknown operators, are never removed, and neither are
+    the variables of the STL formula, e.g., z_{prop}_{cap}_k.
+    '''
+
+    def __init__(self, m, stl_milp, variables):
+        '''Constructor
+
+        Input
+        -----
+        - The Gurobi model variable.
+        - The MILP encoding object with ranges for all variables z_{prop}_{cap}.
+        - The registry of planning variables with the proposition-state
+        variables.
+        '''
+        check_stl2milp(stl_milp)
+        self.m = m
+        self.stl_milp = stl_milp
+        self.variables = variables
+        self.recorder = RecordingModel(m)
+        stl_milp.model = self.recorder
+
+        self.stl_formulae = dict() # memoized catl2stl translations
+        self.items = dict() # encoding key to (variables, constraints)
+        self.refcount = dict()
+        self.dependencies = dict()
+        self.pinned = set()
+        self.blocks = dict() # block key to (encoding key, constraint)
+        self.state_variables = {'{}_{}'.format(p, c): (p, n)
+                        for p in variables.ts.propositions.tolist()
+                        for n, c in enumerate(variables.capabilities)}
+
+    def stl(self, ast):
+        '''Returns the memoized STL translation of the CaTL formula.'''
+        key = str(ast)
+        if key not in self.stl_formulae:
+            self.stl_formulae[key] = catl2stl(ast)
+        return self.stl_formulae[key]
+
+    @staticmethod
+    def children(formula, t):
+        '''Returns the list of encoding keys of the subformulae used by the
+        encoding of `formula` at time `t`, or None if they are not known.
+        '''
+        if formula.op in (STLOperation.PRED, STLOperation.BOOL):
+            return []
+        elif formula.op in (STLOperation.AND, STLOperation.OR):
+            return [(child, t) for child in formula.children]
+        elif formula.op == STLOperation.NOT:
+            return [(formula.child, t)]
+        elif formula.op == STLOperation.IMPLIES:
+            return [(formula.left, t), (formula.right, t)]
+        elif formula.op in (STLOperation.EVENT, STLOperation.ALWAYS):
+            return [(formula.child, t + tau)
+                    for tau in range(int(formula.low), int(formula.high) + 1)]
+        elif formula.op == STLOperation.UNTIL:
+            low, high = int(formula.low), int(formula.high)
+            return ([(formula.left, t + tau) for tau in range(high + 1)]
+                    + [(formula.right, t + tau)
+                       for tau in range(low, high + 1)])
+        return None
+
+    def is_encoded(self, key):
+        formula, t = key
+        return t in self.stl_milp.variables.get(formula, dict())
+
+    def acquire(self, key):
+        '''Increments the reference count of the encoding of the subformula at
+        the given time, and encodes it if necessary.
+        '''
+        if key in self.refcount:
+            self.refcount[key] += 1
+            return
+        formula, t = key
+        if self.is_encoded(key): # encoded outside of the encoder
+            self.pinned.add(key)
+        children = self.children(formula, t)
+        if children is not None:
+            for child in children:
+                self.acquire(child)
+
+        new_states = self.new_state_variables(formula, t)
+        self.recorder.record()
+        self.stl_milp.to_milp(formula, t)
+        added_vars, added_constrs = self.recorder.record()
+        if children is None:
+            self.pinned.add(key) # shares unknown subformulae
+        state_vars = set(id(self.stl_milp.variables[v][k])
+                         for v, k in new_states)
+        added_vars = [v for v in added_vars if id(v) not in state_vars]
+        self.add_min_prop_constraints(new_states)
+
+        self.items[key] = (added_vars, added_constrs)
+        self.dependencies[key] = children or []
+        self.refcount[key] = 1
+
+    def release(self, key):
+        '''Decrements the reference count of the encoding of the subformula at
+        the given time, and removes it from the model if it is not used.
+        '''
+        self.refcount[key] -= 1
+        if self.refcount[key] > 0 or key in self.pinned:
+            return
+        added_vars, added_constrs = self.items.pop(key)
+        self.m.remove(added_constrs)
+        self.m.remove(added_vars)
+        formula, t = key
+        del self.stl_milp.variables[formula][t]
+        del self.refcount[key]
+        for child in self.dependencies.pop(key):
+            self.release(child)
+
+    def new_state_variables(self, formula, t):
+        '''Returns the list of pairs (variable, time) of the STL variables that
+        are created by the encoding of the predicate `formula` at time `t`.
+        '''
+        if formula.op != STLOperation.PRED:
+            return []
+        variable = formula.variable
+        if t in self.stl_milp.variables.get(variable, dict()):
+            return []
+        return [(variable, t)]
+
+    def add_min_prop_constraints(self, state_variables):
+        '''Adds the constraints relating the new STL variables to the
+        proposition-state variables, see `add_proposition_constraints`.
+        '''
+        variables = self.variables
+        states = variables.ts.states.tolist()
+        for variable, k in state_variables:
+            prop, n = self.state_variables[variable]
+            stl_var = self.stl_milp.variables[variable][k]
+            for l in variables.proposition_labels(prop).tolist():
+                name = 'min_prop_{}_{}_{}_{}'.format(prop,
+                                variables.capabilities[n], k,
+                                states[variables.label_states[l]])
+                constraint = self.m.addConstr(
+                                stl_var <= variables.prop_vars[l, n, k], name)
+                self.m._min_prop.append(constraint)
+
+    def update(self, blocks):
+        '''Updates the encoding such that the specification is the conjunction
+        of the given blocks.
+
+        Input
+        -----
+        List of pairs (CaTL formula AST, time offset), where each formula must
+        hold at its time offset.
+
+        Output
+        ------
+        Pair of the numbers of added and removed blocks.
+
+        Note
+        ----
+        All the new blocks are validated before the model is changed, i.e., the
+        encoding is left unchanged if any block exceeds the time bound or uses
+        unknown propositions.
+        '''
+        time_bound = self.variables.time_bound
+        requested = {(str(ast), int(offset)): (ast, int(offset))
+                     for ast, offset in blocks}
+
+        added = [key for key in requested if key not in self.blocks]
+        formulae = dict()
+        for key in added:
+            ast, offset = requested[key]
+            extract_propositions(self.variables.ts, ast)
+            formula = self.stl(ast)
+            if offset + formula.bound() > time_bound:
+                raise ValueError('Block {} at time {} exceeds the time bound!'
+                                 .format(ast, offset))
+            formulae[key] = formula
+
+        removed = [key for key in self.blocks if key not in requested]
+        for key in removed:
+            encoding_key, constraint = self.blocks.pop(key)
+            self.m.remove(constraint)
+            self.release(encoding_key)
+
+        for key in added:
+            formula, offset = formulae[key], requested[key][1]
+            encoding_key = (formula, offset)
+            self.acquire(encoding_key)
+            z = self.stl_milp.variables[formula][offset]
+            constraint = self.m.addConstr(z == 1, 'satisfaction_{}_{}'.format(
+                                            formula.identifier(), offset))
+            self.blocks[key] = (encoding_key, constraint)
+
+        logging.info('Specification update: %d blocks added, %d removed, '
+                     '%d subformula encodings', len(added), len(removed),
+                     len(self.refcount))
+        return len(added), len(removed)
+
+
+class IncrementalPlanner(object):
+    '''Route planner that keeps the system model and the encoding of the
+    specification live between planning cycles, see `IncrementalEncoder`.
+
+    Note
+    ----
+    Unlike `route_planning`, the upper bounds of the variables are not
+    tightened, since they depend on the specification, i.e., the models
+    correspond to `route_planning` with `tight_bounds=False`.
+    '''
+
+    def __init__(self, ts, agents, time_bound, variable_bound=None,
+                 robust=True, travel_time_weight=0):
+        '''Constructor
+
+        Input
+        -----
+        - The transition system and agents, see `route_planning`.
+        - The time bound of the model.
+        - The upper bound for variables (default: the number of agents).
+        - Flag indicating whether to solve the robust or feasibility problem.
+        - The weight of the travel time regularization (default: 0).
+        '''
+        if not isinstance(ts, CompactTs):
+            ts = CompactTs.from_ts(ts)
+        if variable_bound is None:
+            variable_bound = len(agents)
+
+        variables, _, capability_distribution = \
+                            compute_planning_variables(ts, agents, time_bound)
+        m = GRBModel('milp')
+        m._callbacks = []
+        create_system_variables(m, variables, variable_bound)
+        add_system_constraints(m, variables, capability_distribution)
+
+        ranges = {'{}_{}'.format(p, c): (0, len(agents))
+                  for p in ts.propositions.tolist()
+                  for c in variables.capabilities}
+        stl_milp = stl2milp(None, ranges=ranges, model=m, robust=robust)
+        m._rho = stl_milp.rho if robust else None
+        m._prop_state, m._min_prop = add_proposition_constraints(m, stl_milp,
+                                            variables, None, variable_bound)
+        m._variables = variables
+
+        # add travel time regularization
+        if travel_time_weight > 0:
+            add_travel_time_objective(m, variables, travel_time_weight,
+                                      variable_bound)
+
+        self.m = m
+        self.encoder = IncrementalEncoder(m, stl_milp, variables)
+
+    def plan(self, specification):
+        '''Updates the specification and solves the model.
+
+        Input
+        -----
+        The specification given as a CaTL formula (string or AST) that must
+        hold at time 0, or as a list of pairs (CaTL formula, time offset).
+
+        Output
+        ------
+        The Gurobi model, see `route_planning`.
+        '''
+        if not isinstance(specification, list):
+            specification = [(specification, 0)]
+        blocks = [(ast if isinstance(ast, CATLFormula)
+                   else CATLFormula.from_formula(ast), offset)
+                  for ast, offset in specification]
+        self.encoder.update(blocks)
+        optimize(self.m)
+        log_status(self.m)
+        return self.m
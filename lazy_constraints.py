@@ -0,0 +1,107 @@
+'''
+ Copyright (C) 2020 Cristian Ioan Vasile <cvasile@lehigh.edu>
+ Explainable Robotics Lab (ERL), Autonomous and Intelligent Robotics (AIR) Lab,
+ Lehigh University
+ See license.txt file for license information.
+'''
+
+import numpy as np
+
+from gurobipy import GRB
+from gurobipy import quicksum
+
+
+LAZY_MODES = (None, 'attribute', 'callback')
+
+
+class PropositionSeparator(object):
+    '''Separation callback for the proposition constraints. The constraints
+    relating the proposition-state variables to the system states (prop_state)
+    and the constraints relating the variables of the STL formula to the
+    proposition-state variables (min_prop) are not added to the model, and are
+    instead added as lazy constraints when violated by an incumbent or by the
+    relaxation solution at a node.
+
+    Note
+    ----
+    The callback requires the `LazyConstraints` parameter to be set. The
+    attribute `_rejected` of the model is set when an incumbent is cut off.
+    '''
+
+    def __init__(self, variables, min_props, tolerance=1e-6):
+        '''Constructor
+
+        Input
+        -----
+        - The registry of planning variables.
+        - List of tuples (z_{prop}_{cap}_k, l, n, k) such that the STL variable
+        z_{prop}_{cap}_k is bounded by the proposition-state variable
+        `prop_vars[l, n, k]`.
+        - The violation tolerance.
+        '''
+        self.variables = variables
+        self.tolerance = tolerance
+        self.stl_vars = [v for v, _, _, _ in min_props]
+        index = np.array([(l, n, k) for _, l, n, k in min_props],
+                         dtype=np.int64).reshape(-1, 3)
+        self.prop_index = np.ravel_multi_index(tuple(index.T),
+                                               variables.shape('prop'))
+        self.capability_classes = [np.flatnonzero(column) for column
+                                   in variables.class_capabilities.T]
+
+    def values(self, model, where):
+        '''Returns the values of the state, proposition-state, and STL variables
+        retrieved with a single call.
+        '''
+        state_vars = self.variables.state_vars
+        prop_vars = self.variables.prop_vars
+        handles = (state_vars.ravel().tolist() + prop_vars.ravel().tolist()
+                   + self.stl_vars)
+        if where == GRB.Callback.MIPSOL:
+            values = model.cbGetSolution(handles)
+        else:
+            values = model.cbGetNodeRel(handles)
+        values = np.array(values, dtype=np.float64)
+        offset = state_vars.size + prop_vars.size
+        return (values[:state_vars.size].reshape(state_vars.shape),
+                values[state_vars.size:offset].reshape(prop_vars.shape),
+                values[offset:])
+
+    def __call__(self, model, where):
+        if where == GRB.Callback.MIPNODE:
+            if model.cbGet(GRB.Callback.MIPNODE_STATUS) != GRB.Status.OPTIMAL:
+                return
+        elif where != GRB.Callback.MIPSOL:
+            return
+
+        variables = self.variables
+        state_vars, prop_vars = variables.state_vars, variables.prop_vars
+        state_values, prop_values, stl_values = self.values(model, where)
+
+        added = 0
+
+        # constraints relating (proposition, state) pairs to system states
+        counts = np.zeros((variables.ts.num_states,) + prop_values.shape[1:])
+        np.add.at(counts, variables.label_states, prop_values)
+        team = np.einsum('igk,gc->ick', state_values,
+                         variables.class_capabilities.astype(np.float64))
+        violated = np.abs(counts - team) > self.tolerance
+        for i, n, k in zip(*np.nonzero(violated)):
+            labels = variables.state_labels(i)
+            classes = self.capability_classes[n]
+            equality = quicksum(prop_vars[labels, n, k])
+            equality -= quicksum(state_vars[i, classes, k])
+            model.cbLazy(equality == 0)
+            added += 1
+
+        # constraints relating STL variables to proposition-state variables
+        flat_prop_vars = prop_vars.ravel()
+        bounds = prop_values.ravel()[self.prop_index]
+        for r in np.flatnonzero(stl_values > bounds + self.tolerance):
+            model.cbLazy(self.stl_vars[r]
+                         <= flat_prop_vars[self.prop_index[r]])
+            added += 1
+
+        if where == GRB.Callback.MIPSOL:
+            # callbacks called after the separation skip rejected incumbents
+            model._rejected = added > 0
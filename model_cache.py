@@ -0,0 +1,327 @@
+'''
+ Copyright (C) 2020 Cristian Ioan Vasile <cvasile@lehigh.edu>
+ Explainable Robotics Lab (ERL), Autonomous and Intelligent Robotics (AIR) Lab,
+ Lehigh University
+ See license.txt file for license information.
+'''
+
+import os
+import json
+import shutil
+import hashlib
+import logging
+
+import numpy as np
+import scipy.sparse as sp
+
+from gurobipy import Model as GRBModel
+from gurobipy import LinExpr
+
+
+def scenario_fingerprint(ts, agent_classes, capability_distribution,
+                         time_bound, ast, **options):
+    '''Computes a content hash identifying a route planning MILP.
+
+    Input
+    -----
+    - The transition system specifying the environment in compact form.
+    - The agent classes given as a dictionary from frozen sets of capabilities
+    to bitmaps (integers).
+    - The initial distribution of capabilities at each state.
+    - Time bound.
+    - The AST of the CaTL specification formula.
+    - Encoding options (e.g., robust, variable bound) as keyword arguments.
+
+    Output
+    ------
+    Hexadecimal string that changes whenever any of the inputs change.
+    '''
+    h = hashlib.sha256()
+    for name in ('states', 'propositions', 'bitsets', 'indptr', 'indices',
+                 'weights'):
+        array = np.ascontiguousarray(getattr(ts, name))
+        h.update(name.encode('utf-8'))
+        h.update(str(array.dtype).encode('utf-8'))
+        h.update(array.tobytes())
+
+    classes = sorted((sorted(g), enc) for g, enc in agent_classes.items())
+    distribution = sorted((str(u), enc, n)
+                          for u, dist in capability_distribution.items()
+                              for enc, n in dist.items() if n > 0)
+    scenario = {
+        'classes': classes,
+        'distribution': distribution,
+        'time_bound': time_bound,
+        'formula': str(ast),
+        'options': sorted((k, repr(v)) for k, v in options.items()),
+    }
+    h.update(json.dumps(scenario, sort_keys=True).encode('utf-8'))
+    return h.hexdigest()
+
+
+class ModelCache(object):
+    '''On-disk cache of assembled MILPs keyed by scenario fingerprints.
+
+    Each entry is a directory holding the constraint matrix in CSR form, the
+    variable bounds and types, the constraint senses, right-hand sides, and
+    lazy attributes, the objectives, and arbitrary integer index maps as
+    separate `.npy` files, such that they can be loaded with memory mapping.
+    The total size of the cache is kept under `max_size` bytes by evicting the
+    least recently used entries.
+
+    The cache may be shared by several processes. Entries are written to
+    private temporary directories and renamed into place atomically, and an
+    entry that is already stored by another process is kept. Entries are
+    removed by renaming them out of place first, such that a missing or
+    partially removed entry is a cache miss. Eviction is not coordinated
+    between processes, thus only one process should evict, i.e., the other
+    processes set `evict_on_store` to False.
+    '''
+
+    def __init__(self, directory, max_size=1<<30, evict_on_store=True):
+        '''Constructor'''
+        self.directory = directory
+        self.max_size = max_size
+        self.evict_on_store = evict_on_store
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+
+    def entry_path(self, key):
+        '''Returns the directory of the cache entry with the given key.'''
+        return os.path.join(self.directory, key)
+
+    def __contains__(self, key):
+        return os.path.isfile(os.path.join(self.entry_path(key), 'meta.json'))
+
+    def store(self, key, m, index_maps, metadata=None):
+        '''Saves the model `m` under `key`.
+
+        Input
+        -----
+        - The cache key, see `scenario_fingerprint`.
+        - The Gurobi model variable.
+        - Dictionary of integer arrays mapping problem entities to variable
+        indices.
+        - JSON serializable data needed to interpret the index maps.
+
+        Output
+        ------
+        Flag indicating whether the model was stored.
+        '''
+        m.update()
+        if m.NumQConstrs > 0 or m.NumGenConstrs > 0 or m.NumSOS > 0:
+            logging.warning('Model cache supports only linear constraints, '
+                            'not caching model %s', key)
+            return False
+
+        variables = m.getVars()
+        constrs = m.getConstrs()
+        A = m.getA().tocsr()
+
+        arrays = {
+            'indptr': A.indptr,
+            'indices': A.indices,
+            'data': A.data,
+            'lb': np.array(m.getAttr('LB', variables), dtype=np.float64),
+            'ub': np.array(m.getAttr('UB', variables), dtype=np.float64),
+            'vtype': np.array(m.getAttr('VType', variables), dtype='S1'),
+            'sense': np.array(m.getAttr('Sense', constrs), dtype='S1'),
+            'rhs': np.array(m.getAttr('RHS', constrs), dtype=np.float64),
+            'lazy': np.array(m.getAttr('Lazy', constrs), dtype=np.int8),
+        }
+        objectives = []
+        if m.IsMultiObj:
+            for i in range(m.NumObj):
+                m.params.ObjNumber = i
+                arrays['obj_{}'.format(i)] = np.array(
+                            m.getAttr('ObjN', variables), dtype=np.float64)
+                objectives.append({'constant': m.ObjNCon,
+                                   'weight': m.ObjNWeight,
+                                   'priority': m.ObjNPriority})
+        else:
+            arrays['obj'] = np.array(m.getAttr('Obj', variables),
+                                     dtype=np.float64)
+        for name, array in index_maps.items():
+            arrays['index_' + name] = np.asarray(array)
+
+        meta = {
+            'name': m.ModelName,
+            'shape': [m.NumConstrs, m.NumVars],
+            'sense': m.ModelSense,
+            'objective_constant': m.ObjCon,
+            'objectives': objectives,
+            'index_maps': sorted(index_maps),
+            'metadata': metadata,
+        }
+
+        path = self.entry_path(key)
+        tmp_path = path + '.tmp{}'.format(os.getpid())
+        if os.path.isdir(tmp_path):
+            shutil.rmtree(tmp_path)
+        os.makedirs(tmp_path)
+        for name, array in arrays.items():
+            np.save(os.path.join(tmp_path, name + '.npy'), array)
+        self._write_names(os.path.join(tmp_path, 'varnames.txt'),
+                          m.getAttr('VarName', variables))
+        self._write_names(os.path.join(tmp_path, 'constrnames.txt'),
+                          m.getAttr('ConstrName', constrs))
+        # written last, marks the entry as complete
+        with open(os.path.join(tmp_path, 'meta.json'), 'w') as fout:
+            json.dump(meta, fout)
+
+        try:
+            os.rename(tmp_path, path)
+        except OSError: # stored concurrently by another process
+            shutil.rmtree(tmp_path, ignore_errors=True)
+            if key not in self:
+                raise
+            logging.info('Model %s already in cache', key)
+            return False
+        logging.info('Stored model %s in cache', key)
+
+        if self.evict_on_store:
+            self.evict()
+        return True
+
+    def load(self, key, mmap=True):
+        '''Loads the model stored under `key`.
+
+        Input
+        -----
+        - The cache key, see `scenario_fingerprint`.
+        - Flag indicating whether to memory map the arrays.
+
+        Output
+        ------
+        Triple of Gurobi model, dictionary of index maps, and metadata, or
+        `None` if the key is not in the cache.
+        '''
+        try:
+            return self._load(key, mmap)
+        except (IOError, OSError): # removed concurrently by another process
+            logging.info('Model %s not in cache', key)
+            return None
+
+    def _load(self, key, mmap):
+        '''Loads the model stored under `key`, see `load`.'''
+        path = self.entry_path(key)
+        meta_filename = os.path.join(path, 'meta.json')
+        if not os.path.isfile(meta_filename):
+            return None
+        with open(meta_filename, 'r') as fin:
+            meta = json.load(fin)
+        os.utime(meta_filename, None) # mark as recently used
+
+        mmap_mode = 'r' if mmap else None
+        def load_array(name):
+            return np.load(os.path.join(path, name + '.npy'),
+                           mmap_mode=mmap_mode)
+
+        num_constrs, num_vars = meta['shape']
+        A = sp.csr_matrix((load_array('data'), load_array('indices'),
+                           load_array('indptr')), shape=(num_constrs, num_vars))
+
+        m = GRBModel(meta['name'])
+        x = m.addMVar(num_vars, lb=load_array('lb'), ub=load_array('ub'),
+                      vtype=load_array('vtype').astype('U1'))
+        if num_constrs > 0:
+            m.addMConstr(A, x, load_array('sense').astype('U1'),
+                         load_array('rhs'))
+        m.update()
+
+        variables = m.getVars()
+        m.setAttr('VarName', variables,
+                  self._read_names(os.path.join(path, 'varnames.txt')))
+        constrs = m.getConstrs()
+        m.setAttr('ConstrName', constrs,
+                  self._read_names(os.path.join(path, 'constrnames.txt')))
+        lazy = np.asarray(load_array('lazy'))
+        nonzero = np.flatnonzero(lazy)
+        if len(nonzero):
+            m.setAttr('Lazy', [constrs[i] for i in nonzero.tolist()],
+                      lazy[nonzero].tolist())
+
+        m.ModelSense = meta['sense']
+        if meta['objectives']:
+            for i, objective in enumerate(meta['objectives']):
+                coefficients = load_array('obj_{}'.format(i))
+                nonzero = np.flatnonzero(coefficients)
+                expr = LinExpr(coefficients[nonzero].tolist(),
+                               [variables[j] for j in nonzero])
+                m.setObjectiveN(expr + objective['constant'], i,
+                                priority=objective['priority'],
+                                weight=objective['weight'])
+        else:
+            m.setAttr('Obj', variables, load_array('obj').tolist())
+            m.ObjCon = meta['objective_constant']
+        m.update()
+
+        index_maps = {name: load_array('index_' + name)
+                      for name in meta['index_maps']}
+        logging.info('Loaded model %s from cache', key)
+        return m, index_maps, meta['metadata']
+
+    def size(self):
+        '''Returns the total size of the cache entries in bytes.'''
+        return sum(size for _, _, size in self._entries())
+
+    def evict(self):
+        '''Removes the least recently used entries until the cache size is at
+        most `max_size` bytes.
+        '''
+        entries = sorted(self._entries())
+        total = sum(size for _, _, size in entries)
+        for _, path, size in entries:
+            if total <= self.max_size:
+                break
+            self._remove(path)
+            total -= size
+            logging.info('Evicted %s from model cache', path)
+
+    def clear(self):
+        '''Removes all entries from the cache.'''
+        for _, path, _ in self._entries():
+            self._remove(path)
+
+    @staticmethod
+    def _remove(path):
+        '''Removes the entry directory `path`. The entry is first renamed such
+        that other processes do not load it partially removed.
+        '''
+        removed_path = path + '.del{}'.format(os.getpid())
+        try:
+            os.rename(path, removed_path)
+        except OSError: # removed concurrently
+            return
+        shutil.rmtree(removed_path, ignore_errors=True)
+
+    def _entries(self):
+        '''Returns the list of (last access time, path, size) tuples of the
+        complete entries in the cache.
+        '''
+        entries = []
+        for key in os.listdir(self.directory):
+            if '.' in key: # temporary or removed entries
+                continue
+            path = self.entry_path(key)
+            meta_filename = os.path.join(path, 'meta.json')
+            try:
+                if not os.path.isfile(meta_filename):
+                    continue
+                size = sum(os.path.getsize(os.path.join(path, filename))
+                           for filename in os.listdir(path))
+                entries.append((os.path.getmtime(meta_filename), path, size))
+            except OSError: # removed concurrently
+                continue
+        return entries
+
+    @staticmethod
+    def _write_names(filename, names):
+        with open(filename, 'w') as fout:
+            fout.write('\n'.join(names))
+
+    @staticmethod
+    def _read_names(filename):
+        with open(filename, 'r') as fin:
+            names = fin.read()
+        return names.split('\n') if names else []
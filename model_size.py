@@ -0,0 +1,308 @@
+'''
+ Copyright (C) 2020 Cristian Ioan Vasile <cvasile@lehigh.edu>
+ Explainable Robotics Lab (ERL), Autonomous and Intelligent Robotics (AIR) Lab,
+ Lehigh University
+ See license.txt file for license information.
+'''
+
+import logging
+
+import numpy as np
+
+from catl import CATLFormula
+from catl import catl2stl, stl_encoding_size
+from compact_ts import CompactTs
+from decomposition import time_windows, conjunction, shift_formula
+from decomposition import route_planning_decomposed
+from route_planning import compute_planning_variables
+from route_planning import build_model, optimize, log_status
+from solution import PlanSolution
+
+
+# rough memory footprint of the model elements, including the Python handles
+# and names of variables and constraints, and the temporary linear expressions
+BYTES_PER_VARIABLE = 300
+BYTES_PER_CONSTRAINT = 250
+BYTES_PER_NONZERO = 64
+
+ENCODINGS = ('monolithic', 'lazy', 'decomposed', 'decomposed-lazy')
+
+
+class ModelTooLarge(Exception):
+    '''Raised when no encoding of a planning problem fits the memory budget.'''
+
+    def __init__(self, size, budget):
+        Exception.__init__(self, 'Estimated model memory {:.1f} MB exceeds '
+                           'the budget of {:.1f} MB!'.format(
+                               size.memory / 2.0**20, budget / 2.0**20))
+        self.size = size
+        self.budget = budget
+
+
+class ModelSize(object):
+    '''Numbers of variables, constraints, and nonzero coefficients of the
+    layers of a route planning MILP, i.e., the system layer `system`, the
+    proposition layer `propositions`, the STL layer `stl`, and the resource
+    layers `resources`.
+    '''
+
+    LAYERS = ('system', 'propositions', 'stl', 'resources')
+
+    def __init__(self, layers):
+        '''Constructor'''
+        self.layers = layers
+
+    def total(self, quantity):
+        return sum(layer[quantity] for layer in self.layers.values())
+
+    @property
+    def variables(self):
+        return self.total('variables')
+
+    @property
+    def constraints(self):
+        return self.total('constraints')
+
+    @property
+    def nonzeros(self):
+        return self.total('nonzeros')
+
+    @property
+    def memory(self):
+        '''Returns the estimated memory of the model in bytes.'''
+        return (BYTES_PER_VARIABLE * self.variables
+                + BYTES_PER_CONSTRAINT * self.constraints
+                + BYTES_PER_NONZERO * self.nonzeros)
+
+    def __str__(self):
+        layers = ', '.join('{}: {variables} vars, {constraints} constrs, '
+                           '{nonzeros} nonzeros'.format(name,
+                                                        **self.layers[name])
+                           for name in self.LAYERS if name in self.layers)
+        return 'Model size: {} vars, {} constrs, {} nonzeros, ~{:.1f} MB ({})'\
+            .format(self.variables, self.constraints, self.nonzeros,
+                    self.memory / 2.0**20, layers)
+
+
+def count_times(low, high):
+    '''Returns the number of integer times in the intervals [low, high] given
+    as arrays.
+    '''
+    return np.maximum(high - low + 1, 0)
+
+def estimate_model_size(ts, agents, formula, time_bound=None, robust=True,
+                        lazy=None, resources=None):
+    '''Estimates the size of the MILP built by `build_model` without building
+    it. The sizes of the system, proposition, and resource layers are computed
+    from the construction of the model, and the size of the STL layer is
+    estimated from the encoding of `stl2milp`, see `stl_encoding_size`. Thus,
+    the total size is an estimate.
+
+    Input
+    -----
+    - The transition system, agents, and CaTL specification formula, see
+    `route_planning`.
+    - The time bound of the model (default: the bound of the formula).
+    - Flag indicating whether the robust problem is encoded.
+    - The mode of adding the proposition constraints, see `build_model`.
+    - The resources carried by the agents, see `route_planning`.
+
+    Output
+    ------
+    The size of the model, see `ModelSize`.
+    '''
+    if not isinstance(ts, CompactTs):
+        ts = CompactTs.from_ts(ts)
+    if isinstance(formula, CATLFormula):
+        ast = formula
+    else:
+        ast = CATLFormula.from_formula(formula)
+    if time_bound is None:
+        time_bound = int(ast.bound())
+    variables, _, _ = compute_planning_variables(ts, agents, time_bound,
+                                                 resources)
+    num_states, num_edges = ts.num_states, ts.num_edges
+    num_classes = variables.num_classes
+    num_capabilities = variables.num_capabilities
+    weights = np.asarray(ts.weights, dtype=np.int64)
+    T = time_bound
+
+    # system layer, see `create_system_variables` and `add_system_constraints`
+    team_departing = count_times(0, np.minimum(T - 1, T - weights)).sum()
+    team_arriving = int(np.count_nonzero(weights <= T))
+    conserve_departing = count_times(1, np.minimum(T - 1, T - weights)).sum()
+    conserve_arriving = count_times(np.maximum(weights, 1), T - 1).sum()
+    system = {
+        'variables': num_states * num_classes * (T + 1)
+                     + num_edges * num_classes * T,
+        'constraints': num_states * num_classes * (max(T - 1, 0) + T + 2),
+        'nonzeros': int(num_classes * (team_departing + team_arriving
+                                       + conserve_departing + conserve_arriving)
+                        + num_states * num_classes * (T + 2))
+    }
+
+    # STL layer
+    stl = stl_encoding_size(catl2stl(ast), robust=robust)
+    signals = stl['variable_signals']
+    # the signal variables, the robustness, and the satisfaction constraint
+    layer = {'variables': stl['variables'] + stl['signals'] + int(robust),
+             'constraints': stl['constraints'] + 1,
+             'nonzeros': stl['nonzeros'] + 1}
+
+    # proposition layer, see `add_proposition_constraints`
+    propositions = {'variables': variables.num_labels * num_capabilities
+                                 * (T + 1),
+                    'constraints': 0, 'nonzeros': 0}
+    if lazy != 'callback':
+        propositions['constraints'] = num_states * num_capabilities * (T + 1)
+        memberships = variables.class_capabilities.sum()
+        propositions['nonzeros'] = int((T + 1) * (
+                                variables.num_labels * num_capabilities
+                                + num_states * memberships))
+        for prop in ast.propositions():
+            num_labels = len(variables.proposition_labels(prop))
+            for c in variables.capabilities:
+                times = signals.get('{}_{}'.format(prop, c), 0)
+                propositions['constraints'] += num_labels * times
+                propositions['nonzeros'] += 2 * num_labels * times
+
+    # resource layers, see `create_resource_variables` and
+    # `add_resource_constraints`
+    num_labeled = int(np.count_nonzero(np.diff(variables.label_indptr)))
+    arriving = count_times(np.maximum(weights, 1), T).sum()
+    resource_layers = {'variables': 0, 'constraints': 0, 'nonzeros': 0}
+    for n, r in enumerate(variables.resources):
+        carriers = int(np.count_nonzero(variables.resource_capacities[n]))
+        min_rows = sum(len(variables.proposition_labels(prop))
+                       * signals.get('{}_{}'.format(prop, r), 0)
+                       for prop in ast.propositions())
+        resource_layers['variables'] += (num_edges * num_classes * T
+                                         + num_states * (2 * T + 1)
+                                         + variables.num_labels * (T + 1))
+        resource_layers['constraints'] += (num_states * (2 * T + 1)
+                                           + num_labeled * (T + 1)
+                                           + num_edges * carriers * T
+                                           + min_rows)
+        resource_layers['nonzeros'] += int(num_states * (4 * T + 1)
+                            + num_classes * (team_departing + arriving)
+                            + (num_labeled + variables.num_labels) * (T + 1)
+                            + 2 * num_edges * carriers * T + 2 * min_rows)
+
+    return ModelSize({'system': system, 'propositions': propositions,
+                      'stl': layer, 'resources': resource_layers})
+
+def estimate_decomposed_size(ts, agents, ast, robust=True, lazy=None,
+                             resources=None):
+    '''Returns the size of the largest window model of the temporal
+    decomposition of the specification, see `route_planning_decomposed`.
+    Windows merged by backtracking are not considered.
+    '''
+    largest = None
+    offset = 0
+    for _, end, terms in time_windows(ast):
+        size = estimate_model_size(ts, agents,
+                                   shift_formula(conjunction(terms), offset),
+                                   end - offset, robust=robust, lazy=lazy,
+                                   resources=resources)
+        if largest is None or size.memory > largest.memory:
+            largest = size
+        offset = end
+    return largest
+
+def select_encoding(ts, agents, formula, memory_budget, time_bound=None,
+                    robust=True, allow_lazy=True, resources=None):
+    '''Selects the first encoding in `ENCODINGS` whose estimated peak memory
+    fits the budget, i.e., the monolithic model, the model with the
+    proposition constraints separated by a callback, and the temporal
+    decomposition without and with separated proposition constraints.
+
+    Input
+    -----
+    - The transition system, agents, and CaTL specification formula, see
+    `route_planning`.
+    - The memory budget in bytes.
+    - The time bound of the model (default: the bound of the formula). The
+    temporal decomposition is only used for the bound of the formula.
+    - Flag indicating whether the robust problem is encoded.
+    - Flag indicating whether the proposition constraints may be separated by
+    a callback.
+    - The resources carried by the agents, see `route_planning`. The temporal
+    decomposition is not used with resources, see `route_planning_decomposed`.
+
+    Output
+    ------
+    Pair of the name of the encoding and its estimated size. Raises
+    `ModelTooLarge` if no encoding fits the budget.
+    '''
+    if not isinstance(ts, CompactTs):
+        ts = CompactTs.from_ts(ts)
+    if isinstance(formula, CATLFormula):
+        ast = formula
+    else:
+        ast = CATLFormula.from_formula(formula)
+    decomposable = (len(time_windows(ast)) > 1
+                    and time_bound in (None, int(ast.bound()))
+                    and not resources)
+
+    smallest = None
+    for encoding in ENCODINGS:
+        lazy = 'callback' if encoding.endswith('lazy') else None
+        if lazy is not None and not allow_lazy:
+            continue
+        if encoding.startswith('decomposed'):
+            if not decomposable:
+                continue
+            size = estimate_decomposed_size(ts, agents, ast, robust, lazy,
+                                            resources)
+        else:
+            size = estimate_model_size(ts, agents, ast, time_bound, robust,
+                                       lazy, resources)
+        logging.info('Encoding %s: %s', encoding, size)
+        if size.memory <= memory_budget:
+            return encoding, size
+        if smallest is None or size.memory < smallest.memory:
+            smallest = size
+    raise ModelTooLarge(smallest, memory_budget)
+
+def route_planning_budgeted(ts, agents, formula, memory_budget, time_bound=None,
+                            **kwargs):
+    '''Performs route planning with the first encoding that fits the memory
+    budget, see `select_encoding`.
+
+    Input
+    -----
+    - The transition system, agents, and CaTL specification formula, see
+    `route_planning`.
+    - The memory budget in bytes.
+    - The time bound of the model (default: the bound of the formula).
+    - Other keyword arguments are passed to `build_model`.
+
+    Output
+    ------
+    The plan as a `PlanSolution`, or None if no plan was found. Raises
+    `ModelTooLarge` if no encoding fits the budget.
+    '''
+    if not isinstance(ts, CompactTs):
+        ts = CompactTs.from_ts(ts)
+    if isinstance(formula, CATLFormula):
+        ast = formula
+    else:
+        ast = CATLFormula.from_formula(formula)
+    allow_lazy = kwargs.get('cache') is None and kwargs.get('lazy') is None
+    encoding, size = select_encoding(ts, agents, ast, memory_budget,
+                                     time_bound=time_bound,
+                                     robust=kwargs.get('robust', True),
+                                     allow_lazy=allow_lazy,
+                                     resources=kwargs.get('resources'))
+    logging.info('Selected encoding %s: %s', encoding, size)
+    if encoding.endswith('lazy'):
+        kwargs['lazy'] = 'callback'
+
+    if encoding.startswith('decomposed'):
+        return route_planning_decomposed(ts, agents, ast, **kwargs)
+    m = build_model(ts, agents, ast, time_bound=time_bound, **kwargs)
+    optimize(m)
+    log_status(m)
+    solution = PlanSolution.from_model(m) if m.SolCount > 0 else None
+    m.dispose()
+    return solution
@@ -0,0 +1,213 @@
+'''
+ Copyright (C) 2020 Cristian Ioan Vasile <cvasile@lehigh.edu>
+ Explainable Robotics Lab (ERL), Autonomous and Intelligent Robotics (AIR) Lab,
+ Lehigh University
+ See license.txt file for license information.
+'''
+
+import logging
+
+import numpy as np
+
+from gurobipy import GRB
+
+from catl import CATLFormula, Operation
+from compact_ts import CompactTs
+from decomposition import conjuncts, time_window
+from route_planning import build_model, optimize, log_status
+from solution import PlanSolution
+
+
+def ceil_div(a, b):
+    return -(-int(a) // int(b))
+
+def scale_formula(ast, factor):
+    '''Scales the time intervals and durations of the formula for a time step
+    `factor` times longer. The lower bounds of intervals are rounded down, and
+    the upper bounds and durations are rounded up.
+    '''
+    if ast.op == Operation.PRED:
+        return CATLFormula(ast.op, duration=ceil_div(ast.duration, factor),
+                           proposition=ast.proposition,
+                           capabilities=ast.capability_requests,
+                           resources=ast.resource_requests)
+    elif ast.op in (Operation.AND, Operation.OR):
+        return CATLFormula(ast.op, children=[scale_formula(child, factor)
+                                             for child in ast.children])
+    elif ast.op == Operation.IMPLIES:
+        return CATLFormula(ast.op, left=scale_formula(ast.left, factor),
+                           right=scale_formula(ast.right, factor))
+    elif ast.op == Operation.NOT:
+        return CATLFormula(ast.op, child=scale_formula(ast.child, factor))
+    elif ast.op in (Operation.EVENT, Operation.ALWAYS):
+        return CATLFormula(ast.op, low=int(ast.low) // factor,
+                           high=ceil_div(ast.high, factor),
+                           child=scale_formula(ast.child, factor))
+    elif ast.op == Operation.UNTIL:
+        return CATLFormula(ast.op, low=int(ast.low) // factor,
+                           high=ceil_div(ast.high, factor),
+                           left=scale_formula(ast.left, factor),
+                           right=scale_formula(ast.right, factor))
+    return ast
+
+def expand_solution(ts, coarse, factor, time_bound):
+    '''Expands the solution of the coarse problem to the fine time grid. The
+    agents depart along the transitions of the coarse plan at the fine times
+    corresponding to the coarse time steps, and wait at states using self-loop
+    transitions otherwise.
+
+    Input
+    -----
+    - The compact transition system with the fine transition durations.
+    - The coarse solution.
+    - The time scaling factor.
+    - The fine time bound.
+
+    Output
+    ------
+    Pair of integer arrays of the team states and transition flows on the fine
+    time grid with the shapes of the state and transition variable tensors.
+
+    Note
+    ----
+    The fine transition durations are at most the scaled coarse durations, thus
+    the agents arrive before their next departure in the coarse plan.
+    '''
+    sources, targets = np.asarray(ts.sources), np.asarray(ts.targets)
+    weights = np.asarray(ts.weights)
+    num_states, num_classes = coarse.team_state.shape[:2]
+    self_loops = -np.ones(num_states, dtype=np.int64)
+    loops = np.flatnonzero(sources == targets)
+    self_loops[sources[loops]] = loops
+    moves = sources != targets
+
+    team_state = np.zeros((num_states, num_classes, time_bound+1),
+                          dtype=np.int64)
+    flows = np.zeros((len(weights), num_classes, time_bound), dtype=np.int64)
+    arrivals = np.zeros((time_bound+1, num_states, num_classes),
+                        dtype=np.int64)
+    arrivals[0] = coarse.team_state[:, :, 0]
+
+    for t in range(time_bound):
+        available = arrivals[t]
+        if t % factor == 0 and t // factor < coarse.flows.shape[2]:
+            departures = coarse.flows[:, :, t // factor] * moves[:, np.newaxis]
+            for e, j in zip(*np.nonzero(departures)):
+                if t + weights[e] > time_bound:
+                    continue
+                n = min(departures[e, j], available[sources[e], j])
+                flows[e, j, t] += n
+                available[sources[e], j] -= n
+                arrivals[t + weights[e], targets[e], j] += n
+                team_state[sources[e], j, t] += n
+        # the remaining agents wait
+        for i in np.flatnonzero(available.sum(axis=1)):
+            e = self_loops[i]
+            if e < 0 or t + weights[e] > time_bound:
+                continue
+            flows[e, :, t] += available[i]
+            arrivals[t + weights[e], i] += available[i]
+            team_state[i, :, t] += available[i]
+    team_state[:, :, time_bound] = arrivals[time_bound]
+    return team_state, flows
+
+def critical_times(ast, coarse, factor, time_bound, radius):
+    '''Returns the boolean mask of the fine time steps within `radius` of the
+    start and end times of the active windows of the conjuncts of the
+    specification, and of the departure times of the agents along non-loop
+    transitions in the coarse plan.
+    '''
+    times = set()
+    for term in conjuncts(ast):
+        times.update(time_window(term))
+    # the agents waiting at states along self-loops do not depart
+    moves = np.asarray(coarse.sources) != np.asarray(coarse.targets)
+    departures = np.flatnonzero(coarse.flows[moves].sum(axis=(0, 1)))
+    times.update((departures * factor).tolist())
+
+    mask = np.zeros(time_bound+1, dtype=bool)
+    for t in times:
+        mask[max(t - radius, 0):min(t + radius, time_bound) + 1] = True
+    return mask
+
+def route_planning_multiresolution(ts, agents, formula, factor, radius=None,
+                                   **kwargs):
+    '''Performs route planning on a coarse time grid with time step `factor`,
+    and refines the coarse plan on the fine time grid. The fine model is
+    warm-started from the coarse plan, and the variables at times far from the
+    deadlines of the specification and from the transitions of the coarse plan
+    are fixed to the coarse plan. If the restricted fine model is infeasible,
+    the refined time steps are widened until all variables are free.
+
+    Input
+    -----
+    - The transition system, agents, and CaTL specification formula, see
+    `route_planning`.
+    - The time scaling factor of the coarse time grid.
+    - The number of fine time steps refined around each critical time (default:
+    the time scaling factor).
+    - Other keyword arguments are passed to `build_model`.
+
+    Output
+    ------
+    The Gurobi model of the fine problem, see `route_planning`. The coarse
+    solution is stored in the `_coarse` attribute of the model.
+    '''
+    if not isinstance(ts, CompactTs):
+        ts = CompactTs.from_ts(ts)
+    if isinstance(formula, CATLFormula):
+        ast = formula
+    else:
+        ast = CATLFormula.from_formula(formula)
+    time_bound = kwargs.pop('time_bound', None)
+    if time_bound is None:
+        time_bound = int(ast.bound())
+    if radius is None:
+        radius = factor
+
+    # solve the coarse problem
+    coarse_time_bound = ceil_div(time_bound, factor)
+    m = build_model(ts.scale(factor), agents, scale_formula(ast, factor),
+                    time_bound=coarse_time_bound, **kwargs)
+    optimize(m)
+    log_status(m)
+    if m.SolCount == 0:
+        logging.error('Coarse problem with time step %d has no solution',
+                      factor)
+        return m
+    coarse = PlanSolution.from_model(m)
+    m.dispose()
+
+    # build the fine problem warm-started from the expanded coarse solution
+    m = build_model(ts, agents, ast, time_bound=time_bound, **kwargs)
+    m._coarse = coarse
+    variables = m._variables
+    team_state, flows = expand_solution(ts, coarse, factor, time_bound)
+    state_vars = variables.state_vars.ravel().tolist()
+    edge_vars = variables.edge_vars.ravel().tolist()
+    m.setAttr('Start', state_vars, team_state.ravel().tolist())
+    m.setAttr('Start', edge_vars, flows.ravel().tolist())
+    lower = m.getAttr('LB', state_vars + edge_vars)
+    upper = m.getAttr('UB', state_vars + edge_vars)
+    values = np.concatenate([team_state.ravel(), flows.ravel()])
+
+    while True:
+        mask = critical_times(ast, coarse, factor, time_bound, radius)
+        fixed = np.concatenate([
+            np.broadcast_to(~mask, team_state.shape).ravel(),
+            np.broadcast_to(~mask[:-1], flows.shape).ravel()])
+        m.setAttr('LB', state_vars + edge_vars,
+                  np.where(fixed, values, lower).tolist())
+        m.setAttr('UB', state_vars + edge_vars,
+                  np.where(fixed, values, upper).tolist())
+        logging.info('Refining %d of %d time steps', mask.sum(), len(mask))
+
+        optimize(m)
+        if m.SolCount > 0 or mask.all():
+            break
+        if m.Status not in (GRB.Status.INFEASIBLE, GRB.Status.INF_OR_UNBD):
+            break
+        radius *= 2
+
+    log_status(m)
+    return m
@@ -0,0 +1,326 @@
+'''
+ Copyright (C) 2020 Cristian Ioan Vasile <cvasile@lehigh.edu>
+ Explainable Robotics Lab (ERL), Autonomous and Intelligent Robotics (AIR) Lab,
+ Lehigh University
+ See license.txt file for license information.
+
+ Long-running planning service. Requires Python 3.
+
+ The service listens on a Unix socket or on a localhost TCP port, and uses a
+ line-delimited JSON protocol. Each request is a JSON object on a single line,
+ and each response is a JSON object on a single line with the same `id`.
+
+    {"id": 1, "method": "plan", "ts": "farm",
+     "agents": [["q1", ["UV", "Mo"]], ["q2", ["IR"]]],
+     "formula": "F[0, 10] T(2, A, {(IR, 1)})",
+     "options": {"robust": true}}
+
+    {"id": 2, "method": "metrics"}
+
+ The transition systems are identified by the names of the compact transition
+ systems (see `compact_ts.py`) or `lomap` YAML files in the directory given to
+ the service.
+'''
+
+import os
+import sys
+import json
+import time
+import asyncio
+import logging
+import argparse
+import hashlib
+from collections import deque, OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+
+from lomap import Ts
+
+from catl import CATLFormula
+from compact_ts import CompactTs
+from model_cache import ModelCache
+from route_planning import route_planning
+from solution import PlanSolution
+
+
+class LRUCache(object):
+    '''Dictionary holding at most `max_size` items. The least recently used
+    items are evicted first.
+    '''
+
+    def __init__(self, max_size):
+        '''Constructor'''
+        self.max_size = max_size
+        self.items = OrderedDict()
+
+    def __contains__(self, key):
+        return key in self.items
+
+    def __len__(self):
+        return len(self.items)
+
+    def __getitem__(self, key):
+        value = self.items[key]
+        self.items.move_to_end(key)
+        return value
+
+    def __setitem__(self, key, value):
+        self.items[key] = value
+        self.items.move_to_end(key)
+        while len(self.items) > self.max_size:
+            self.items.popitem(last=False)
+
+
+# per worker process state kept warm between requests
+_ts_directory = None
+_model_cache = None
+_ts_cache = LRUCache(16)
+_formula_cache = LRUCache(1024)
+
+
+def _init_worker(ts_directory, cache_directory, ts_cache_size=16,
+                 formula_cache_size=1024):
+    '''Initializes the state of a worker process. The model cache is not
+    evicted by the workers, see `PlanningService`.
+    '''
+    global _ts_directory, _model_cache, _ts_cache, _formula_cache
+    _ts_directory = ts_directory
+    _model_cache = None
+    if cache_directory is not None:
+        _model_cache = ModelCache(cache_directory, evict_on_store=False)
+    _ts_cache = LRUCache(ts_cache_size)
+    _formula_cache = LRUCache(formula_cache_size)
+
+def load_ts(ts_id):
+    '''Returns the transition system with identifier `ts_id` from the directory
+    of the service. Recently used transition systems are kept loaded in each
+    worker process.
+    '''
+    if ts_id not in _ts_cache:
+        path = os.path.join(_ts_directory, os.path.basename(ts_id))
+        if os.path.isdir(path):
+            ts = CompactTs.load(path)
+        elif os.path.isfile(path + '.yaml'):
+            ts = CompactTs.from_ts(Ts.load(path + '.yaml'))
+        else:
+            raise ValueError('Unknown transition system "{}"!'.format(ts_id))
+        _ts_cache[ts_id] = ts
+    return _ts_cache[ts_id]
+
+def parse_formula(formula):
+    '''Returns the AST of the CaTL formula. Recently used formulae are kept
+    parsed in each worker process.
+    '''
+    if formula not in _formula_cache:
+        _formula_cache[formula] = CATLFormula.from_formula(formula)
+    return _formula_cache[formula]
+
+def solve(ts_id, agents, formula, options):
+    '''Solves a planning request in a worker process, and returns the
+    JSON serializable description of the plan.
+    '''
+    ts = load_ts(ts_id)
+    ast = parse_formula(formula)
+    agents = [(state, set(capabilities)) for state, capabilities in agents]
+    m = route_planning(ts, agents, ast, cache=_model_cache, **options)
+
+    response = {'status': m.Status}
+    if m.SolCount > 0:
+        solution = PlanSolution.from_model(m)
+        response.update(objective=solution.objective,
+                        robustness=solution.robustness, gap=solution.gap,
+                        classes=[sorted(g) for g in solution.classes],
+                        team_state={name: column.tolist() for name, column
+                                    in solution.team_state_table().items()},
+                        flows={name: column.tolist() for name, column
+                               in solution.flow_table().items()})
+    return response
+
+
+class PlanningService(object):
+    '''Planning service that runs the solves in a bounded pool of worker
+    processes. Duplicate requests that are in flight are coalesced, i.e., they
+    wait for the same solve. The worker processes share the model cache, and
+    only the service evicts entries from it after each solve.
+    '''
+
+    OPTIONS = ('time_bound', 'variable_bound', 'robust', 'travel_time_weight',
+               'precheck', 'tight_bounds')
+
+    def __init__(self, ts_directory, workers=None, cache_directory=None,
+                 history=1000, cache_size=1<<30, ts_cache_size=16,
+                 formula_cache_size=1024):
+        '''Constructor'''
+        self.workers = workers or os.cpu_count()
+        self.cache = None
+        if cache_directory is not None:
+            self.cache = ModelCache(cache_directory, max_size=cache_size)
+        self.executor = ProcessPoolExecutor(max_workers=self.workers,
+                                initializer=_init_worker,
+                                initargs=(ts_directory, cache_directory,
+                                          ts_cache_size, formula_cache_size))
+        self.in_flight = dict()
+        self.requests = 0
+        self.coalesced = 0
+        self.errors = 0
+        self.latencies = deque(maxlen=history)
+
+    @staticmethod
+    def request_key(request):
+        '''Returns the key identifying duplicate planning requests.'''
+        key = [request['ts'], sorted((state, sorted(capabilities))
+                                     for state, capabilities
+                                     in request['agents']),
+               request['formula'], sorted(request.get('options', {}).items())]
+        return hashlib.sha256(json.dumps(key).encode('utf-8')).hexdigest()
+
+    async def plan(self, request):
+        '''Solves the planning request, or waits for the identical request in
+        flight.
+        '''
+        options = request.get('options', {})
+        unknown = set(options) - set(self.OPTIONS)
+        if unknown:
+            raise ValueError('Unknown options: {}!'.format(sorted(unknown)))
+
+        key = self.request_key(request)
+        if key in self.in_flight:
+            self.coalesced += 1
+            return await asyncio.shield(self.in_flight[key])
+
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self.in_flight[key] = future
+        try:
+            result = await loop.run_in_executor(self.executor, solve,
+                            request['ts'], request['agents'],
+                            request['formula'], options)
+            future.set_result(result)
+        except Exception as error:
+            future.set_exception(error)
+            future.exception() # mark as retrieved for coalesced requests
+            raise
+        finally:
+            del self.in_flight[key]
+        if self.cache is not None: # the workers do not evict
+            await loop.run_in_executor(None, self.cache.evict)
+        return result
+
+    def metrics(self):
+        '''Returns the latency and queue depth metrics of the service.'''
+        latencies = sorted(self.latencies)
+        pending = len(self.in_flight)
+        def percentile(q):
+            if not latencies:
+                return None
+            return latencies[min(int(q * len(latencies)), len(latencies)-1)]
+        return {'requests': self.requests, 'coalesced': self.coalesced,
+                'errors': self.errors, 'in_flight': pending,
+                'running': min(pending, self.workers),
+                'queue_depth': max(pending - self.workers, 0),
+                'latency': {'count': len(latencies),
+                            'mean': (sum(latencies) / len(latencies)
+                                     if latencies else None),
+                            'p50': percentile(0.5), 'p95': percentile(0.95),
+                            'max': latencies[-1] if latencies else None}}
+
+    async def handle(self, request):
+        '''Handles a request, and returns the response.'''
+        method = request.get('method', 'plan')
+        if method == 'metrics':
+            return {'id': request.get('id'), 'result': self.metrics()}
+        if method != 'plan':
+            return {'id': request.get('id'),
+                    'error': 'Unknown method "{}"!'.format(method)}
+
+        self.requests += 1
+        start = time.time()
+        try:
+            result = await self.plan(request)
+            response = {'id': request.get('id'), 'result': result}
+        except Exception as error:
+            logging.exception('Request %s failed', request.get('id'))
+            self.errors += 1
+            response = {'id': request.get('id'), 'error': str(error)}
+        self.latencies.append(time.time() - start)
+        return response
+
+    async def serve_connection(self, reader, writer):
+        '''Serves the requests of a connection. Requests are handled
+        concurrently, and responses are written as they complete.
+        '''
+        lock = asyncio.Lock()
+
+        async def respond(line):
+            try:
+                request = json.loads(line.decode('utf-8'))
+                if not isinstance(request, dict):
+                    raise ValueError('Requests must be JSON objects!')
+                response = await self.handle(request)
+            except Exception as error: # every request gets a response
+                logging.exception('Invalid request')
+                self.errors += 1
+                response = {'id': None, 'error': str(error)}
+            async with lock:
+                writer.write((json.dumps(response) + '\n').encode('utf-8'))
+                await writer.drain()
+
+        tasks = []
+        while True:
+            line = await reader.readline()
+            if not line:
+                break
+            if line.strip():
+                tasks.append(asyncio.ensure_future(respond(line)))
+        if tasks:
+            await asyncio.wait(tasks)
+        writer.close()
+
+    async def start(self, path=None, port=None):
+        '''Starts the server on the Unix socket `path`, or on the localhost TCP
+        port `port`.
+        '''
+        if path is not None:
+            return await asyncio.start_unix_server(self.serve_connection,
+                                                   path=path)
+        return await asyncio.start_server(self.serve_connection,
+                                          host='127.0.0.1', port=port)
+
+    def shutdown(self):
+        '''Stops the worker processes.'''
+        self.executor.shutdown()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='CaTL planning service')
+    address = parser.add_mutually_exclusive_group(required=True)
+    address.add_argument('--socket', help='path of the Unix socket')
+    address.add_argument('--port', type=int, help='localhost TCP port')
+    parser.add_argument('--ts-dir', required=True,
+                        help='directory of the transition systems')
+    parser.add_argument('--workers', type=int, default=None,
+                        help='number of worker processes')
+    parser.add_argument('--cache', default=None,
+                        help='directory of the compiled model cache')
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    service = PlanningService(args.ts_dir, args.workers, args.cache)
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    server = loop.run_until_complete(service.start(args.socket, args.port))
+    logging.info('Planning service listening on %s',
+                 args.socket or '127.0.0.1:{}'.format(args.port))
+    try:
+        loop.run_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.close()
+        loop.run_until_complete(server.wait_closed())
+        service.shutdown()
+        if args.socket is not None and os.path.exists(args.socket):
+            os.remove(args.socket)
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
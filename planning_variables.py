@@ -0,0 +1,242 @@
+'''
+ Copyright (C) 2020 Cristian Ioan Vasile <cvasile@lehigh.edu>
+ Explainable Robotics Lab (ERL), Autonomous and Intelligent Robotics (AIR) Lab,
+ Lehigh University
+ See license.txt file for license information.
+'''
+
+import numpy as np
+
+
+class PlanningVariables(object):
+    '''Registry of the planning variables of a route planning MILP indexed by
+    integer identifiers.
+
+    The axes of the tensors are
+
+    - states: indices of the states in the compact transition system,
+    - edges: indices of the transitions in the compact transition system,
+    - classes: agent classes sorted by their binary encodings,
+    - capabilities: capabilities sorted by name,
+    - labels: (state, proposition) pairs, i.e., `label_states[l]` is labeled by
+      `ts.propositions[label_props[l]]`, sorted by state,
+    - time: time steps from 0 to `time_bound`.
+
+    The variables are stored in object arrays of Gurobi variable handles
+
+        state_vars[i, j, k] is z_{state i}_{class j}_k
+        edge_vars[e, j, k] is z_{transition e}_{class j}_k
+        prop_vars[l, c, k] is z_{prop}_{state}_{capability c}_k for label l
+
+    and their values in float arrays of the same shapes after `read_values`.
+
+    If the agents carry resources (see `set_resources`), the continuous
+    resource variables are stored with a leading axis over the sorted
+    resources
+
+        resource_flow_vars[r, e, j, k] is the amount of resource r carried by
+            the agents of class j along transition e starting at time k
+        resource_store_vars[r, i, k] is the amount of resource r left at
+            state i at time k
+        resource_level_vars[r, i, k] is the amount of resource r at state i
+            at time k
+        resource_prop_vars[r, l, k] is the amount of resource r assigned to
+            label l at time k
+    '''
+
+    TENSORS = ('state', 'edge', 'prop', 'resource_flow', 'resource_store',
+               'resource_level', 'resource_prop')
+
+    def __init__(self, ts, capabilities, agent_classes, time_bound):
+        '''Constructor'''
+        self.ts = ts
+        self.time_bound = time_bound
+
+        self.capabilities = sorted(capabilities)
+        self.capability_index = {c: n for n, c in enumerate(self.capabilities)}
+
+        classes = sorted(agent_classes.items(), key=lambda item: item[1])
+        self.classes = [g for g, _ in classes]
+        self.class_codes = np.array([enc for _, enc in classes],
+                                    dtype=np.int64)
+        self.class_index = {g: j for j, g in enumerate(self.classes)}
+        # boolean matrix indicating which capabilities each class has
+        self.class_capabilities = np.zeros((len(self.classes),
+                                            len(self.capabilities)), dtype=bool)
+        for j, g in enumerate(self.classes):
+            for c in g:
+                self.class_capabilities[j, self.capability_index[c]] = True
+
+        self.label_states, self.label_props = np.nonzero(ts.labels)
+        self.label_indptr = np.zeros(ts.num_states + 1, dtype=np.int64)
+        np.cumsum(np.bincount(self.label_states, minlength=ts.num_states),
+                  out=self.label_indptr[1:])
+
+        self.resources = []
+        self.resource_index = dict()
+        self.resource_capacities = np.zeros((0, self.num_classes))
+        self.resource_initial = np.zeros((0, ts.num_states))
+
+        for tensor in self.TENSORS:
+            setattr(self, tensor + '_vars', None)
+            setattr(self, tensor + '_values', None)
+
+    @property
+    def num_classes(self):
+        return len(self.classes)
+
+    @property
+    def num_capabilities(self):
+        return len(self.capabilities)
+
+    @property
+    def num_labels(self):
+        return len(self.label_states)
+
+    @property
+    def num_resources(self):
+        return len(self.resources)
+
+    def set_resources(self, resources):
+        '''Sets the resources carried by the agents.
+
+        Input
+        -----
+        Dictionary from resource names to dictionaries with the per-agent
+        capacities of capabilities `capacity`, and the initial amounts of the
+        resource at states `initial`, e.g.,
+
+            {'water': {'capacity': {'tank': 10}, 'initial': {'q1': 25}}}
+
+        The capacity of an agent class is the maximum capacity of its
+        capabilities.
+        '''
+        self.resources = sorted(resources)
+        self.resource_index = {r: n for n, r in enumerate(self.resources)}
+        self.resource_capacities = np.zeros((self.num_resources,
+                                             self.num_classes))
+        self.resource_initial = np.zeros((self.num_resources,
+                                          self.ts.num_states))
+        for n, r in enumerate(self.resources):
+            capacity = resources[r].get('capacity', dict())
+            for j, g in enumerate(self.classes):
+                self.resource_capacities[n, j] = max(
+                                        [capacity.get(c, 0) for c in g] + [0])
+            for u, amount in resources[r].get('initial', dict()).items():
+                if str(u) not in self.ts.state_index:
+                    raise ValueError('State {} not in TS!'.format(u))
+                self.resource_initial[n, self.ts.state_index[str(u)]] = amount
+        return self
+
+    def shape(self, tensor):
+        '''Returns the shape of the given tensor, i.e., 'state', 'edge', or
+        'prop'.
+        '''
+        if tensor == 'state':
+            return (self.ts.num_states, self.num_classes, self.time_bound+1)
+        elif tensor == 'edge':
+            return (self.ts.num_edges, self.num_classes, self.time_bound)
+        elif tensor == 'prop':
+            return (self.num_labels, self.num_capabilities, self.time_bound+1)
+        elif tensor == 'resource_flow':
+            return (self.num_resources, self.ts.num_edges, self.num_classes,
+                    self.time_bound)
+        elif tensor == 'resource_store':
+            return (self.num_resources, self.ts.num_states, self.time_bound)
+        elif tensor == 'resource_level':
+            return (self.num_resources, self.ts.num_states, self.time_bound+1)
+        elif tensor == 'resource_prop':
+            return (self.num_resources, self.num_labels, self.time_bound+1)
+        raise ValueError('Unknown tensor {}!'.format(tensor))
+
+    def allocate(self, tensor):
+        '''Creates the empty object array holding the variables of `tensor`.'''
+        array = np.empty(self.shape(tensor), dtype=object)
+        setattr(self, tensor + '_vars', array)
+        return array
+
+    def state_labels(self, i):
+        '''Returns the indices of the labels of state `i`.'''
+        return np.arange(self.label_indptr[i], self.label_indptr[i+1])
+
+    def proposition_labels(self, prop):
+        '''Returns the indices of the labels with proposition `prop`.'''
+        props = np.flatnonzero(self.ts.propositions == prop)
+        return np.flatnonzero(np.isin(self.label_props, props))
+
+    def distribution_array(self, capability_distribution):
+        '''Converts the initial distribution of capabilities given as a
+        dictionary from states to dictionaries from class encodings to number
+        of agents into an integer array of shape (states, classes).
+        '''
+        eta = np.zeros((self.ts.num_states, self.num_classes), dtype=np.int64)
+        for u, distribution in capability_distribution.items():
+            i = self.ts.state_index[u]
+            for j, enc in enumerate(self.class_codes.tolist()):
+                eta[i, j] = distribution.get(enc, 0)
+        return eta
+
+    def tensors(self):
+        '''Returns the list of pairs of names and variable arrays that were
+        created.
+        '''
+        return [(name, getattr(self, name + '_vars')) for name in self.TENSORS
+                if getattr(self, name + '_vars') is not None]
+
+    def read_values(self, m, attribute='X'):
+        '''Retrieves the values of all variables with a single bulk attribute
+        query, and stores them in the `*_values` arrays.
+        '''
+        tensors = self.tensors()
+        handles = np.concatenate([array.ravel() for _, array in tensors])
+        values = np.array(m.getAttr(attribute, handles.tolist()),
+                          dtype=np.float64)
+        offset = 0
+        for name, array in tensors:
+            setattr(self, name + '_values',
+                    values[offset:offset+array.size].reshape(array.shape))
+            offset += array.size
+        return self
+
+    def index_maps(self, m, constraints=None):
+        '''Returns the dictionary from tensor names to integer arrays of the
+        indices of the variables in the model. The indices of the lists of
+        constraints given as a dictionary `constraints` are stored under their
+        names prefixed by 'constrs_'.
+        '''
+        m.update()
+        maps = {name: np.array([v.index for v in array.ravel()],
+                               dtype=np.int64).reshape(array.shape)
+                for name, array in self.tensors()}
+        for name, constrs in (constraints or dict()).items():
+            maps['constrs_' + name] = np.array([c.index for c in constrs],
+                                               dtype=np.int64)
+        return maps
+
+    def metadata(self):
+        '''Returns JSON serializable data describing the axes of the tensors.'''
+        metadata = {'states': self.ts.states.tolist(),
+                    'classes': self.class_codes.tolist(),
+                    'capabilities': self.capabilities,
+                    'time_bound': self.time_bound}
+        if self.resources:
+            metadata['resources'] = self.resources
+        return metadata
+
+    def load_index_maps(self, m, index_maps, metadata):
+        '''Retrieves the variables of model `m` given their indices, see
+        `index_maps`, and returns the dictionary of the lists of constraints.
+        '''
+        assert metadata == self.metadata(), 'Mismatched variable registry!'
+        variables = np.empty(m.NumVars, dtype=object)
+        variables[:] = m.getVars()
+        constrs = np.empty(m.NumConstrs, dtype=object)
+        constrs[:] = m.getConstrs()
+        constraints = dict()
+        for name, index in index_maps.items():
+            if name.startswith('constrs_'):
+                constraints[name[len('constrs_'):]] = \
+                                        constrs[np.asarray(index)].tolist()
+            else:
+                setattr(self, name + '_vars', variables[np.asarray(index)])
+        return constraints
@@ -0,0 +1,185 @@
+'''
+ Copyright (C) 2020 Cristian Ioan Vasile <cvasile@lehigh.edu>
+ Explainable Robotics Lab (ERL), Autonomous and Intelligent Robotics (AIR) Lab,
+ Lehigh University
+ See license.txt file for license information.
+'''
+
+import logging
+import multiprocessing as mp
+try:
+    from queue import Empty
+except ImportError: # Python 2
+    from Queue import Empty
+import time
+
+from gurobipy import GRB
+
+from route_planning import build_model, optimize, log_status
+from solution import PlanSolution
+
+
+BACKENDS = ('gurobi',)
+
+DEFAULT_PORTFOLIO = (
+    {'name': 'robust', 'robust': True, 'params': {}},
+    {'name': 'robust-feasible', 'robust': True, 'params': {'MIPFocus': 1}},
+    {'name': 'robust-bound', 'robust': True, 'params': {'MIPFocus': 2}},
+    {'name': 'robust-seed-1', 'robust': True, 'params': {'Seed': 1}},
+    {'name': 'robust-seed-2', 'robust': True, 'params': {'Seed': 2}},
+)
+
+
+class PortfolioResult(object):
+    '''Result of a portfolio solve. The configuration that finished first is
+    `winner`, and its plan is `solution`. The list of dictionaries describing
+    the runs that finished before the others were cancelled is `runs`.
+    '''
+
+    def __init__(self, winner, solution, runs):
+        '''Constructor'''
+        self.winner = winner
+        self.solution = solution
+        self.runs = runs
+
+    def __str__(self):
+        return 'Winner: {}, runs: {}'.format(
+            None if self.winner is None else self.winner['name'],
+            [(run['name'], run['status'], run['runtime']) for run in self.runs])
+
+
+def run_configuration(config, ts, agents, formula, mip_gap, time_limit,
+                      threads, stop, results, kwargs):
+    '''Solves the planning problem with the given configuration in a worker
+    process, and puts the description of the run in the `results` queue. The
+    optimization is terminated when the `stop` event is set.
+    '''
+    start = time.time()
+    run = {'name': config['name'], 'status': None, 'solution': None,
+           'error': None}
+    try:
+        m = build_model(ts, agents, formula, **kwargs)
+        m.Params.MIPGap = mip_gap
+        if time_limit is not None:
+            m.Params.TimeLimit = time_limit
+        if threads is not None:
+            m.Params.Threads = threads
+        for name, value in config.get('params', {}).items():
+            m.setParam(name, value)
+
+        def stop_callback(model, where):
+            if stop.is_set():
+                model.terminate()
+
+        optimize(m, stop_callback)
+        log_status(m)
+        run['status'] = m.Status
+        if m.SolCount > 0:
+            run['solution'] = PlanSolution.from_model(m)
+    except Exception as error:
+        logging.exception('Configuration %s failed', config['name'])
+        run['error'] = str(error)
+    run['runtime'] = time.time() - start
+    results.put(run)
+
+def is_decisive(run):
+    '''Returns whether the run reached the requested gap or proved
+    infeasibility.
+    '''
+    return run['status'] in (GRB.Status.OPTIMAL, GRB.Status.INFEASIBLE,
+                             GRB.Status.INF_OR_UNBD)
+
+def route_planning_portfolio(ts, agents, formula, portfolio=DEFAULT_PORTFOLIO,
+                             mip_gap=1e-4, time_limit=None, threads=None,
+                             **kwargs):
+    '''Solves the planning problem by racing several solver configurations in
+    parallel processes. The first configuration that reaches the requested
+    MIP gap, or proves that the problem is infeasible, wins, and the other
+    configurations are cancelled.
+
+    Input
+    -----
+    - The transition system, agents, and CaTL specification formula, see
+    `route_planning`.
+    - The list of configurations, i.e., dictionaries with the name of the
+    configuration `name`, the flag selecting the robust or feasibility encoding
+    `robust` (default: the `robust` keyword argument, or true), the dictionary
+    of solver parameters `params`, and the solver `backend` (default:
+    `DEFAULT_PORTFOLIO`).
+    - The relative MIP gap (default: 1e-4).
+    - The time limit in seconds for each configuration (default: no limit).
+    - The number of threads of each configuration (default: the number of CPUs
+    divided by the number of configurations).
+    - Other keyword arguments are passed to `build_model`.
+
+    Output
+    ------
+    The result of the portfolio, see `PortfolioResult`. The function returns
+    as soon as a configuration wins, and the remaining configurations are
+    terminated. If no configuration reaches the gap within the time limit, the
+    first run that found a plan wins.
+
+    Note
+    ----
+    Only the Gurobi backend is supported. The configurations of the default
+    portfolio use the robust encoding, thus they share the objective. If the
+    portfolio mixes robust and feasibility configurations, the winner may be a
+    feasibility configuration, and its plan does not maximize the robustness.
+    '''
+    for config in portfolio:
+        backend = config.get('backend', 'gurobi')
+        if backend not in BACKENDS:
+            raise ValueError('Unsupported backend {} of configuration {}!'
+                             .format(backend, config['name']))
+    if threads is None:
+        threads = max(mp.cpu_count() // len(portfolio), 1)
+    # the flag of a configuration takes precedence over the keyword argument
+    robust = kwargs.pop('robust', True)
+    config_kwargs = [dict(kwargs, robust=config.get('robust', robust))
+                     for config in portfolio]
+
+    stop = mp.Event()
+    results = mp.Queue()
+    processes = [mp.Process(target=run_configuration,
+                            args=(config, ts, agents, formula, mip_gap,
+                                  time_limit, threads, stop, results,
+                                  config_kwargs[k]),
+                            name='portfolio-{}'.format(config['name']))
+                 for k, config in enumerate(portfolio)]
+    for process in processes:
+        process.daemon = True
+        process.start()
+
+    runs, winner = [], None
+    try:
+        while len(runs) < len(processes):
+            try:
+                run = results.get(timeout=1)
+            except Empty:
+                if not any(process.is_alive() for process in processes):
+                    break # a worker died without reporting
+                continue
+            runs.append(run)
+            logging.info('Configuration %s finished with status %s in %f s',
+                         run['name'], run['status'], run['runtime'])
+            if is_decisive(run):
+                winner = run
+                break
+    finally:
+        stop.set()
+        # the remaining configurations are abandoned without waiting for them
+        for process in processes:
+            if process.is_alive():
+                process.terminate()
+        for process in processes:
+            process.join()
+
+    if winner is None: # no configuration reached the gap
+        solved = [run for run in runs if run['solution'] is not None]
+        if solved:
+            winner = solved[0]
+    configs = {config['name']: config for config in portfolio}
+    if winner is None:
+        return PortfolioResult(None, None, runs)
+    logging.info('Portfolio winner: %s', winner['name'])
+    return PortfolioResult(configs[winner['name']], winner['solution'], runs)
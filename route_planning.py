@@ -9,14 +9,25 @@
 from collections import defaultdict
 import logging
 
+import numpy as np
+
 from gurobipy import Model as GRBModel
 from gurobipy import GRB
+from gurobipy import LinExpr
+from gurobipy import quicksum
 
 from lomap import Timer
 
 from stl.stl2milp import stl2milp
 from catl import CATLFormula
 from catl import catl2stl
+from compact_ts import CompactTs
+from feasibility import check_feasibility, InfeasibleSpecification
+from feasibility import travel_times
+from fleet import Fleet
+from lazy_constraints import LAZY_MODES, PropositionSeparator
+from model_cache import scenario_fingerprint
+from planning_variables import PlanningVariables
 from visualization import show_environment
 
 
@@ -33,10 +44,11 @@ def compute_capability_bitmap(agents):
     Output
     ------
     The output is a dictionary from capabilities to integers representing the
-    capabilitie's binary word.
+    capabilitie's binary word. The bits are assigned in the sorted order of
+    the capabilities, such that the encoding does not depend on the hash seed.
     '''
     capabilities = set.union(*[cap for _, cap in agents])
-    capabilities = {c: 1<<k for k, c in enumerate(capabilities)}
+    capabilities = {c: 1<<k for k, c in enumerate(sorted(capabilities))}
     logging.debug('Capabilities bitmap: %s', capabilities)
     return capabilities
 
@@ -60,7 +72,7 @@ def compute_initial_capability_distribution(ts, agents, agent_classes):
     '''Computes the initial number of agents of each class at each state.
     Input
     -----
-    - The transition system specifying the environment.
+    - The transition system specifying the environment in compact form.
     - List of agents, where agents are tuples (q, cap), q is the initial state of
     the agent, and cap is the set of capabilities. Agents' identifiers are their
     indices in the list.
@@ -72,15 +84,45 @@ def compute_initial_capability_distribution(ts, agents, agent_classes):
     distribution is a list of length equal to the number of classes, and
     each element is the number of agents of having those capabilities (a class).
     '''
-    nc = len(agent_classes)
-    capability_distribution = {u: defaultdict(int) for u in ts.g}
+    capability_distribution = {u: defaultdict(int) for u in ts.states.tolist()}
     for state, g in agents:
         g_enc = agent_classes[frozenset(g)]
-        capability_distribution[state][g_enc] += 1
+        # the state identifiers of compact transition systems are strings
+        capability_distribution[str(state)][g_enc] += 1
     return capability_distribution
 
-def create_system_variables(m, ts, agent_classes, time_bound, variable_bound,
-                            vtype=GRB.INTEGER):
+def compute_planning_variables(ts, agents, time_bound, resources=None):
+    '''Computes the agent classes, the initial distribution of capabilities,
+    and the registry of planning variables.
+
+    Input
+    -----
+    - The transition system specifying the environment in compact form.
+    - List of agents (q, cap) or `Fleet`.
+    - The time bound.
+    - The resources carried by the agents (default: none), see
+    `PlanningVariables.set_resources`.
+
+    Output
+    ------
+    Tuple of the registry of planning variables, the agent classes, and the
+    initial distribution of capabilities.
+    '''
+    if isinstance(agents, Fleet):
+        capabilities = agents.capability_bitmap()
+        agent_classes = agents.agent_classes()
+        capability_distribution = agents.capability_distribution(ts)
+    else:
+        capabilities = compute_capability_bitmap(agents)
+        agent_classes = compute_agent_classes(agents, capabilities)
+        capability_distribution = compute_initial_capability_distribution(ts,
+                                                          agents, agent_classes)
+    variables = PlanningVariables(ts, capabilities, agent_classes, time_bound)
+    if resources:
+        variables.set_resources(resources)
+    return variables, agent_classes, capability_distribution
+
+def create_system_variables(m, variables, variable_bound, vtype=GRB.INTEGER):
     '''Creates the state and transition variables associated with the given
     transition system.
 
@@ -95,54 +137,55 @@ def create_system_variables(m, ts, agent_classes, time_bound, variable_bound,
     Input
     -----
     - The Gurobi model variable.
-    - The transition system specifying the environment.
-    - The agent classes given as a dictionary from frozen sets of capabilities
-    to bitmaps (integers).
-    - Time bound.
+    - The registry of planning variables defined over the compact transition
+    system specifying the environment, the agent classes, and the time bound.
     - The upper bound for variables.
     - Variable type (default: integer).
 
     Note
     ----
-    Data structure holding the variables is a list of list of variables, e.g.,
+    The variables are stored in the registry as object arrays, e.g.,
 
-        d['vars'][k][g] is the z_{q/e}_bitmap(g)_k
+        variables.state_vars[i, j, k] is the z_{q}_bitmap(g)_k
+        variables.edge_vars[e, j, k] is the z_{e}_bitmap(g)_k
 
-    where d is the dictionary of attributes for a node q or an edge e in the TS,
-    g is an agent class (frozen set of capabilities), bitmap(g) is the binary
-    encoding of g as an integer, and k is the time step.
-    Also, d['vars'] is a list of length `time_bound+1', d['vars'][k] is a
-    dictionary from frozen sets to gurobi variables.
+    where i is the index of state q, e is the index of the transition in the
+    compact TS, j is the index of agent class g (frozen set of capabilities),
+    bitmap(g) is the binary encoding of g as an integer, and k is the time step.
     '''
+    ts = variables.ts
+    states = ts.states.tolist()
+    codes = variables.class_codes.tolist()
+    time_bound = variables.time_bound
+
     # node variables
-    for u, d in ts.g.nodes(data=True):
-        d['vars'] = [] # initialize node variables list
-        for k in range(time_bound+1):
-            name = 'z_{state}_{{}}_{time}'.format(state=u, time=k)
-            d['vars'].append({g: m.addVar(vtype=vtype, name=name.format(enc),
-                                          lb=0, ub=variable_bound)
-                                          for g, enc in agent_classes.items()})
+    state_vars = variables.allocate('state')
+    for i, u in enumerate(states):
+        for j, enc in enumerate(codes):
+            for k in range(time_bound+1):
+                name = 'z_{state}_{cap}_{time}'.format(state=u, cap=enc,
+                                                       time=k)
+                state_vars[i, j, k] = m.addVar(vtype=vtype, name=name,
+                                               lb=0, ub=variable_bound)
     # edge variables
-    for u, v, d in ts.g.edges(data=True):
-        d['vars'] = [] # initialize edge variables list
-        for k in range(time_bound):
-            name = 'z_{src}_{dest}_{{}}_{time}'.format(src=u, dest=v, time=k)
-            d['vars'].append({g: m.addVar(vtype=vtype, name=name.format(enc),
-                                          lb=0, ub=variable_bound)
-                                        for g, enc in agent_classes.items()})
-
-def add_system_constraints(m, ts, agent_classes, capability_distribution,
-                           time_bound):
+    edge_vars = variables.allocate('edge')
+    edges = zip(ts.sources.tolist(), ts.targets.tolist())
+    for e, (src, dest) in enumerate(edges):
+        for j, enc in enumerate(codes):
+            for k in range(time_bound):
+                name = 'z_{src}_{dest}_{cap}_{time}'.format(src=states[src],
+                                            dest=states[dest], cap=enc, time=k)
+                edge_vars[e, j, k] = m.addVar(vtype=vtype, name=name,
+                                              lb=0, ub=variable_bound)
+
+def add_system_constraints(m, variables, capability_distribution):
     '''Computes the constraints that capture the system dynamics.
 
     Input
     -----
     - The Gurobi model variable.
-    - The transition system specifying the environment.
-    - The agent classes given as a dictionary from frozen sets of capabilities
-    to bitmaps (integers).
+    - The registry of planning variables, see `create_system_variables`.
     - The initial distribution of capabilities at each state.
-    - Time bound.
 
     Note
     ----
@@ -158,16 +201,26 @@ def add_system_constraints(m, ts, agent_classes, capability_distribution,
     where \eta_{state}_g is the number of agents of class g at state {state} at
     time 0.
     '''
+    ts = variables.ts
+    codes = variables.class_codes.tolist()
+    time_bound = variables.time_bound
+    state_vars, edge_vars = variables.state_vars, variables.edge_vars
+    weights = ts.weights.tolist()
+
     # edge conservation constraints
-    for u, ud in ts.g.nodes(data=True):
+    for i, u in enumerate(ts.states.tolist()):
+        out_edges = ts.out_edges(i).tolist()
+        in_edges = ts.in_edges(i).tolist()
         for k in range(time_bound+1):
-            for g, g_enc in agent_classes.items():
-                departing = sum([d['vars'][k][g]
-                            for _, _, d in ts.g.out_edges_iter(u, data=True)
-                                if k + d['weight'] <= time_bound])
-                arriving = sum([d['vars'][k - d['weight']][g]
-                            for _, _, d in ts.g.in_edges_iter(u, data=True)
-                                if k - d['weight'] >= 0])
+            departing_edges = [e for e in out_edges
+                                   if k + weights[e] <= time_bound]
+            arriving_edges = [(e, k - weights[e]) for e in in_edges
+                                   if k - weights[e] >= 0]
+            for j, g_enc in enumerate(codes):
+                departing = quicksum(edge_vars[e, j, k]
+                                     for e in departing_edges)
+                arriving = quicksum(edge_vars[e, j, t]
+                                    for e, t in arriving_edges)
 
                 if 0 < k < time_bound:
                     # flow balancing constraint
@@ -176,48 +229,214 @@ def add_system_constraints(m, ts, agent_classes, capability_distribution,
 
                 # node constraint: team state
                 if k < time_bound:
-                    team_state_eq = (ud['vars'][k][g] == departing)
+                    team_state_eq = (state_vars[i, j, k] == departing)
                 else:
-                    team_state_eq = (ud['vars'][k][g] == arriving)
+                    team_state_eq = (state_vars[i, j, k] == arriving)
                 m.addConstr(team_state_eq, 'team_{}_{}_{}'.format(u, g_enc, k))
 
 #     # initial time constraints - encoding using transition variables
-#     for u in ts.g.nodes():
-#         for g, g_enc in agent_classes.items():
-#             conserve = sum([d['vars'][d['weight']][g]
-#                             for _, _, d in ts.g.out_edges_iter(u, data=True)
-#                                 if d['weight'] <= time_bound])
-#             conserve = (conserve == capability_distribution[u][g])
+#     eta = variables.distribution_array(capability_distribution)
+#     for i, u in enumerate(ts.states.tolist()):
+#         for j, g_enc in enumerate(codes):
+#             conserve = quicksum(edge_vars[e, j, weights[e]]
+#                                 for e in ts.out_edges(i).tolist()
+#                                     if weights[e] <= time_bound)
+#             conserve = (conserve == eta[i, j])
 #             m.addConstr(conserve, 'init_distrib_{}_{}'.format(u, g_enc))
 
     # initial time constraints - encoding using state variables
-    for u, ud in ts.g.nodes(data=True):
-        for g, g_enc in agent_classes.items():
-            conserve = (ud['vars'][0][g] == capability_distribution[u][g_enc])
+    eta = variables.distribution_array(capability_distribution)
+    for i, u in enumerate(ts.states.tolist()):
+        for j, g_enc in enumerate(codes):
+            conserve = (state_vars[i, j, 0] == eta[i, j])
             m.addConstr(conserve, 'init_distrib_{}_{}'.format(u, g_enc))
 
+def create_resource_variables(m, variables, variable_bound):
+    '''Creates the continuous resource variables of the resources carried by
+    the agents, i.e., one layer of variables per resource, see
+    `PlanningVariables`.
+
+    The resource flow variables are r_{res}_{state1}_{state2}_{cap}_k, the
+    resource store variables are store_{res}_{state}_k, the resource level
+    variables are level_{res}_{state}_k, and the proposition-resource variables
+    are r_{res}_{prop}_{state}_k.
+
+    Input
+    -----
+    - The Gurobi model variable.
+    - The registry of planning variables with the resources.
+    - The upper bound for the system variables.
+
+    Note
+    ----
+    The resource flows of classes without capacity for a resource are fixed to
+    zero.
+    '''
+    ts = variables.ts
+    states = ts.states.tolist()
+    codes = variables.class_codes.tolist()
+    time_bound = variables.time_bound
+    label_states = variables.label_states.tolist()
+    label_props = ts.propositions[variables.label_props].tolist()
+    edges = list(zip(ts.sources.tolist(), ts.targets.tolist()))
+
+    flow_vars = variables.allocate('resource_flow')
+    store_vars = variables.allocate('resource_store')
+    level_vars = variables.allocate('resource_level')
+    prop_vars = variables.allocate('resource_prop')
+    for n, r in enumerate(variables.resources):
+        total = float(variables.resource_initial[n].sum())
+        capacities = variables.resource_capacities[n].tolist()
+        for e, (src, dest) in enumerate(edges):
+            for j, enc in enumerate(codes):
+                ub = min(capacities[j] * variable_bound, total)
+                for k in range(time_bound):
+                    name = 'r_{res}_{src}_{dest}_{cap}_{time}'.format(res=r,
+                            src=states[src], dest=states[dest], cap=enc, time=k)
+                    flow_vars[n, e, j, k] = m.addVar(name=name, lb=0, ub=ub)
+        for i, u in enumerate(states):
+            for k in range(time_bound+1):
+                if k < time_bound:
+                    name = 'store_{}_{}_{}'.format(r, u, k)
+                    store_vars[n, i, k] = m.addVar(name=name, lb=0, ub=total)
+                name = 'level_{}_{}_{}'.format(r, u, k)
+                level_vars[n, i, k] = m.addVar(name=name, lb=0, ub=total)
+        for l, (i, prop) in enumerate(zip(label_states, label_props)):
+            for k in range(time_bound+1):
+                name = 'r_{res}_{prop}_{state}_{time}'.format(res=r,
+                                        prop=prop, state=states[i], time=k)
+                prop_vars[n, l, k] = m.addVar(name=name, lb=0, ub=total)
+
+def add_resource_constraints(m, stl_milp, variables, ast):
+    r'''Adds the constraints capturing the aggregated flows of resources. The
+    agents of each class carry the resources along the transitions within the
+    capacity of the class, and drop off or pick up resources at states.
+
+    Input
+    -----
+    - The Gurobi model variable.
+    - The MILP encoding of the STL formula obtained from the CaTL specification.
+    - The registry of planning variables with the resource variables, see
+    `create_resource_variables`.
+    - The AST of the CaTL specification formula.
+
+    Output
+    ------
+    The list of constraints z_{prop}_{res}_k <= z_{prop}_{state}_{res}_k
+    bounding the variables of the STL formula by the resource levels.
+
+    Note
+    ----
+    The level of resource r at state q at time k is
+
+        level_r_q_k = store_r_q_k + \sum_{e=(q, v)} r_e_k
+                    = store_r_q_{k-1} + \sum_{e=(u, q)} r_e_{k-W(e)}
+
+    where the sums are over all classes, the first equation holds for k < T,
+    the second for k > 0, and level_r_q_0 is the initial amount of r at q.
+    The flows are coupled to the system transition variables by
+
+        r_e_g_k <= capacity_r_g z_e_g_k
+
+    The level is split among the labels of the state, and the variables
+    z_{prop}_{res}_k of the STL formula are bounded by the
+    proposition-resource variables of the labels with proposition prop.
+    '''
+    ts = variables.ts
+    states = ts.states.tolist()
+    codes = variables.class_codes.tolist()
+    time_bound = variables.time_bound
+    weights = ts.weights.tolist()
+    edge_vars = variables.edge_vars
+    flow_vars = variables.resource_flow_vars
+    store_vars = variables.resource_store_vars
+    level_vars = variables.resource_level_vars
+    prop_vars = variables.resource_prop_vars
+    label_states = variables.label_states.tolist()
+
+    for n, r in enumerate(variables.resources):
+        initial = variables.resource_initial[n].tolist()
+        capacities = variables.resource_capacities[n].tolist()
+        # resource conservation constraints
+        for i, u in enumerate(states):
+            out_edges = ts.out_edges(i).tolist()
+            in_edges = ts.in_edges(i).tolist()
+            m.addConstr(level_vars[n, i, 0] == initial[i],
+                        'resource_init_{}_{}'.format(r, u))
+            for k in range(time_bound+1):
+                if k < time_bound:
+                    departing = quicksum(flow_vars[n, e, j, k]
+                                         for e in out_edges
+                                         if k + weights[e] <= time_bound
+                                         for j in range(len(codes)))
+                    m.addConstr(level_vars[n, i, k]
+                                == store_vars[n, i, k] + departing,
+                                'resource_depart_{}_{}_{}'.format(r, u, k))
+                if k > 0:
+                    arriving = quicksum(flow_vars[n, e, j, k - weights[e]]
+                                        for e in in_edges
+                                        if k - weights[e] >= 0
+                                        for j in range(len(codes)))
+                    m.addConstr(level_vars[n, i, k]
+                                == store_vars[n, i, k-1] + arriving,
+                                'resource_arrive_{}_{}_{}'.format(r, u, k))
+            labels = variables.state_labels(i).tolist()
+            if labels:
+                for k in range(time_bound+1):
+                    m.addConstr(quicksum(prop_vars[n, labels, k].tolist())
+                                == level_vars[n, i, k],
+                                'resource_prop_state_{}_{}_{}'.format(r, u, k))
+
+        # capacity coupling constraints
+        for e in range(ts.num_edges):
+            for j, enc in enumerate(codes):
+                if capacities[j] == 0:
+                    continue
+                for k in range(time_bound):
+                    m.addConstr(flow_vars[n, e, j, k]
+                                <= capacities[j] * edge_vars[e, j, k],
+                                'resource_capacity_{}_{}_{}_{}'.format(r, e,
+                                                                       enc, k))
+
+    # bound the variables of the STL formula by the resource levels
+    min_res = []
+    for prop in ast.propositions():
+        labels = variables.proposition_labels(prop).tolist()
+        for n, r in enumerate(variables.resources):
+            variable = '{prop}_{res}'.format(prop=prop, res=r)
+            for k, stl_var in stl_milp.variables.get(variable, dict()).items():
+                if k > time_bound:
+                    continue
+                for l in labels:
+                    name = 'min_res_{}_{}_{}_{}'.format(prop, r, k,
+                                                    states[label_states[l]])
+                    min_res.append(m.addConstr(stl_var <= prop_vars[n, l, k],
+                                               name))
+    return min_res
+
 def extract_propositions(ts, ast):
     '''Returns the set of propositions in the formula, and checks that it is
-    included in the transitions system.
+    included in the transitions system. Raises a `ValueError` listing the
+    unknown propositions otherwise.
 
     Input
     -----
-    - The transition system specifying the environment.
+    - The transition system specifying the environment in compact form.
     - The AST of the CaTL specification formula.
 
     Output
     ------
     Set of propositions in the specification formula.
     '''
-    ts_propositions = set.union(*[d['prop'] for _, d in ts.g.nodes(data=True)])
     formula_propositions = set(ast.propositions())
-    assert formula_propositions <= ts_propositions, \
-                                'There are unknown propositions in the formula!'
+    unknown = formula_propositions - set(ts.propositions.tolist())
+    if unknown:
+        raise ValueError('Unknown propositions in the formula: {}!'.format(
+                                                    ', '.join(sorted(unknown))))
     return formula_propositions
 
-def add_proposition_constraints(m, stl_milp, ts, ast, capabilities,
-                                agent_classes, time_bound, variable_bound,
-                                vtype=GRB.INTEGER):
+def add_proposition_constraints(m, stl_milp, variables, ast, variable_bound,
+                                vtype=GRB.INTEGER, lazy=None):
     '''Adds the proposition constraints. First, the proposition-state variables
     are defined such that capabilities are not double booked. Second, contraints
     are added such that proposition are satisfied as best as possible. The
@@ -228,73 +447,284 @@ def add_proposition_constraints(m, stl_milp, ts, ast, capabilities,
     -----
     - The Gurobi model variable.
     - The MILP encoding of the STL formula obtained from the CaTL specification.
-    - The transition system specifying the environment.
-    - The AST of the CaTL specification formula.
-    - Dictionary of capability encoding that maps capabilities to binary words
-    represented as integers.
-    - The agent classes given as a dictionary from frozen sets of capabilities
-    to bitmaps (integers).
-    - Time bound.
+    - The registry of planning variables, see `create_system_variables`.
+    - The AST of the CaTL specification formula, or None if only the
+    proposition-state variables and their constraints are added.
     - The upper bound for variables.
     - Variable type (default: integer).
+    - The mode of adding the proposition constraints (default: None). If
+    'attribute', the constraints are marked as lazy constraints. If 'callback',
+    the constraints are not added to the model, and are separated by a
+    `PropositionSeparator` callback registered with `add_callback`.
+
+    Output
+    ------
+    Pair of lists of the constraints relating the proposition-state variables
+    to the system states, and of the constraints z_{prop}_{cap}_k <=
+    z_{prop}_{state}_{cap}_k relating the STL variables to the
+    proposition-state variables. The lists are empty in 'callback' mode.
+
+    Note
+    ----
+    The proposition-state variables are stored in the registry as
+
+        variables.prop_vars[l, n, k] is the z_{prop}_{state}_{cap}_k
+
+    where l is the index of the label (state, prop), and n is the index of
+    capability cap.
     '''
-    props = extract_propositions(ts, ast)
+    ts = variables.ts
+    props = extract_propositions(ts, ast) if ast is not None else set()
+    states = ts.states.tolist()
+    time_bound = variables.time_bound
+    state_vars = variables.state_vars
+    label_states = variables.label_states.tolist()
+    label_props = ts.propositions[variables.label_props].tolist()
 
     # add proposition-state variables
-    for u, ud in ts.g.nodes(data=True):
-        ud['prop_vars'] = dict()
-        for c in capabilities:
-            ud['prop_vars'][c] = []
+    prop_vars = variables.allocate('prop')
+    for l, (i, prop) in enumerate(zip(label_states, label_props)):
+        for n, c in enumerate(variables.capabilities):
             for k in range(time_bound+1):
-                ud['prop_vars'][c].append(dict())
-                for prop in ud['prop']:
-                    name = 'z_{prop}_{state}_{cap}_{time}'.format(
-                        prop=prop, state=u, cap=c, time=k)
-                    ud['prop_vars'][c][k][prop] = m.addVar(
-                        vtype=vtype, name=name, lb=0, ub=variable_bound)
+                name = 'z_{prop}_{state}_{cap}_{time}'.format(
+                    prop=prop, state=states[i], cap=c, time=k)
+                prop_vars[l, n, k] = m.addVar(vtype=vtype, name=name,
+                                              lb=0, ub=variable_bound)
+
+    if lazy == 'callback':
+        min_props = [(stl_var, l, n, k) for stl_var, l, n, k, _
+                     in min_proposition_pairs(stl_milp, variables, props)]
+        m.Params.LazyConstraints = 1
+        add_callback(m, PropositionSeparator(variables, min_props))
+        return [], []
 
     # constraints for relating (proposition, state) pairs to system states
-    for u, ud in ts.g.nodes(data=True):
-        for c in capabilities:
+    prop_state_constraints = []
+    for i, u in enumerate(states):
+        labels = variables.state_labels(i)
+        for n, c in enumerate(variables.capabilities):
+            classes = np.flatnonzero(variables.class_capabilities[:, n])
             for k in range(time_bound+1):
-                equality = sum([ud['prop_vars'][c][k][prop]
-                                                    for prop in ud['prop']])
-                equality -= sum([ud['vars'][k][g] for g in agent_classes
-                                                                    if c in g])
+                equality = quicksum(prop_vars[labels, n, k])
+                equality -= quicksum(state_vars[i, classes, k])
                 equality = (equality == 0)
-                m.addConstr(equality, 'prop_state_{}_{}_{}'.format(u, c, k))
+                constraint = m.addConstr(equality,
+                                         'prop_state_{}_{}_{}'.format(u, c, k))
+                prop_state_constraints.append(constraint)
 
     # add propositions constraints for only those variables appearing in the
     # MILP encoding of the formula
+    min_prop_constraints = [m.addConstr(stl_var <= prop_vars[l, n, k], name)
+                            for stl_var, l, n, k, name
+                            in min_proposition_pairs(stl_milp, variables, props)]
+
+    if lazy == 'attribute':
+        m.update()
+        for constraints in (prop_state_constraints, min_prop_constraints):
+            m.setAttr('Lazy', constraints, [1] * len(constraints))
+    return prop_state_constraints, min_prop_constraints
+
+def min_proposition_pairs(stl_milp, variables, props):
+    '''Returns the list of tuples (z_{prop}_{cap}_k, l, n, k, name) such that
+    the variable z_{prop}_{cap}_k in the MILP encoding of the STL formula is
+    bounded by the proposition-state variable `variables.prop_vars[l, n, k]`
+    for every label l with proposition prop, where n is the index of
+    capability cap, and name is the name of the constraint.
+    '''
+    states = variables.ts.states.tolist()
+    label_states = variables.label_states.tolist()
+    pairs = []
     for prop in props:
-        for c in capabilities:
-            for k in range(time_bound+1):
-                variable = '{prop}_{cap}'.format(prop=prop, cap=c)
-                if (variable in stl_milp.variables
-                                        and k in stl_milp.variables[variable]):
-                    for u, ud in ts.g.nodes(data=True):
-                        if prop in ud['prop']:
-                            min_prop = (stl_milp.variables[variable][k]
-                                                <= ud['prop_vars'][c][k][prop])
-                            m.addConstr(min_prop, 'min_prop_{}_{}_{}_{}'.format(
-                                                                prop, c, k, u))
-
-def add_travel_time_objective(m, ts, weight, time_bound, variable_bound):
+        labels = variables.proposition_labels(prop).tolist()
+        for n, c in enumerate(variables.capabilities):
+            variable = '{prop}_{cap}'.format(prop=prop, cap=c)
+            if variable not in stl_milp.variables:
+                continue
+            for k in range(variables.time_bound+1):
+                if k in stl_milp.variables[variable]:
+                    for l in labels:
+                        name = 'min_prop_{}_{}_{}_{}'.format(prop, c, k,
+                                                    states[label_states[l]])
+                        pairs.append((stl_milp.variables[variable][k], l, n, k,
+                                      name))
+    return pairs
+
+def add_travel_time_objective(m, variables, weight, variable_bound):
     '''Adds the total travel time of all agents as an objective.
 
     Input
     -----
     - The Gurobi model variable.
-    - The transition system specifying the environment.
+    - The registry of planning variables, see `create_system_variables`.
     - The objective's weight.
-    - Time bound.
     - The upper bound for variables.
     '''
-    travel_time = sum(sum(d['vars'].values()) * d['weight']
-                      for _, _, d in ts.g.edges(data=True))
-    travel_time /= (time_bound * variable_bound)
+    edge_vars = variables.edge_vars
+    _, num_classes, time_bound = edge_vars.shape
+    coefficients = np.repeat(variables.ts.weights, num_classes * time_bound)
+    coefficients = coefficients / float(time_bound * variable_bound)
+    travel_time = LinExpr(coefficients.tolist(), edge_vars.ravel().tolist())
     m.setObjectiveN(travel_time, m.NumObj, weight=weight)
 
+def compute_variable_bounds(variables, capability_distribution,
+                            variable_bound):
+    '''Computes upper bounds for the state, transition, and proposition-state
+    variables based on the number of agents of each class that can reach each
+    state by each time step.
+
+    Input
+    -----
+    - The registry of planning variables.
+    - The initial distribution of capabilities at each state.
+    - The upper bound for variables.
+
+    Output
+    ------
+    Dictionary from tensor names ('state', 'edge', 'prop') to integer arrays
+    of upper bounds with the shapes of the tensors in the registry.
+
+    Note
+    ----
+    The number of agents of class g at state q at time k is bounded by the
+    number of agents of class g with shortest travel time to q at most k. The
+    transitions leaving q at time k are bounded by the same number, and are
+    zero if they can not be completed within the time bound.
+    '''
+    ts = variables.ts
+    time_bound = variables.time_bound
+    eta = variables.distribution_array(capability_distribution)
+    starts = np.flatnonzero(eta.sum(axis=1))
+
+    # number of agents of each class by earliest arrival time at each state;
+    # the last slot collects the agents that can not arrive in time
+    arrivals = np.zeros((ts.num_states, time_bound+2, variables.num_classes),
+                        dtype=np.int64)
+    if len(starts) > 0:
+        times = np.minimum(travel_times(ts, starts), time_bound+1)
+        times = times.astype(np.int64)
+        start_index, state_index = np.indices(times.shape)
+        np.add.at(arrivals, (state_index.ravel(), times.ravel()),
+                  eta[starts[start_index.ravel()]])
+    state_bounds = np.cumsum(arrivals[:, :time_bound+1], axis=1)
+    state_bounds = np.minimum(state_bounds.transpose(0, 2, 1), variable_bound)
+
+    edge_bounds = state_bounds[ts.sources, :, :time_bound]
+    completed = (np.asarray(ts.weights)[:, np.newaxis]
+                 + np.arange(time_bound)[np.newaxis, :]) <= time_bound
+    edge_bounds = edge_bounds * completed[:, np.newaxis, :]
+
+    prop_bounds = np.einsum('lgk,gc->lck', state_bounds[variables.label_states],
+                            variables.class_capabilities.astype(np.int64))
+    prop_bounds = np.minimum(prop_bounds, variable_bound)
+    return {'state': state_bounds, 'edge': edge_bounds, 'prop': prop_bounds}
+
+def compute_stl_ranges(variables, ast, stl, prop_bounds, num_agents):
+    '''Computes the ranges of the variables of the STL formula obtained from
+    the CaTL specification. The variable {prop}_{cap} is bounded at each time
+    step by the minimum over the states labeled by {prop} of the bounds of the
+    proposition-state variables for capability {cap}.
+
+    Input
+    -----
+    - The registry of planning variables.
+    - The AST of the CaTL specification formula.
+    - The AST of the STL formula obtained from the CaTL specification.
+    - The bounds of the proposition-state variables, see
+    `compute_variable_bounds`.
+    - The number of agents.
+
+    Output
+    ------
+    Pair of dictionaries from STL variables to ranges (pairs of lower and upper
+    bounds), and to arrays of upper bounds at each time step.
+    '''
+    stl_variables = stl.variables()
+    ranges = {variable: (0, num_agents) for variable in stl_variables}
+    time_bounds = dict()
+    for prop in ast.propositions():
+        labels = variables.proposition_labels(prop)
+        for c in ast.capabilities():
+            variable = '{prop}_{cap}'.format(prop=prop, cap=c)
+            if variable not in stl_variables:
+                continue
+            if c in variables.capability_index and len(labels) > 0:
+                n = variables.capability_index[c]
+                bound = prop_bounds[labels, n, :].min(axis=0)
+            else:
+                bound = np.zeros(variables.time_bound+1, dtype=np.int64)
+            ranges[variable] = (0, int(bound.max()))
+            time_bounds[variable] = bound
+    return ranges, time_bounds
+
+def tighten_variable_bounds(m, variables, bounds, stl_milp, stl_bounds):
+    '''Sets the upper bounds of the planning variables and of the variables of
+    the MILP encoding of the STL formula.
+
+    Input
+    -----
+    - The Gurobi model variable.
+    - The registry of planning variables.
+    - The bounds of the planning variables, see `compute_variable_bounds`.
+    - The MILP encoding of the STL formula obtained from the CaTL specification.
+    - The bounds of the STL variables at each time step, see
+    `compute_stl_ranges`.
+    '''
+    m.update()
+    for name, array in variables.tensors():
+        if name in bounds:
+            m.setAttr('UB', array.ravel().tolist(),
+                      bounds[name].ravel().tolist())
+
+    for variable, bound in stl_bounds.items():
+        for k, v in stl_milp.variables.get(variable, dict()).items():
+            if k < len(bound):
+                v.UB = min(v.UB, bound[k])
+
+def attach_graph_variables(ts, variables):
+    '''Stores the planning variables in the node and edge attributes of the
+    graph of the `lomap.Ts` transition system `ts`, i.e.,
+
+        ts.g.node[u]['vars'][k][g] is z_{u}_bitmap(g)_k
+        ts.g[u][v]['vars'][k][g] is z_{u}_{v}_bitmap(g)_k
+        ts.g.node[u]['prop_vars'][c][k][prop] is z_{prop}_{u}_{c}_k
+
+    where g is an agent class (frozen set of capabilities), c is a capability,
+    and k is the time step.
+
+    Note
+    ----
+    The attributes are kept for existing callers of the graph-based interface.
+    New code should use the registry of planning variables, see
+    `PlanningVariables`.
+    '''
+    nodes = {str(u): u for u in ts.g.nodes()}
+    states = [nodes[u] for u in variables.ts.states.tolist()]
+    classes = variables.classes
+    time_bound = variables.time_bound
+
+    for i, u in enumerate(states):
+        ts.g.node[u]['vars'] = [
+            dict(zip(classes, variables.state_vars[i, :, k].tolist()))
+            for k in range(time_bound+1)]
+    sources = variables.ts.sources.tolist()
+    targets = variables.ts.targets.tolist()
+    for e, (i, j) in enumerate(zip(sources, targets)):
+        ts.g[states[i]][states[j]]['vars'] = [
+            dict(zip(classes, variables.edge_vars[e, :, k].tolist()))
+            for k in range(time_bound)]
+
+    if variables.prop_vars is None:
+        return
+    label_props = variables.ts.propositions[variables.label_props].tolist()
+    for i, u in enumerate(states):
+        ts.g.node[u]['prop_vars'] = {c: [dict() for _ in range(time_bound+1)]
+                                     for c in variables.capabilities}
+    for l, i in enumerate(variables.label_states.tolist()):
+        prop_vars = ts.g.node[states[i]]['prop_vars']
+        for n, c in enumerate(variables.capabilities):
+            for k in range(time_bound+1):
+                prop_vars[c][k][label_props[l]] = variables.prop_vars[l, n, k]
+
 def extract_trajetories(m, ts, agents, time_bound):
     '''TODO:
     '''
@@ -329,66 +759,180 @@ def extract_trajetories(m, ts, agents, time_bound):
 
     return trajectories
 
-def route_planning(ts, agents, formula, time_bound=None, variable_bound=None,
-                   robust=True, travel_time_weight=0):
-    '''Performs route planning for agents `agents' moving in a transition system
-    `ts' such that the CaTL specification `formula' is satisfied.
-
-    Input
-    -----
-    - The transition system specifying the environment.
-    - List of agents, where agents are tuples (q, cap), q is the initial state
-    of the agent, and cap is the set of capabilities. Agents' identifiers are
-    their indices in the list.
-    - The CaTL specification formula.
-    - The time bound used in the encoding (default: computed from CaTL formula).
-    - The upper bound for variables.
-    - Flag indicating whether to solve the robust or feasibility problem.
-    - The weight of the total travel time objective used for regularization.
+def build_model(ts, agents, formula, time_bound=None, variable_bound=None,
+                robust=True, travel_time_weight=0, cache=None, precheck=False,
+                tight_bounds=True, stl_lower_bound=0, lazy=None,
+                resources=None, graph_attributes=False):
+    '''Builds the MILP for planning the routes of agents `agents' moving in a
+    transition system `ts' such that the CaTL specification `formula' is
+    satisfied. See `route_planning` for the description of the parameters.
+    The formula may be given either as a string or as a parsed `CATLFormula`.
+    The lower bound of the variables of the STL formula is `stl_lower_bound`
+    (default: 0).
 
     Output
     ------
-    TODO: TBD
+    The Gurobi model. The registry of planning variables (see
+    `PlanningVariables`) is stored in the `_variables` attribute of the model,
+    the robustness variable in the `_rho` attribute, if robust, and the lists
+    of proposition constraints in the `_prop_state` and `_min_prop` attributes,
+    see `add_proposition_constraints`, and the list of constraints bounding the
+    resource variables of the STL formula in the `_min_res` attribute, see
+    `add_resource_constraints`. The callbacks used by the optimization
+    are stored in the `_callbacks` attribute, see `add_callback`.
     '''
-    ast = CATLFormula.from_formula(formula)
+    if lazy not in LAZY_MODES:
+        raise ValueError('Unknown lazy constraint mode {}!'.format(lazy))
+    if lazy == 'callback' and cache is not None:
+        raise ValueError('Lazy constraint callbacks can not be cached!')
+
+    if isinstance(formula, CATLFormula):
+        ast = formula
+    else:
+        ast = CATLFormula.from_formula(formula)
     if time_bound is None:
         time_bound = int(ast.bound())
 
     if variable_bound is None:
         variable_bound = len(agents)
 
-    # create MILP
-    m = GRBModel('milp')
-
-    # create system variables
-    capabilities = compute_capability_bitmap(agents)
-    agent_classes = compute_agent_classes(agents, capabilities)
-    create_system_variables(m, ts, agent_classes, time_bound, variable_bound)
-
-    # add system constraints
-    capability_distribution = compute_initial_capability_distribution(ts,
-                                                          agents, agent_classes)
-    add_system_constraints(m, ts, agent_classes, capability_distribution,
-                           time_bound)
-
-    # add CATL formula constraints
-    stl = catl2stl(ast)
-    ranges = {variable: (0, len(agents)) for variable in stl.variables()}
-    stl_milp = stl2milp(stl, ranges=ranges, model=m, robust=robust)
-    stl_milp.translate()
-
-    # add proposition constraints
-    add_proposition_constraints(m, stl_milp, ts, ast, capabilities,
-                                agent_classes, time_bound, variable_bound)
+    unknown = ast.resources() - set(resources or ())
+    if unknown:
+        raise ValueError('Unknown resources in the formula: {}!'.format(
+                                                    ', '.join(sorted(unknown))))
+
+    lomap_ts = None
+    if not isinstance(ts, CompactTs):
+        lomap_ts, ts = ts, CompactTs.from_ts(ts)
+
+    if precheck:
+        report = check_feasibility(ts, agents, ast, resources)
+        if report.infeasible:
+            logging.error('%s', report)
+            raise InfeasibleSpecification(report)
+
+    variables, agent_classes, capability_distribution = \
+                compute_planning_variables(ts, agents, time_bound, resources)
+    # the STL variables z_{prop}_{cap} and z_{prop}_{res} must be distinct
+    shared = set(variables.resources) & set(variables.capabilities)
+    if shared:
+        raise ValueError('Resources can not have the names of capabilities: '
+                         '{}!'.format(', '.join(sorted(shared))))
+
+    m = None
+    if cache is not None:
+        options = dict(robust=robust, variable_bound=variable_bound,
+                       travel_time_weight=travel_time_weight,
+                       tight_bounds=tight_bounds,
+                       stl_lower_bound=stl_lower_bound, lazy=lazy)
+        if resources:
+            options['resources'] = (variables.resources,
+                                    variables.resource_capacities.tolist(),
+                                    variables.resource_initial.tolist())
+        key = scenario_fingerprint(ts, agent_classes, capability_distribution,
+                                   time_bound, ast, **options)
+        cached = cache.load(key)
+        if cached is not None:
+            m, index_maps, metadata = cached
+            constraints = variables.load_index_maps(m, index_maps, metadata)
+            m._rho = m.getVarByName('rho') if robust else None
+            m._prop_state = constraints['prop_state']
+            m._min_prop = constraints['min_prop']
+            m._min_res = constraints.get('min_res', [])
+            m._callbacks = []
+
+    if m is None:
+        # create MILP
+        m = GRBModel('milp')
+        m._callbacks = []
+
+        # create system variables
+        create_system_variables(m, variables, variable_bound)
+
+        # add system constraints
+        add_system_constraints(m, variables, capability_distribution)
+
+        # create resource variables
+        if resources:
+            create_resource_variables(m, variables, variable_bound)
+
+        # add CATL formula constraints
+        stl = catl2stl(ast)
+        if tight_bounds:
+            bounds = compute_variable_bounds(variables,
+                                    capability_distribution, variable_bound)
+            ranges, stl_bounds = compute_stl_ranges(variables, ast, stl,
+                                                    bounds['prop'], len(agents))
+        else:
+            ranges = {variable: (0, len(agents))
+                      for variable in stl.variables()}
+        for prop in ast.propositions():
+            for n, r in enumerate(variables.resources):
+                variable = '{prop}_{res}'.format(prop=prop, res=r)
+                if variable in ranges:
+                    total = float(variables.resource_initial[n].sum())
+                    ranges[variable] = (0, total)
+        ranges = {variable: (stl_lower_bound, high)
+                  for variable, (_, high) in ranges.items()}
+        stl_milp = stl2milp(stl, ranges=ranges, model=m, robust=robust)
+        stl_milp.translate()
+        m._rho = stl_milp.rho if robust else None
+
+        # add proposition constraints
+        m._prop_state, m._min_prop = add_proposition_constraints(m, stl_milp,
+                                variables, ast, variable_bound, lazy=lazy)
+
+        # add resource constraints
+        m._min_res = []
+        if resources:
+            m._min_res = add_resource_constraints(m, stl_milp, variables, ast)
+
+        if tight_bounds:
+            tighten_variable_bounds(m, variables, bounds, stl_milp, stl_bounds)
+
+        # add travel time regularization
+        if travel_time_weight > 0:
+            add_travel_time_objective(m, variables, travel_time_weight,
+                                      variable_bound)
+
+        if cache is not None:
+            index_maps = variables.index_maps(m, {'prop_state': m._prop_state,
+                                                  'min_prop': m._min_prop,
+                                                  'min_res': m._min_res})
+            cache.store(key, m, index_maps, variables.metadata())
+
+    # the registry of planning variables is available to the caller
+    m._variables = variables
+    if graph_attributes and lomap_ts is not None:
+        attach_graph_variables(lomap_ts, variables)
+    return m
 
-    # add travel time regularization
-    if travel_time_weight > 0:
-        add_travel_time_objective(m, ts, travel_time_weight, time_bound,
-                                  variable_bound)
+def add_callback(m, callback):
+    '''Registers the Gurobi callback `callback` with model `m`. All registered
+    callbacks are called by `optimize` in the order they were added.
+    '''
+    m._callbacks.append(callback)
 
-    # run optimizer
-    m.optimize()
+def optimize(m, callback=None):
+    '''Optimizes the model `m` with the callbacks registered with
+    `add_callback`, and the additional callback `callback`, if given.
+    '''
+    callbacks = list(getattr(m, '_callbacks', []))
+    if callback is not None:
+        callbacks.append(callback)
+
+    if not callbacks:
+        m.optimize()
+    elif len(callbacks) == 1:
+        m.optimize(callbacks[0])
+    else:
+        def dispatch(model, where):
+            for cb in callbacks:
+                cb(model, where)
+        m.optimize(dispatch)
 
+def log_status(m):
+    '''Logs the status of the optimization of model `m`.'''
     if m.status == GRB.Status.OPTIMAL:
         logging.info('"Optimal objective LP": %f', m.objVal)
     elif m.status == GRB.Status.INF_OR_UNBD:
@@ -400,5 +944,63 @@ def route_planning(ts, agents, formula, time_bound=None, variable_bound=None,
     else:
         logging.error('Optimization ended with status %s', m.status)
 
+def route_planning(ts, agents, formula, time_bound=None, variable_bound=None,
+                   robust=True, travel_time_weight=0, cache=None,
+                   precheck=False, tight_bounds=True, lazy=None,
+                   resources=None, graph_attributes=False):
+    '''Performs route planning for agents `agents' moving in a transition system
+    `ts' such that the CaTL specification `formula' is satisfied.
+
+    Input
+    -----
+    - The transition system specifying the environment, either a `lomap.Ts`
+    object or its compact form `CompactTs`.
+    - List of agents, where agents are tuples (q, cap), q is the initial state
+    of the agent, and cap is the set of capabilities. Agents' identifiers are
+    their indices in the list. Alternatively, the agents may be given as a
+    `Fleet`.
+    - The CaTL specification formula.
+    - The time bound used in the encoding (default: computed from CaTL formula).
+    - The upper bound for variables.
+    - Flag indicating whether to solve the robust or feasibility problem.
+    - The weight of the total travel time objective used for regularization.
+    - Optional model cache used to skip building the MILP when the same
+    scenario was encoded before (default: no caching).
+    - Flag indicating whether to statically check the specification for
+    infeasibility before building the MILP (default: false). If the check
+    fails, an `InfeasibleSpecification` exception is raised.
+    - Flag indicating whether to tighten the upper bounds of variables based on
+    the agent classes and travel times (default: true).
+    - The mode of adding the proposition constraints: None for regular
+    constraints, 'attribute' for lazy constraints, or 'callback' for
+    constraints separated in a callback (default: None), see
+    `add_proposition_constraints`.
+    - The resources carried by the agents given as a dictionary from resource
+    names to dictionaries with the per-agent capacities of capabilities
+    `capacity` and the initial amounts at states `initial` (default: none),
+    see `PlanningVariables.set_resources`. The resources requested by the
+    formula are encoded as aggregated continuous flows, see
+    `add_resource_constraints`. The names of resources and capabilities must
+    be distinct.
+    - Flag indicating whether to store the variables in the deprecated graph
+    attributes of a `lomap.Ts` transition system (default: false), see
+    `attach_graph_variables`.
+
+    Output
+    ------
+    The Gurobi model. The registry of planning variables (see
+    `PlanningVariables`) is stored in the `_variables` attribute of the model,
+    and the robustness variable in the `_rho` attribute, if robust. Use
+    `PlanSolution.from_model` to retrieve the plan.
+    '''
+    m = build_model(ts, agents, formula, time_bound, variable_bound, robust,
+                    travel_time_weight, cache, precheck, tight_bounds,
+                    lazy=lazy, resources=resources,
+                    graph_attributes=graph_attributes)
+
+    # run optimizer
+    optimize(m)
+    log_status(m)
+
 #     return extract_trajetories(m, ts, agents, time_bound) #TODO:
     return m
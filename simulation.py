@@ -0,0 +1,283 @@
+'''
+ Copyright (C) 2020 Cristian Ioan Vasile <cvasile@lehigh.edu>
+ Explainable Robotics Lab (ERL), Autonomous and Intelligent Robotics (AIR) Lab,
+ Lehigh University
+ See license.txt file for license information.
+'''
+
+import math
+import logging
+
+import numpy as np
+
+from stl import Operation as STLOperation
+from stl import RelOperation as STLRelOperation
+from catl import CATLFormula
+from catl import catl2stl
+from compact_ts import CompactTs
+
+
+def poisson_delays(ratio):
+    '''Returns the delay model where the delay of a traversal of a transition
+    with duration `w` is Poisson distributed with mean `ratio * w`.
+    '''
+    def delays(rng, weight, size):
+        return rng.poisson(ratio * weight, size=size)
+    return delays
+
+def wilson_interval(successes, trials, confidence=0.95):
+    '''Returns the Wilson score confidence interval of the success probability
+    of a Bernoulli distribution.
+    '''
+    if trials == 0:
+        return 0.0, 1.0
+    # the two-sided quantile of the standard normal distribution
+    low, high = 0.0, 10.0
+    for _ in range(100):
+        z = (low + high) / 2
+        if math.erf(z / math.sqrt(2)) < confidence:
+            low = z
+        else:
+            high = z
+    p = float(successes) / trials
+    denominator = 1 + z**2 / trials
+    center = (p + z**2 / (2 * trials)) / denominator
+    radius = (z * math.sqrt(p * (1 - p) / trials + z**2 / (4 * trials**2))
+              / denominator)
+    return max(center - radius, 0.0), min(center + radius, 1.0)
+
+
+class SimulationResult(object):
+    '''Result of the Monte-Carlo simulation of a plan. The robustness of the
+    specification for each rollout is `robustness`, and a rollout is
+    successful if the robustness is non-negative.
+    '''
+
+    def __init__(self, robustness, confidence):
+        '''Constructor'''
+        self.robustness = robustness
+        self.confidence = confidence
+
+    @property
+    def rollouts(self):
+        return len(self.robustness)
+
+    @property
+    def successes(self):
+        return int(np.count_nonzero(self.robustness >= 0))
+
+    @property
+    def probability(self):
+        return float(self.successes) / self.rollouts
+
+    @property
+    def interval(self):
+        return wilson_interval(self.successes, self.rollouts, self.confidence)
+
+    def __str__(self):
+        low, high = self.interval
+        return ('Success probability: {:.4f}, {:.0f}% CI: [{:.4f}, {:.4f}] '
+                '({} rollouts)'.format(self.probability, 100 * self.confidence,
+                                       low, high, self.rollouts))
+
+
+def stl_robustness(formula, signals, horizon, memo=None):
+    '''Computes the robustness of the STL formula at all times for a batch of
+    signals.
+
+    Input
+    -----
+    - The STL formula.
+    - Dictionary from variable names to arrays of shape (rollouts, horizon).
+    - The number of time steps of the signals.
+
+    Output
+    ------
+    Float array of shape (rollouts, horizon) with the robustness at each time.
+    The windows of temporal operators are truncated at the end of the signals.
+    '''
+    if memo is None:
+        memo = dict()
+    if formula in memo:
+        return memo[formula]
+
+    def child(f):
+        return stl_robustness(f, signals, horizon, memo)
+
+    rollouts = len(next(iter(signals.values()))) if signals else 1
+    if formula.op == STLOperation.BOOL:
+        value = np.inf if formula.value else -np.inf
+        rho = np.full((rollouts, horizon), value)
+    elif formula.op == STLOperation.PRED:
+        if formula.variable not in signals:
+            raise ValueError('Unknown signal {}!'.format(formula.variable))
+        signal = signals[formula.variable].astype(np.float64)
+        if formula.relation in (STLRelOperation.GE, STLRelOperation.GT):
+            rho = signal - formula.threshold
+        elif formula.relation in (STLRelOperation.LE, STLRelOperation.LT):
+            rho = formula.threshold - signal
+        else:
+            raise ValueError('Unsupported relation {}!'.format(
+                                                            formula.relation))
+    elif formula.op == STLOperation.AND:
+        rho = np.minimum.reduce([child(ch) for ch in formula.children])
+    elif formula.op == STLOperation.OR:
+        rho = np.maximum.reduce([child(ch) for ch in formula.children])
+    elif formula.op == STLOperation.NOT:
+        rho = -child(formula.child)
+    elif formula.op == STLOperation.IMPLIES:
+        rho = np.maximum(-child(formula.left), child(formula.right))
+    elif formula.op in (STLOperation.EVENT, STLOperation.ALWAYS):
+        if formula.op == STLOperation.EVENT:
+            reduce, rho = np.maximum, np.full((rollouts, horizon), -np.inf)
+        else:
+            reduce, rho = np.minimum, np.full((rollouts, horizon), np.inf)
+        values = child(formula.child)
+        for tau in range(int(formula.low), min(int(formula.high), horizon-1)+1):
+            rho[:, :horizon-tau] = reduce(rho[:, :horizon-tau],
+                                          values[:, tau:])
+    elif formula.op == STLOperation.UNTIL:
+        left, right = child(formula.left), child(formula.right)
+        rho = np.full((rollouts, horizon), -np.inf)
+        running = left.copy() # minimum of the left formula over [t, t+tau]
+        for tau in range(min(int(formula.high), horizon-1)+1):
+            running[:, :horizon-tau] = np.minimum(running[:, :horizon-tau],
+                                                  left[:, tau:])
+            if tau >= formula.low:
+                rho[:, :horizon-tau] = np.maximum(rho[:, :horizon-tau],
+                        np.minimum(right[:, tau:], running[:, :horizon-tau]))
+    else:
+        raise ValueError('Unknown operation {}!'.format(formula.op))
+    memo[formula] = rho
+    return rho
+
+def grow_ring_buffer(ring, start, size):
+    '''Returns a copy of the ring buffer `ring` with `size` slots. The slots of
+    the times from `start` to `start + len(ring) - 1` are moved to the slots of
+    the same times in the new buffer, i.e., time t is stored in slot t modulo
+    the number of slots.
+    '''
+    grown = np.zeros((size,) + ring.shape[1:], dtype=ring.dtype)
+    for t in range(start, start + len(ring)):
+        grown[t % size] = ring[t % len(ring)]
+    return grown
+
+def simulate(ts, solution, formula, rollouts=10000, delays=None,
+             confidence=0.95, seed=None):
+    '''Simulates the execution of the plan with stochastic transition
+    durations, and evaluates the specification on each rollout.
+
+    The rollouts are simulated simultaneously as arrays. Each agent class
+    follows the planned departures: at each time, the planned number of agents
+    departing along each transition is added to the backlog of the transition,
+    and the backlog is dispatched greedily from the agents available at the
+    source state. Thus, delayed agents depart as soon as they arrive. Each
+    dispatched group of agents is delayed by a random number of time steps
+    given by the delay model, and agents arriving after the time bound are
+    lost.
+
+    Input
+    -----
+    - The transition system.
+    - The solution with the planned transition flows.
+    - The CaTL specification formula (string or AST).
+    - The number of rollouts.
+    - The delay model, i.e., a function that takes a random number generator,
+    the duration of a transition, and the number of rollouts, and returns the
+    integer array of delays (default: `poisson_delays(0.2)`).
+    - The confidence level of the interval of the success probability.
+    - The seed of the random number generator.
+
+    Output
+    ------
+    The simulation result, see `SimulationResult`.
+
+    Note
+    ----
+    As in the MILP encoding, the signal z_{prop}_{cap} is the minimum over the
+    states labeled by `prop` of the number of agents with capability `cap`.
+    The MILP may choose smaller values of the signal, thus the robustness of
+    limits L(...) in a rollout without delays can be smaller than the
+    robustness of the plan. The signals of capabilities that no agent has, and
+    of propositions that label no states are zero. Specifications with
+    resource requests are not supported, since the resource levels are not
+    simulated. The pending arrivals are kept only for the time steps up to the
+    longest transition duration plus the largest delay sampled so far.
+    '''
+    if not isinstance(ts, CompactTs):
+        ts = CompactTs.from_ts(ts)
+    if isinstance(formula, CATLFormula):
+        ast = formula
+    else:
+        ast = CATLFormula.from_formula(formula)
+    if ast.resources():
+        raise ValueError('Simulation of specifications with resource requests '
+                         '{} is not supported!'.format(sorted(ast.resources())))
+    if delays is None:
+        delays = poisson_delays(0.2)
+    rng = np.random.RandomState(seed)
+
+    time_bound = solution.time_bound
+    num_states, num_classes = solution.team_state.shape[:2]
+    sources, targets = solution.sources, solution.targets
+    weights = np.asarray(solution.weights)
+    planned = solution.flows * (sources != targets)[:, np.newaxis, np.newaxis]
+    edges = np.flatnonzero(planned.sum(axis=(1, 2)))
+
+    # signals z_{prop}_{cap} as minimums over the labeled states of the numbers
+    # of agents with the capability, the other signals are zero
+    capabilities = solution.capabilities.tolist()
+    class_capabilities = solution.class_capabilities.astype(np.int32)
+    signal_states = dict()
+    signals = dict()
+    for prop in ast.propositions():
+        states = ts.proposition_states(prop)
+        for cap in ast.capabilities():
+            name = '{}_{}'.format(prop, cap)
+            signals[name] = np.zeros((rollouts, time_bound+1), dtype=np.int32)
+            if len(states) > 0 and cap in capabilities:
+                signal_states[name] = (states, capabilities.index(cap))
+
+    available = np.zeros((rollouts, num_states, num_classes), dtype=np.int32)
+    backlog = np.zeros((rollouts, len(edges), num_classes), dtype=np.int32)
+    # ring buffer of the pending arrivals, the arrivals at time t are stored in
+    # slot t modulo the length of the buffer, see `grow_ring_buffer`
+    longest = int(weights[edges].max()) if len(edges) else 0
+    arrivals = np.zeros((min(longest, time_bound) + 1, rollouts, num_states,
+                         num_classes), dtype=np.int32)
+    arrivals[0] = solution.team_state[:, :, 0]
+    index = np.arange(rollouts)
+    for k in range(time_bound+1):
+        slot = k % len(arrivals)
+        available += arrivals[slot]
+        arrivals[slot] = 0
+        counts = available.dot(class_capabilities)
+        for name, (states, c) in signal_states.items():
+            signals[name][:, k] = counts[:, states, c].min(axis=1)
+        if k == time_bound:
+            break
+
+        backlog += planned[edges, :, k][np.newaxis]
+        for n, e in enumerate(edges.tolist()):
+            dispatched = np.minimum(backlog[:, n], available[:, sources[e]])
+            if not dispatched.any():
+                continue
+            backlog[:, n] -= dispatched
+            available[:, sources[e]] -= dispatched
+            arrival = k + weights[e] + delays(rng, weights[e], rollouts)
+            on_time = np.flatnonzero(arrival <= time_bound)
+            if len(on_time) == 0:
+                continue
+            horizon = int(arrival[on_time].max()) - k + 1
+            if horizon > len(arrivals):
+                arrivals = grow_ring_buffer(arrivals, k,
+                                min(max(horizon, 2 * len(arrivals)),
+                                    time_bound + 1))
+            np.add.at(arrivals, (arrival[on_time] % len(arrivals),
+                                 index[on_time], targets[e]),
+                      dispatched[on_time])
+
+    robustness = stl_robustness(catl2stl(ast), signals, time_bound+1)[:, 0]
+    result = SimulationResult(robustness, confidence)
+    logging.info('%s', result)
+    return result
@@ -0,0 +1,193 @@
+'''
+ Copyright (C) 2020 Cristian Ioan Vasile <cvasile@lehigh.edu>
+ Explainable Robotics Lab (ERL), Autonomous and Intelligent Robotics (AIR) Lab,
+ Lehigh University
+ See license.txt file for license information.
+'''
+
+import os
+
+import numpy as np
+
+
+class PlanSolution(object):
+    '''Solution of a route planning MILP stored as dense arrays.
+
+    The team state is an integer array of shape (states, classes, time) such
+    that `team_state[i, j, k]` is the number of agents of class `j` at state
+    `i` at time `k`. The transition flows are an integer array of shape
+    (transitions, classes, time) such that `flows[e, j, k]` is the number of
+    agents of class `j` that start traversing transition `e` at time `k`.
+    The classes are described by the boolean matrix `class_capabilities` of
+    shape (classes, capabilities).
+    If the agents carry resources, the resource names are `resources`, the
+    resource flows are a float array of shape (resources, transitions, classes,
+    time), and the resource levels at states are a float array of shape
+    (resources, states, time), see `PlanningVariables`.
+    '''
+
+    ARRAYS = ('states', 'sources', 'targets', 'weights', 'capabilities',
+              'class_codes', 'class_capabilities', 'team_state', 'flows')
+    OPTIONAL_ARRAYS = ('resources', 'resource_flows', 'resource_levels')
+    SCALARS = ('status', 'objective', 'robustness', 'gap')
+
+    def __init__(self, states, sources, targets, weights, capabilities,
+                 class_codes, class_capabilities, team_state, flows,
+                 status=None, objective=None, robustness=None, gap=None,
+                 resources=None, resource_flows=None, resource_levels=None):
+        '''Constructor'''
+        self.states = states
+        self.sources = sources
+        self.targets = targets
+        self.weights = weights
+        self.capabilities = capabilities
+        self.class_codes = class_codes
+        self.class_capabilities = class_capabilities
+        self.team_state = team_state
+        self.flows = flows
+        self.status = status
+        self.objective = objective
+        self.robustness = robustness
+        self.gap = gap
+        self.resources = resources
+        self.resource_flows = resource_flows
+        self.resource_levels = resource_levels
+
+    @property
+    def time_bound(self):
+        return self.team_state.shape[2] - 1
+
+    @property
+    def classes(self):
+        '''Returns the list of agent classes as frozen sets of capabilities.'''
+        return [frozenset(self.capabilities[row].tolist())
+                for row in self.class_capabilities]
+
+    @classmethod
+    def from_values(cls, variables, state_values, edge_values, **kwargs):
+        '''Creates the solution from the values of the system variables given
+        as arrays with the shapes of the tensors in the registry of planning
+        variables `variables`. The values of the resource variables are passed
+        as the keyword arguments `resource_flows` and `resource_levels`.
+        '''
+        if variables.resources:
+            kwargs['resources'] = np.array(variables.resources, dtype=np.str_)
+        ts = variables.ts
+        return cls(np.asarray(ts.states), np.asarray(ts.sources),
+                   np.asarray(ts.targets), np.asarray(ts.weights),
+                   np.array(variables.capabilities, dtype=np.str_),
+                   variables.class_codes, variables.class_capabilities,
+                   np.rint(state_values).astype(np.int64),
+                   np.rint(edge_values).astype(np.int64), **kwargs)
+
+    @classmethod
+    def from_model(cls, m, variables=None):
+        '''Retrieves the solution of the solved model `m` with a single bulk
+        attribute query over the state and transition variables, and the
+        robustness variable, if present.
+
+        Input
+        -----
+        - The solved Gurobi model variable.
+        - The registry of planning variables (default: `m._variables`).
+
+        Output
+        ------
+        The solution object.
+        '''
+        if variables is None:
+            variables = m._variables
+        state_vars, edge_vars = variables.state_vars, variables.edge_vars
+        rho = getattr(m, '_rho', None)
+
+        tensors = [state_vars, edge_vars]
+        if variables.resource_flow_vars is not None:
+            tensors += [variables.resource_flow_vars,
+                        variables.resource_level_vars]
+        handles = [v for array in tensors for v in array.ravel().tolist()]
+        if rho is not None:
+            handles.append(rho)
+        values = np.array(m.getAttr('X', handles), dtype=np.float64)
+
+        robustness = float(values[-1]) if rho is not None else None
+        arrays, offset = [], 0
+        for array in tensors:
+            arrays.append(values[offset:offset+array.size].reshape(array.shape))
+            offset += array.size
+        state_values, edge_values = arrays[:2]
+        resources = dict(zip(('resource_flows', 'resource_levels'),
+                             arrays[2:]))
+        if m.IsMultiObj: # the gap is not available for multiple objectives
+            gap = None
+        else:
+            gap = m.MIPGap if m.IsMIP else 0.0
+        return cls.from_values(variables, state_values, edge_values,
+                               status=m.Status, objective=m.ObjVal,
+                               robustness=robustness, gap=gap, **resources)
+
+    def save(self, filename, compressed=True):
+        '''Saves the solution to an NPZ file.'''
+        arrays = {name: getattr(self, name) for name in self.ARRAYS}
+        for name in self.OPTIONAL_ARRAYS:
+            if getattr(self, name) is not None:
+                arrays[name] = getattr(self, name)
+        for name in self.SCALARS:
+            value = getattr(self, name)
+            arrays[name] = np.array(np.nan if value is None else value,
+                                    dtype=np.float64)
+        if compressed:
+            np.savez_compressed(filename, **arrays)
+        else:
+            np.savez(filename, **arrays)
+
+    @classmethod
+    def load(cls, filename):
+        '''Loads a solution saved in an NPZ file.'''
+        with np.load(filename) as data:
+            arrays = {name: data[name] for name in cls.ARRAYS}
+            for name in cls.OPTIONAL_ARRAYS:
+                if name in data:
+                    arrays[name] = data[name]
+            for name in cls.SCALARS:
+                value = float(data[name])
+                arrays[name] = None if np.isnan(value) else value
+        if arrays['status'] is not None:
+            arrays['status'] = int(arrays['status'])
+        return cls(**arrays)
+
+    def team_state_table(self):
+        '''Returns the non-zero entries of the team state as a dictionary of
+        columns (state, class, time, count).
+        '''
+        i, j, k = np.nonzero(self.team_state)
+        return {'state': self.states[i], 'class': self.class_codes[j],
+                'time': k, 'count': self.team_state[i, j, k]}
+
+    def flow_table(self):
+        '''Returns the non-zero entries of the transition flows as a dictionary
+        of columns (source, target, duration, class, time, count).
+        '''
+        e, j, k = np.nonzero(self.flows)
+        return {'source': self.states[self.sources[e]],
+                'target': self.states[self.targets[e]],
+                'duration': self.weights[e], 'class': self.class_codes[j],
+                'time': k, 'count': self.flows[e, j, k]}
+
+    def to_parquet(self, directory):
+        '''Saves the non-zero team states and transition flows as the Parquet
+        tables `team_state.parquet` and `flows.parquet` in `directory`, and the
+        agent classes as `classes.parquet`. Requires `pandas` with a Parquet
+        engine.
+        '''
+        import pandas as pd
+
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+        pd.DataFrame(self.team_state_table()).to_parquet(
+                            os.path.join(directory, 'team_state.parquet'))
+        pd.DataFrame(self.flow_table()).to_parquet(
+                            os.path.join(directory, 'flows.parquet'))
+        classes = {'class': self.class_codes,
+                   'capabilities': [sorted(g) for g in self.classes]}
+        pd.DataFrame(classes).to_parquet(
+                            os.path.join(directory, 'classes.parquet'))
@@ -0,0 +1,81 @@
+'''
+ Copyright (C) 2020 Cristian Ioan Vasile <cvasile@lehigh.edu>
+ Explainable Robotics Lab (ERL), Autonomous and Intelligent Robotics (AIR) Lab,
+ Lehigh University
+ See license.txt file for license information.
+'''
+
+import os
+import threading
+
+import pytest
+
+pytest.importorskip('gurobipy')
+
+from gurobipy import GRB, GurobiError
+from lomap import Ts
+
+from anytime import route_planning_anytime, solve_anytime
+from compact_ts import CompactTs
+from route_planning import build_model
+
+
+SIMPLE_TS = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                         'simple.yaml')
+AGENTS = [('q1', {'a'}), ('q2', {'a', 'b'})]
+SPECIFICATION = ('F[0, 2] T(1, green, {(a, 1), (b, 1)})'
+                 '&& G[0, 3] L(red, {(a, 0)})')
+
+
+def simple_ts():
+    return CompactTs.from_ts(Ts.load(SIMPLE_TS))
+
+def test_solve_anytime_incumbents():
+    m = build_model(simple_ts(), AGENTS, SPECIFICATION)
+    incumbents = []
+    solve_anytime(m, incumbents.append)
+    assert m.Status == GRB.Status.OPTIMAL
+    assert incumbents
+    # the incumbents are strictly improving, and the last one is optimal
+    objectives = [solution.objective for solution in incumbents]
+    for previous, current in zip(objectives, objectives[1:]):
+        assert m.ModelSense * (current - previous) < 0
+    assert objectives[-1] == pytest.approx(m.ObjVal)
+    variables = m._variables
+    for solution in incumbents:
+        assert solution.status == GRB.Status.INPROGRESS
+        assert solution.team_state.shape == variables.state_vars.shape
+        assert solution.flows.shape == variables.edge_vars.shape
+        assert (solution.team_state.sum(axis=(0, 1)) == len(AGENTS)).all()
+    assert incumbents[-1].robustness == pytest.approx(m._rho.X)
+
+def test_solve_anytime_stop():
+    m = build_model(simple_ts(), AGENTS, SPECIFICATION)
+    incumbents = []
+    solve_anytime(m, lambda solution: incumbents.append(solution) or True)
+    assert m.Status == GRB.Status.INTERRUPTED
+    assert len(incumbents) == 1
+
+def test_route_planning_anytime_stream():
+    solutions = list(route_planning_anytime(simple_ts(), AGENTS,
+                                            SPECIFICATION))
+    assert len(solutions) >= 2
+    assert all(solution.status == GRB.Status.INPROGRESS
+               for solution in solutions[:-1])
+    final = solutions[-1]
+    assert final.status == GRB.Status.OPTIMAL
+    assert final.objective == pytest.approx(solutions[-2].objective)
+
+def test_route_planning_anytime_close():
+    cancel = threading.Event()
+    plans = route_planning_anytime(simple_ts(), AGENTS, SPECIFICATION,
+                                   cancel=cancel)
+    next(plans)
+    plans.close()
+    assert cancel.is_set()
+
+def test_route_planning_anytime_error():
+    plans = route_planning_anytime(simple_ts(), AGENTS, SPECIFICATION,
+                                   mip_gap=-1)
+    with pytest.raises(GurobiError):
+        list(plans)
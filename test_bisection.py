@@ -0,0 +1,70 @@
+'''
+ Copyright (C) 2020 Cristian Ioan Vasile <cvasile@lehigh.edu>
+ Explainable Robotics Lab (ERL), Autonomous and Intelligent Robotics (AIR) Lab,
+ Lehigh University
+ See license.txt file for license information.
+'''
+
+import os
+
+import pytest
+
+pytest.importorskip('gurobipy')
+
+from lomap import Ts
+
+from bisection import robustness_bisection, set_robustness_threshold
+from compact_ts import CompactTs
+from route_planning import build_model, route_planning
+
+
+SIMPLE_TS = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                         'simple.yaml')
+AGENTS = [('q1', {'a'}), ('q2', {'a', 'b'})]
+RESOURCES = {'water': {'capacity': {'a': 5}, 'initial': {'q1': 8}}}
+
+
+def simple_ts():
+    return CompactTs.from_ts(Ts.load(SIMPLE_TS))
+
+@pytest.mark.parametrize('tolerance', [0, -1])
+def test_tolerance(tolerance):
+    with pytest.raises(ValueError):
+        robustness_bisection(simple_ts(), AGENTS,
+                             'F[0, 3] T(1, green, {(a, 1)})',
+                             tolerance=tolerance)
+
+@pytest.mark.parametrize('specification, resources', [
+    ('F[0, 3] T(1, green, {(a, 1)})', None),
+    ('F[0, 2] T(1, green, {(a, 1), (b, 1)})', None),
+    ('T(1, blue, {(a, 1)}) U[0, 3] T(1, orange, {(b, 1)})', None),
+    ('F[0, 4] T(1, green, {(a, 1)}, {(water, 6)})', RESOURCES),
+    ('F[0, 4] T(1, green, {(a, 1)}, {(water, 8)})', RESOURCES),
+])
+def test_bisection_brackets_robustness(specification, resources):
+    ts = simple_ts()
+    result = robustness_bisection(ts, AGENTS, specification,
+                                  resources=resources)
+    m = route_planning(ts, AGENTS, specification, robust=True,
+                       resources=resources)
+    assert result.feasible
+    assert result.robustness <= m._rho.X + 1e-6
+    assert m._rho.X < result.upper - 1e-6
+    assert result.solution.robustness == result.robustness
+
+def test_resource_threshold():
+    m = build_model(simple_ts(), AGENTS,
+                    'F[0, 4] T(1, green, {(a, 1)}, {(water, 8)})',
+                    robust=False, resources=RESOURCES)
+    assert m._min_res
+    set_robustness_threshold(m, 2)
+    m.update()
+    for constr in m._min_prop + m._min_res:
+        assert abs(constr.RHS) == 2
+    # all the water is needed at green, so the resource predicate has zero
+    # robustness
+    result = robustness_bisection(simple_ts(), AGENTS,
+                                  'F[0, 4] T(1, green, {(a, 1)}, {(water, 8)})',
+                                  resources=RESOURCES)
+    assert result.robustness == 0
+    assert result.upper == 1
@@ -0,0 +1,72 @@
+'''
+ Copyright (C) 2020 Cristian Ioan Vasile <cvasile@lehigh.edu>
+ Explainable Robotics Lab (ERL), Autonomous and Intelligent Robotics (AIR) Lab,
+ Lehigh University
+ See license.txt file for license information.
+'''
+
+import os
+
+import numpy as np
+
+from lomap import Ts
+
+from compact_ts import CompactTs
+
+
+SIMPLE_TS = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                         'simple.yaml')
+
+
+def test_from_ts_csr_layout():
+    lomap_ts = Ts.load(SIMPLE_TS)
+    ts = CompactTs.from_ts(lomap_ts)
+    assert ts.num_states == 4
+    assert ts.num_edges == lomap_ts.g.number_of_edges()
+    assert ts.indptr[0] == 0 and ts.indptr[-1] == ts.num_edges
+    # the transitions leaving each state are contiguous and sorted
+    states = ts.states.tolist()
+    for i, u in enumerate(states):
+        targets = ts.targets[ts.out_edges(i)]
+        assert (ts.sources[ts.out_edges(i)] == i).all()
+        assert sorted(states[j] for j in targets) == \
+               sorted(lomap_ts.g.successors(u))
+        assert (np.diff(targets) > 0).all()
+    # the incoming transitions are consistent with the outgoing ones
+    for i in range(ts.num_states):
+        assert (ts.targets[ts.in_edges(i)] == i).all()
+    assert sorted(ts.in_indices.tolist()) == list(range(ts.num_edges))
+    assert (ts.weights == 1).all()
+
+def test_labels():
+    ts = CompactTs.from_ts(Ts.load(SIMPLE_TS))
+    assert ts.propositions.tolist() == ['blue', 'green', 'orange', 'red']
+    assert ts.labels.shape == (4, 4)
+    assert ts.labels.sum(axis=1).tolist() == [1, 1, 1, 1]
+    for prop, state in (('blue', 'q1'), ('orange', 'q2'), ('red', 'q3'),
+                        ('green', 'q4')):
+        i = ts.state_index[state]
+        assert ts.state_propositions(i) == {prop}
+        assert ts.proposition_states(prop).tolist() == [i]
+
+def test_scale():
+    ts = CompactTs.from_ts(Ts.load(SIMPLE_TS))
+    ts.weights = ts.weights * np.arange(1, ts.num_edges + 1)
+    scaled = ts.scale(3)
+    assert scaled.weights.tolist() == [-(-w // 3) for w in ts.weights.tolist()]
+    assert scaled.weights.min() >= 1
+    assert scaled.indptr is ts.indptr and scaled.indices is ts.indices
+
+def test_save_load_mmap(tmpdir):
+    ts = CompactTs.from_ts(Ts.load(SIMPLE_TS))
+    path = str(tmpdir.join('simple'))
+    ts.save(path)
+    for mmap in (True, False):
+        loaded = CompactTs.load(path, mmap=mmap)
+        assert loaded.name == ts.name
+        for name in CompactTs.ARRAYS:
+            array = getattr(loaded, name)
+            assert np.array_equal(array, getattr(ts, name)), name
+            assert isinstance(array, np.memmap) == mmap
+        assert np.array_equal(loaded.labels, ts.labels)
+        assert loaded.state_index == ts.state_index
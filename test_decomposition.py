@@ -0,0 +1,145 @@
+'''
+ Copyright (C) 2020 Cristian Ioan Vasile <cvasile@lehigh.edu>
+ Explainable Robotics Lab (ERL), Autonomous and Intelligent Robotics (AIR) Lab,
+ Lehigh University
+ See license.txt file for license information.
+'''
+
+import os
+
+import numpy as np
+import pytest
+
+from lomap import Ts
+
+from catl import CATLFormula, Operation
+from compact_ts import CompactTs
+from solution import PlanSolution
+import decomposition
+from decomposition import time_windows, shift_formula, stitch
+
+
+SIMPLE_TS = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                         'simple.yaml')
+
+
+def simple_ts():
+    return CompactTs.from_ts(Ts.load(SIMPLE_TS))
+
+def parse(formula):
+    return CATLFormula.from_formula(formula)
+
+def plan_solution(team_state, flows, **kwargs):
+    num_classes = team_state.shape[1]
+    return PlanSolution(np.array(['q1', 'q2']), np.array([0, 0, 1]),
+                        np.array([0, 1, 1]), np.array([1, 1, 1]),
+                        np.array(['a']), np.arange(num_classes),
+                        np.ones((num_classes, 1), dtype=bool),
+                        team_state, flows, **kwargs)
+
+def test_time_windows():
+    ast = parse('F[5, 6] T(1, red, {(a, 1)}) && F[0, 2] T(1, blue, {(a, 1)})'
+                '&& G[1, 3] L(green, {(a, 0)}) && F[8, 8] T(2, red, {(a, 1)})')
+    windows = time_windows(ast)
+    assert [(start, end) for start, end, _ in windows] == \
+           [(0, 3), (5, 7), (8, 10)]
+    assert [len(terms) for _, _, terms in windows] == [2, 1, 1]
+    assert windows[0][2][0].op == Operation.EVENT
+    assert windows[0][2][1].op == Operation.ALWAYS
+    # overlapping or touching windows are merged
+    ast = parse('F[0, 2] T(1, blue, {(a, 1)}) && F[3, 4] T(1, red, {(a, 1)})')
+    assert [(start, end) for start, end, _ in time_windows(ast)] == [(0, 5)]
+    # the left subformula of until is active from time 0
+    ast = parse('F[6, 8] T(1, blue, {(a, 1)})'
+                '&& (T(1, blue, {(a, 1)}) U[4, 5] T(1, red, {(a, 1)}))')
+    windows = time_windows(ast)
+    assert [(start, end) for start, end, _ in windows] == [(0, 9)]
+
+def test_shift_formula():
+    ast = parse('F[3, 5] T(1, blue, {(a, 1)}) && !G[4, 6] L(red, {(a, 0)})')
+    shifted = shift_formula(ast, 3)
+    assert shifted.op == Operation.AND
+    event, negation = shifted.children
+    assert (event.low, event.high) == (0, 2)
+    assert event.child is ast.children[0].child
+    assert negation.op == Operation.NOT
+    assert (negation.child.low, negation.child.high) == (1, 3)
+    assert shift_formula(ast, 0) is ast
+    with pytest.raises(ValueError):
+        shift_formula(ast, 4)
+    with pytest.raises(ValueError):
+        shift_formula(parse('T(1, blue, {(a, 1)})'), 1)
+
+def test_stitch():
+    # one agent moves from q1 to q2 in the first window, and stays at q2
+    first = plan_solution(np.array([[[1, 0]], [[0, 1]]]),
+                          np.array([[[0]], [[1]], [[0]]]),
+                          status=2, objective=1.0, robustness=2.0, gap=0.0)
+    second = plan_solution(np.array([[[0, 0, 0]], [[1, 1, 1]]]),
+                           np.array([[[0, 0]], [[0, 0]], [[1, 1]]]),
+                           status=9, objective=2.0, robustness=1.0, gap=0.5)
+    solution = stitch([first, second], [0, 1])
+    assert solution.time_bound == 3
+    assert solution.team_state[:, 0, :].tolist() == [[1, 0, 0, 0],
+                                                     [0, 1, 1, 1]]
+    assert solution.flows[:, 0, :].tolist() == [[0, 0, 0], [1, 0, 0],
+                                                [0, 1, 1]]
+    assert solution.status == 9
+    assert solution.objective == 3.0
+    assert solution.robustness == 1.0
+    assert solution.gap == 0.5
+    assert stitch([first, plan_solution(second.team_state, second.flows)],
+                  [0, 1]).objective is None
+
+def record_horizons(monkeypatch, infeasible=()):
+    '''Records the horizons of the solved windows, and reports the windows
+    with the given call indices as infeasible.
+    '''
+    solve_window = decomposition.solve_window
+    horizons = []
+    def recording_solve_window(ts, agents, formula, time_bound, **kwargs):
+        horizons.append(time_bound)
+        if len(horizons) - 1 in infeasible:
+            return None
+        return solve_window(ts, agents, formula, time_bound, **kwargs)
+    monkeypatch.setattr(decomposition, 'solve_window', recording_solve_window)
+    return horizons
+
+def test_backtracking_merge(monkeypatch):
+    pytest.importorskip('gurobipy')
+    # the second window is reported infeasible once
+    horizons = record_horizons(monkeypatch, infeasible=(1,))
+    formula = 'F[0, 1] T(1, blue, {(a, 1)}) && F[3, 3] T(1, green, {(a, 1)})'
+    solution = decomposition.route_planning_decomposed(simple_ts(),
+                                                       [('q1', {'a'})], formula)
+    # first window, second window, merged windows
+    assert horizons == [2, 2, 4]
+    assert solution is not None
+    assert solution.time_bound == 4
+    states = simple_ts().states.tolist()
+    assert solution.team_state[states.index('q4'), 0, 3:].tolist() == [1, 1]
+
+def test_backtracking_infeasible_window(monkeypatch):
+    pytest.importorskip('gurobipy')
+    # the agent stays at q1 until time 1, and can not reach q4 at time 2
+    formula = 'F[0, 0] T(1, blue, {(a, 1)}) && F[2, 2] T(1, green, {(a, 1)})'
+    ts, agents = simple_ts(), [('q1', {'a'})]
+    assert [(start, end) for start, end, _
+            in time_windows(parse(formula))] == [(0, 1), (2, 3)]
+
+    horizons = record_horizons(monkeypatch)
+    assert decomposition.route_planning_decomposed(ts, agents, formula) \
+                                                                        is None
+    assert horizons == [1, 2, 3] # the merged window is also infeasible
+
+    del horizons[:]
+    assert decomposition.route_planning_decomposed(ts, agents, formula,
+                                                   backtrack=False) is None
+    assert horizons == [1, 2]
+
+def test_resources_not_supported():
+    resources = {'water': {'capacity': {'a': 5}, 'initial': {'q1': 8}}}
+    formula = 'F[0, 1] T(1, blue, {(a, 1)}) && F[3, 3] T(1, green, {(a, 1)})'
+    with pytest.raises(ValueError):
+        decomposition.route_planning_decomposed(simple_ts(), [('q1', {'a'})],
+                                                formula, resources=resources)
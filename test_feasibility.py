@@ -0,0 +1,116 @@
+'''
+ Copyright (C) 2020 Cristian Ioan Vasile <cvasile@lehigh.edu>
+ Explainable Robotics Lab (ERL), Autonomous and Intelligent Robotics (AIR) Lab,
+ Lehigh University
+ See license.txt file for license information.
+'''
+
+import os
+
+import pytest
+
+from lomap import Ts
+
+from catl import CATLFormula
+from compact_ts import CompactTs
+from feasibility import CapabilityReachability, SpecificationAnalyzer
+from feasibility import check_feasibility, INF
+
+
+SIMPLE_TS = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                         'simple.yaml')
+AGENTS = [('q1', {'a'}), ('q1', {'a'}), ('q2', {'a', 'b'})]
+RESOURCES = {'water': {'capacity': {'a': 5}, 'initial': {'q1': 8}}}
+
+# pairs of specifications and whether they are feasible for `AGENTS`
+SPECIFICATIONS = [
+    ('F[0, 2] T(1, green, {(a, 3)})', True),
+    ('F[0, 1] T(1, green, {(a, 1), (b, 1)})', True),
+    ('F[0, 1] T(1, green, {(a, 2)})', False),
+    ('F[0, 3] T(1, green, {(b, 2)})', False),
+    ('F[0, 3] T(1, green, {(c, 1)})', False),
+    ('G[0, 2] T(1, blue, {(a, 2)})', True),
+    ('F[0, 2] T(1, green, {(a, 1)}) && G[0, 3] L(red, {(a, 0)})', True),
+    ('F[0, 2] T(1, orange, {(a, 1)}) && F[0, 2] T(1, red, {(a, 1)})', True),
+    ('F[2, 2] T(1, orange, {(a, 2)}) && F[2, 2] T(1, red, {(a, 2)})', False),
+    ('F[0, 1] T(1, green, {(a, 2)}) || F[0, 3] T(1, red, {(a, 3)})', True),
+    ('T(1, blue, {(a, 2)}) U[0, 3] T(1, green, {(b, 1)})', True),
+]
+RESOURCE_SPECIFICATIONS = [
+    ('F[0, 3] T(1, green, {(a, 1)}, {(water, 6)})', True),
+    ('F[0, 3] T(1, green, {(a, 2)}, {(water, 8)})', True),
+    ('F[0, 3] T(1, green, {(a, 1)}, {(water, 9)})', False),
+]
+
+
+def simple_ts():
+    return CompactTs.from_ts(Ts.load(SIMPLE_TS))
+
+def test_reachability_counts():
+    reach = CapabilityReachability(simple_ts(), AGENTS)
+    assert reach.total('a') == 3
+    assert reach.total('b') == 1
+    assert reach.total('c') == 0
+    # q4 (green) is two steps from q1, and one step from q2
+    assert [reach.count('green', 'a', t) for t in range(4)] == [0, 1, 3, 3]
+    assert [reach.count('green', 'b', t) for t in range(3)] == [0, 1, 1]
+    assert reach.count('blue', 'a', 0) == 2
+    assert reach.count('green', 'c', 5) == 0
+
+@pytest.mark.parametrize('specification, feasible', SPECIFICATIONS)
+def test_analyzer(specification, feasible):
+    report = check_feasibility(simple_ts(), AGENTS,
+                               CATLFormula.from_formula(specification))
+    assert report.robustness_lower <= report.robustness_upper
+    # sound: feasible specifications are never reported infeasible
+    if feasible:
+        assert not report.infeasible, str(report)
+    else:
+        assert report.infeasible
+
+@pytest.mark.parametrize('specification, feasible', RESOURCE_SPECIFICATIONS)
+def test_analyzer_resources(specification, feasible):
+    report = check_feasibility(simple_ts(), AGENTS,
+                               CATLFormula.from_formula(specification),
+                               RESOURCES)
+    if feasible:
+        assert not report.infeasible, str(report)
+    else:
+        assert report.infeasible
+
+def test_analyzer_resource_bounds():
+    analyzer = SpecificationAnalyzer(simple_ts(), AGENTS, RESOURCES)
+    ast = CATLFormula.from_formula('T(1, green, {(a, 1)}, {(water, 6)})')
+    assert analyzer.upper(ast, 0, 3, []) == 2
+    assert analyzer.lower(ast, 0, 3) == -6
+    # keeping the water away satisfies the negation with robustness 2
+    ast = CATLFormula.from_formula('!T(1, green, {(a, 1)}, {(water, 2)})')
+    assert analyzer.upper(ast, 0, 0, []) == 2
+    ast = CATLFormula.from_formula('L(green, {(a, 1)}, {(water, 2)})')
+    assert analyzer.upper(ast, 0, 0, []) == 1
+    assert analyzer.lower(ast, 0, 0) == -6
+
+def test_analyzer_bool():
+    report = check_feasibility(simple_ts(), AGENTS,
+                               CATLFormula.from_formula('true'))
+    assert not report.infeasible
+    assert report.robustness_upper == INF
+
+@pytest.mark.parametrize('specification, resources',
+                         [(s, None) for s, _ in SPECIFICATIONS]
+                         + [(s, RESOURCES) for s, _ in RESOURCE_SPECIFICATIONS])
+def test_analyzer_bounds_milp(specification, resources):
+    pytest.importorskip('gurobipy')
+    from route_planning import route_planning
+
+    ts = simple_ts()
+    ast = CATLFormula.from_formula(specification)
+    report = check_feasibility(ts, AGENTS, ast, resources)
+    m = route_planning(ts, AGENTS, ast, resources=resources)
+    if m.SolCount == 0:
+        return
+    rho = m._rho.X
+    if rho >= 0:
+        assert not report.infeasible, str(report)
+    assert report.robustness_lower - 1e-6 <= rho
+    assert rho <= report.robustness_upper + 1e-6
@@ -0,0 +1,95 @@
+'''
+ Copyright (C) 2020 Cristian Ioan Vasile <cvasile@lehigh.edu>
+ Explainable Robotics Lab (ERL), Autonomous and Intelligent Robotics (AIR) Lab,
+ Lehigh University
+ See license.txt file for license information.
+'''
+
+import os
+
+import numpy as np
+import pytest
+
+from lomap import Ts
+
+from compact_ts import CompactTs
+from fleet import Fleet
+from route_planning import compute_capability_bitmap, compute_agent_classes
+from route_planning import compute_initial_capability_distribution
+
+
+DIRECTORY = os.path.dirname(os.path.abspath(__file__))
+SCENARIOS = [
+    ('simple.yaml', [('q1', {'a'}), ('q1', {'a'}), ('q2', {'a', 'b'}),
+                     ('q3', {'b'}), ('q4', {'c', 'a'})]),
+    ('farm.yaml', [('q1', {'UV', 'Mo'}), ('q1', {'UV', 'Mo'}),
+                   ('q2', {'Vis', 'Mo'}),
+                   ('q4', {'IR', 'UV'}), ('q4', {'Vis', 'UV'}),
+                   ('q5', {'Vis', 'Mo'}),
+                   ('q6', {'IR', 'UV'}),
+                   ('q8', {'Vis', 'IR'}),
+                   ('q9', {'Vis', 'UV'}),
+                   ('q10', {'Vis', 'IR'}), ('q10', {'Vis', 'IR'})]),
+]
+
+
+def load_ts(filename):
+    return CompactTs.from_ts(Ts.load(os.path.join(DIRECTORY, filename)))
+
+def as_dict(distribution):
+    return {u: {g: n for g, n in counts.items() if n}
+            for u, counts in distribution.items()}
+
+@pytest.mark.parametrize('filename, agents', SCENARIOS)
+def test_from_agents_matches_route_planning(filename, agents):
+    ts = load_ts(filename)
+    fleet = Fleet.from_agents(agents)
+    capabilities = compute_capability_bitmap(agents)
+    agent_classes = compute_agent_classes(agents, capabilities)
+
+    assert fleet.capability_bitmap() == capabilities
+    assert fleet.agent_classes() == agent_classes
+    assert as_dict(fleet.capability_distribution(ts)) == \
+        as_dict(compute_initial_capability_distribution(ts, agents,
+                                                        agent_classes))
+    assert sorted((q, sorted(g)) for q, g in fleet) == \
+           sorted((q, sorted(g)) for q, g in agents)
+
+def test_from_agents_reordered_capabilities():
+    agents = SCENARIOS[1][1]
+    fleet = Fleet.from_agents(agents[::-1])
+    assert fleet.agent_classes() == \
+        compute_agent_classes(agents, compute_capability_bitmap(agents))
+
+@pytest.mark.parametrize('chunk_size', [1, 2, 1<<16])
+def test_from_csv(tmpdir, chunk_size):
+    _, agents = SCENARIOS[1]
+    manifest = tmpdir.join('fleet.csv')
+    manifest.write('state,capabilities\n# comment\n'
+                   + ''.join('{},{}\n'.format(q, ';'.join(sorted(g))
+                                              if q != 'q4' else ' '.join(g))
+                             for q, g in agents))
+    fleet = Fleet.from_csv(str(manifest), chunk_size=chunk_size)
+    expected = Fleet.from_agents(agents)
+    assert fleet.capabilities == expected.capabilities
+    assert fleet.states.tolist() == expected.states.tolist()
+    assert fleet.masks.tolist() == expected.masks.tolist()
+
+    ts = load_ts('farm.yaml')
+    assert np.array_equal(fleet.distribution(ts), expected.distribution(ts))
+
+def test_from_csv_empty(tmpdir):
+    manifest = tmpdir.join('fleet.csv')
+    manifest.write('state,capabilities\n')
+    fleet = Fleet.from_csv(str(manifest))
+    assert len(fleet) == 0
+    assert fleet.capabilities == []
+
+def test_npz_round_trip(tmpdir):
+    fleet = Fleet.from_agents(SCENARIOS[0][1])
+    filename = str(tmpdir.join('fleet.npz'))
+    fleet.save_npz(filename)
+    loaded = Fleet.from_npz(filename)
+    assert loaded.capabilities == fleet.capabilities
+    assert loaded.masks.tolist() == fleet.masks.tolist()
+    assert loaded.states.tolist() == fleet.states.tolist()
@@ -0,0 +1,108 @@
+'''
+ Copyright (C) 2020 Cristian Ioan Vasile <cvasile@lehigh.edu>
+ Explainable Robotics Lab (ERL), Autonomous and Intelligent Robotics (AIR) Lab,
+ Lehigh University
+ See license.txt file for license information.
+'''
+
+import os
+
+import pytest
+
+pytest.importorskip('gurobipy')
+
+from lomap import Ts
+
+from catl import CATLFormula
+from compact_ts import CompactTs
+from incremental import IncrementalPlanner, check_stl2milp
+from route_planning import route_planning
+
+
+SIMPLE_TS = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                         'simple.yaml')
+AGENTS = [('q1', {'a'}), ('q1', {'a'}), ('q2', {'a', 'b'})]
+EVENTUALLY = CATLFormula.from_formula('F[0, 2] T(1, green, {(a, 1)})')
+UNTIL = CATLFormula.from_formula(
+                        'T(1, blue, {(a, 1)}) U[0, 2] T(1, green, {(a, 1)})')
+NEGATION = CATLFormula.from_formula('!G[0, 2] T(1, green, {(a, 1)})')
+
+
+def simple_ts():
+    return CompactTs.from_ts(Ts.load(SIMPLE_TS))
+
+def model_size(m):
+    m.update()
+    return m.NumVars, m.NumConstrs, m.NumNZs
+
+@pytest.mark.parametrize('parent', [UNTIL, NEGATION])
+def test_release_shared_subformula(parent):
+    ts = simple_ts()
+    reference = IncrementalPlanner(ts, AGENTS, 5)
+    m = reference.plan([(parent, 0)])
+    size, objective = model_size(m), m.ObjVal
+
+    # the eventually block encodes the subformulae shared with the parent
+    planner = IncrementalPlanner(ts, AGENTS, 5)
+    planner.plan([(EVENTUALLY, 0)])
+    planner.plan([(EVENTUALLY, 0), (parent, 0)])
+    m = planner.plan([(parent, 0)])
+    assert model_size(m) == size
+    assert m.ObjVal == pytest.approx(objective)
+
+    m = planner.plan([])
+    assert not planner.encoder.refcount
+    assert not planner.encoder.items
+
+def test_release_all_blocks():
+    ts = simple_ts()
+    m = IncrementalPlanner(ts, AGENTS, 5).plan([(UNTIL, 0)])
+    objective = m.ObjVal
+
+    planner = IncrementalPlanner(ts, AGENTS, 5)
+    planner.plan([(UNTIL, 0), (NEGATION, 1), (EVENTUALLY, 2)])
+    planner.plan([])
+    assert not planner.encoder.refcount
+    assert not planner.encoder.items
+    m = planner.plan([(UNTIL, 0)])
+    assert m.ObjVal == pytest.approx(objective)
+
+@pytest.mark.parametrize('invalid', [
+    (EVENTUALLY, 4), # exceeds the time bound
+    (CATLFormula.from_formula('F[0, 2] T(1, purple, {(a, 1)})'), 0),
+])
+def test_invalid_update(invalid):
+    planner = IncrementalPlanner(simple_ts(), AGENTS, 5)
+    m = planner.plan([(UNTIL, 0), (NEGATION, 1)])
+    size, objective = model_size(m), m.ObjVal
+    encoder = planner.encoder
+    blocks, refcount = dict(encoder.blocks), dict(encoder.refcount)
+
+    # the encoding is not changed if any of the new blocks is invalid
+    with pytest.raises(ValueError):
+        planner.plan([(UNTIL, 0), (EVENTUALLY, 0), invalid])
+    assert encoder.blocks == blocks
+    assert encoder.refcount == refcount
+    assert model_size(m) == size
+    m.optimize()
+    assert m.ObjVal == pytest.approx(objective)
+
+@pytest.mark.parametrize('robust', [True, False])
+def test_travel_time_objective(robust):
+    ts = simple_ts()
+    specification = ('F[0, 2] T(1, green, {(a, 1)})'
+                     '&& F[0, 3] T(1, red, {(a, 1)})')
+    expected = route_planning(ts, AGENTS, specification, time_bound=5,
+                              robust=robust, travel_time_weight=0.1,
+                              tight_bounds=False)
+    planner = IncrementalPlanner(ts, AGENTS, 5, robust=robust,
+                                 travel_time_weight=0.1)
+    m = planner.plan(specification)
+    assert m.NumObj == expected.NumObj
+    assert m.ObjVal == pytest.approx(expected.ObjVal)
+
+def test_check_stl2milp():
+    planner = IncrementalPlanner(simple_ts(), AGENTS, 3)
+    check_stl2milp(planner.encoder.stl_milp)
+    with pytest.raises(TypeError):
+        check_stl2milp(object())
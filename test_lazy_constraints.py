@@ -0,0 +1,81 @@
+'''
+ Copyright (C) 2020 Cristian Ioan Vasile <cvasile@lehigh.edu>
+ Explainable Robotics Lab (ERL), Autonomous and Intelligent Robotics (AIR) Lab,
+ Lehigh University
+ See license.txt file for license information.
+'''
+
+import os
+
+import numpy as np
+import pytest
+
+pytest.importorskip('gurobipy')
+
+from gurobipy import GRB
+from lomap import Ts
+
+from compact_ts import CompactTs
+from lazy_constraints import PropositionSeparator
+from route_planning import build_model, optimize
+
+
+SIMPLE_TS = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                         'simple.yaml')
+AGENTS = [('q1', {'a'}), ('q2', {'a', 'b'}), ('q3', {'b'})]
+
+
+def simple_ts():
+    return CompactTs.from_ts(Ts.load(SIMPLE_TS))
+
+def violated(separator, state_values, prop_values, stl_values):
+    '''Checks the proposition constraints independently of the separator.'''
+    variables = separator.variables
+    ts = variables.ts
+    for i in range(ts.num_states):
+        labels = variables.state_labels(i)
+        for n, classes in enumerate(separator.capability_classes):
+            count = prop_values[labels, n].sum(axis=0)
+            team = state_values[i, classes].sum(axis=0)
+            if np.abs(count - team).max() > separator.tolerance:
+                return True
+    bounds = prop_values.ravel()[separator.prop_index]
+    return bool((stl_values > bounds + separator.tolerance).any())
+
+@pytest.mark.parametrize('specification', [
+    'F[0, 3] T(1, green, {(a, 1), (b, 1)})',
+    'F[0, 2] T(1, green, {(a, 1), (b, 1)}) && G[0, 3] L(red, {(a, 0)})',
+    'T(1, blue, {(a, 1)}) U[0, 3] T(1, orange, {(b, 2)})',
+])
+def test_callback_rejects_incumbents(specification):
+    ts = simple_ts()
+    m = build_model(ts, AGENTS, specification, lazy='callback')
+    separators = [cb for cb in m._callbacks
+                  if isinstance(cb, PropositionSeparator)]
+    assert len(separators) == 1
+    separator = separators[0]
+
+    incumbents = []
+    def record(model, where):
+        if where == GRB.Callback.MIPSOL:
+            values = separator.values(model, where)
+            incumbents.append((model._rejected, violated(separator, *values)))
+    optimize(m, record)
+
+    # the incumbents violating the proposition constraints are rejected
+    assert incumbents
+    assert all(rejected == violation for rejected, violation in incumbents)
+    assert any(rejected for rejected, _ in incumbents)
+
+    eager = build_model(ts, AGENTS, specification)
+    optimize(eager)
+    assert m.Status == eager.Status == GRB.Status.OPTIMAL
+    assert m.ObjVal == pytest.approx(eager.ObjVal)
+    # the final plan satisfies the proposition constraints
+    variables = m._variables
+    values = (np.array(m.getAttr('X', variables.state_vars.ravel().tolist()))
+                .reshape(variables.state_vars.shape),
+              np.array(m.getAttr('X', variables.prop_vars.ravel().tolist()))
+                .reshape(variables.prop_vars.shape),
+              np.array(m.getAttr('X', separator.stl_vars)))
+    assert not violated(separator, *values)
@@ -0,0 +1,149 @@
+'''
+ Copyright (C) 2020 Cristian Ioan Vasile <cvasile@lehigh.edu>
+ Explainable Robotics Lab (ERL), Autonomous and Intelligent Robotics (AIR) Lab,
+ Lehigh University
+ See license.txt file for license information.
+'''
+
+import os
+
+import pytest
+
+pytest.importorskip('gurobipy')
+
+from gurobipy import Model as GRBModel
+from gurobipy import GRB
+from lomap import Ts
+
+from compact_ts import CompactTs
+from model_cache import ModelCache, scenario_fingerprint
+from route_planning import compute_planning_variables, build_model, optimize
+
+
+SIMPLE_TS = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                         'simple.yaml')
+AGENTS = [('q1', {'a'}), ('q2', {'a', 'b'}), ('q3', {'b'})]
+SPECIFICATION = 'F[0, 3] T(1, green, {(a, 1), (b, 1)})'
+
+
+def simple_ts():
+    return CompactTs.from_ts(Ts.load(SIMPLE_TS))
+
+def fingerprint(ts, agents, time_bound=4, formula=SPECIFICATION, **options):
+    _, agent_classes, capability_distribution = \
+                            compute_planning_variables(ts, agents, time_bound)
+    return scenario_fingerprint(ts, agent_classes, capability_distribution,
+                                time_bound, formula, **options)
+
+def small_model(name, num_vars):
+    m = GRBModel(name)
+    x = [m.addVar(ub=n + 1, name='x_{}'.format(n)) for n in range(num_vars)]
+    m.addConstr(sum(x) <= num_vars, 'total')
+    m.setObjective(sum(x), GRB.MAXIMIZE)
+    m.update()
+    return m
+
+def test_fingerprint_reordered_agents():
+    ts = simple_ts()
+    key = fingerprint(ts, AGENTS, robust=True)
+    assert key == fingerprint(ts, AGENTS[::-1], robust=True)
+    assert key == fingerprint(ts, [(q, set(sorted(caps, reverse=True)))
+                                   for q, caps in AGENTS], robust=True)
+    assert key != fingerprint(ts, AGENTS[:2], robust=True)
+    assert key != fingerprint(ts, AGENTS, time_bound=5, robust=True)
+    assert key != fingerprint(ts, AGENTS, robust=False)
+
+def test_store_load_round_trip(tmpdir):
+    cache = ModelCache(str(tmpdir))
+    m = small_model('round_trip', 4)
+    index_maps = {'x': [3, 1, 2, 0]}
+    assert cache.store('key', m, index_maps, {'note': 'test'})
+    assert 'key' in cache
+
+    loaded, loaded_maps, metadata = cache.load('key')
+    assert metadata == {'note': 'test'}
+    assert list(loaded_maps['x']) == [3, 1, 2, 0]
+    assert (loaded.NumVars, loaded.NumConstrs) == (m.NumVars, m.NumConstrs)
+    assert [v.VarName for v in loaded.getVars()] == \
+           [v.VarName for v in m.getVars()]
+    assert [v.UB for v in loaded.getVars()] == [v.UB for v in m.getVars()]
+    assert loaded.ModelSense == GRB.MAXIMIZE
+    m.optimize()
+    loaded.optimize()
+    assert loaded.ObjVal == pytest.approx(m.ObjVal)
+    assert cache.load('missing') is None
+
+def test_lru_eviction(tmpdir):
+    cache = ModelCache(str(tmpdir))
+    cache.store('a', small_model('a', 3), {})
+    size = cache.size()
+    cache.store('b', small_model('b', 3), {})
+    # make the access times distinct, then use entry a
+    for key, mtime in (('a', 1000), ('b', 2000)):
+        meta = os.path.join(cache.entry_path(key), 'meta.json')
+        os.utime(meta, (mtime, mtime))
+    assert cache.load('a') is not None
+
+    cache.max_size = int(2.5 * size)
+    cache.store('c', small_model('c', 3), {})
+    assert 'a' in cache and 'c' in cache
+    assert 'b' not in cache
+    assert cache.size() <= cache.max_size
+
+def test_shared_store(tmpdir):
+    first = ModelCache(str(tmpdir), evict_on_store=False)
+    second = ModelCache(str(tmpdir), max_size=0, evict_on_store=False)
+    assert first.store('key', small_model('first', 3), {})
+    meta = os.path.join(first.entry_path('key'), 'meta.json')
+    os.utime(meta, (1000, 1000))
+    # the entry stored by another process is kept, and not evicted on store
+    assert not second.store('key', small_model('second', 3), {})
+    assert os.path.getmtime(meta) == 1000
+    assert sorted(os.listdir(str(tmpdir))) == ['key']
+    m, _, _ = second.load('key')
+    assert m.ModelName == 'first'
+
+    # temporary and removed entries are ignored, and missing entries are
+    # cache misses
+    os.makedirs(os.path.join(str(tmpdir), 'key.tmp1'))
+    with open(os.path.join(str(tmpdir), 'key.tmp1', 'meta.json'), 'w'):
+        pass
+    assert [path for _, path, _ in first._entries()] == \
+           [first.entry_path('key')]
+    second.evict()
+    assert 'key' not in first
+    assert first.load('key') is None
+    assert os.listdir(str(tmpdir)) == ['key.tmp1']
+
+def test_route_planning_cache_hit(tmpdir):
+    ts = simple_ts()
+    cache = ModelCache(str(tmpdir))
+    built = build_model(ts, AGENTS, SPECIFICATION, cache=cache)
+    assert len(os.listdir(str(tmpdir))) == 1
+    loaded = build_model(ts, AGENTS, SPECIFICATION, cache=cache)
+
+    assert (loaded.NumVars, loaded.NumConstrs) == \
+           (built.NumVars, built.NumConstrs)
+    for name in ('_prop_state', '_min_prop'):
+        assert [c.ConstrName for c in getattr(loaded, name)] == \
+               [c.ConstrName for c in getattr(built, name)]
+    variables = loaded._variables
+    assert [v.VarName for v in variables.state_vars.ravel()] == \
+           [v.VarName for v in built._variables.state_vars.ravel()]
+
+    optimize(built)
+    optimize(loaded)
+    assert loaded.ObjVal == pytest.approx(built.ObjVal)
+
+def test_route_planning_cache_lazy_attribute(tmpdir):
+    ts = simple_ts()
+    cache = ModelCache(str(tmpdir))
+    built = build_model(ts, AGENTS, SPECIFICATION, cache=cache,
+                        lazy='attribute')
+    loaded = build_model(ts, AGENTS, SPECIFICATION, cache=cache,
+                         lazy='attribute')
+    built.update()
+    assert len(os.listdir(str(tmpdir))) == 1
+    assert loaded.getAttr('Lazy', loaded.getConstrs()) == \
+           built.getAttr('Lazy', built.getConstrs())
+    assert all(c.Lazy == 1 for c in loaded._prop_state + loaded._min_prop)
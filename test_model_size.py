@@ -0,0 +1,108 @@
+'''
+ Copyright (C) 2020 Cristian Ioan Vasile <cvasile@lehigh.edu>
+ Explainable Robotics Lab (ERL), Autonomous and Intelligent Robotics (AIR) Lab,
+ Lehigh University
+ See license.txt file for license information.
+'''
+
+import os
+
+import pytest
+
+pytest.importorskip('gurobipy')
+
+from gurobipy import Model as GRBModel
+from lomap import Ts
+
+from stl.stl2milp import stl2milp
+from catl import CATLFormula
+from catl import catl2stl
+from compact_ts import CompactTs
+from model_size import estimate_model_size, estimate_decomposed_size
+from model_size import select_encoding, ModelTooLarge
+from route_planning import build_model
+
+
+SIMPLE_TS = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                         'simple.yaml')
+AGENTS = [('q1', {'a'}), ('q1', {'a'}), ('q2', {'a', 'b'})]
+RESOURCES = {'water': {'capacity': {'a': 5}, 'initial': {'q1': 8}}}
+SPECIFICATION = ('F[0, 3] T(1, green, {(a, 1), (b, 1)})'
+                 '&& G[0, 4] L(red, {(a, 2)})')
+RESOURCE_SPECIFICATION = ('F[0, 3] T(1, green, {(a, 1)}, {(water, 2)})'
+                          '&& G[0, 4] L(red, {(a, 2)})')
+
+
+def simple_ts():
+    return CompactTs.from_ts(Ts.load(SIMPLE_TS))
+
+def stl_layer_size(ast, robust):
+    '''Returns the size of the STL layer translated on its own.'''
+    stl = catl2stl(ast)
+    m = GRBModel('stl')
+    stl2milp(stl, ranges={v: (0, len(AGENTS)) for v in stl.variables()},
+             model=m, robust=robust).translate()
+    m.update()
+    size = m.NumVars, m.NumConstrs, m.NumNZs
+    m.dispose()
+    return size
+
+@pytest.mark.parametrize('lazy', [None, 'callback'])
+@pytest.mark.parametrize('robust', [True, False])
+@pytest.mark.parametrize('resources', [None, RESOURCES])
+def test_estimate_model_size(lazy, robust, resources):
+    ts = simple_ts()
+    specification = SPECIFICATION if resources is None \
+                                  else RESOURCE_SPECIFICATION
+    ast = CATLFormula.from_formula(specification)
+    size = estimate_model_size(ts, AGENTS, ast, robust=robust, lazy=lazy,
+                               resources=resources)
+    m = build_model(ts, AGENTS, ast, robust=robust, lazy=lazy,
+                    resources=resources)
+    m.update()
+
+    # the system, proposition, and resource layers are exact
+    stl = stl_layer_size(ast, robust)
+    for k, quantity in enumerate(('variables', 'constraints', 'nonzeros')):
+        expected = size.total(quantity) - size.layers['stl'][quantity]
+        assert expected + stl[k] == [m.NumVars, m.NumConstrs, m.NumNZs][k], \
+                                                                    quantity
+    if resources is None:
+        assert size.layers['resources'] == \
+               {'variables': 0, 'constraints': 0, 'nonzeros': 0}
+    if lazy == 'callback':
+        assert size.layers['propositions']['constraints'] == 0
+
+@pytest.mark.parametrize('specification', [
+    'T(1, blue, {(a, 1)}) U[1, 3] T(1, orange, {(b, 1)})',
+    'F[0, 1] T(1, green, {(a, 1)}) => G[0, 2] T(1, red, {(b, 1)})',
+    '(T(1, blue, {(a, 1)}) U[0, 2] T(1, orange, {(b, 1)}))'
+    '&& G[0, 2] (T(1, blue, {(a, 1)}) => F[0, 2] T(1, green, {(a, 1)}))'
+    '&& !F[0, 2] L(red, {(a, 2)})',
+])
+@pytest.mark.parametrize('robust', [True, False])
+def test_stl_layer_size(specification, robust):
+    ast = CATLFormula.from_formula(specification)
+    size = estimate_model_size(simple_ts(), AGENTS, ast, robust=robust)
+    stl = stl_layer_size(ast, robust)
+    assert (size.layers['stl']['variables'], size.layers['stl']['constraints'],
+            size.layers['stl']['nonzeros']) == stl
+
+@pytest.mark.parametrize('resources', [None, RESOURCES])
+def test_select_encoding_resources(resources):
+    ts = simple_ts()
+    ast = CATLFormula.from_formula('F[0, 1] T(1, blue, {(a, 1)})'
+                                   '&& F[3, 4] T(1, green, {(a, 1)})')
+    decomposed = estimate_decomposed_size(ts, AGENTS, ast, True, None,
+                                          resources)
+    assert decomposed.memory < estimate_model_size(ts, AGENTS, ast,
+                                            resources=resources).memory
+    # the decomposition does not carry the resource levels between windows
+    if resources is None:
+        encoding, _ = select_encoding(ts, AGENTS, ast, decomposed.memory,
+                                      allow_lazy=False)
+        assert encoding == 'decomposed'
+    else:
+        with pytest.raises(ModelTooLarge):
+            select_encoding(ts, AGENTS, ast, decomposed.memory,
+                            allow_lazy=False, resources=resources)
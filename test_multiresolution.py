@@ -0,0 +1,69 @@
+'''
+ Copyright (C) 2020 Cristian Ioan Vasile <cvasile@lehigh.edu>
+ Explainable Robotics Lab (ERL), Autonomous and Intelligent Robotics (AIR) Lab,
+ Lehigh University
+ See license.txt file for license information.
+'''
+
+import os
+
+import numpy as np
+import pytest
+
+pytest.importorskip('gurobipy')
+
+from lomap import Ts
+
+from catl import CATLFormula
+from compact_ts import CompactTs
+from solution import PlanSolution
+from multiresolution import critical_times, route_planning_multiresolution
+
+
+SIMPLE_TS = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                         'simple.yaml')
+AGENTS = [('q1', {'a'})]
+SPECIFICATION = 'F[10, 12] T(1, green, {(a, 1)})'
+
+
+def simple_ts():
+    return CompactTs.from_ts(Ts.load(SIMPLE_TS))
+
+def coarse_solution(ts, flows):
+    num_states = len(ts.states)
+    return PlanSolution(np.asarray(ts.states), np.asarray(ts.sources),
+                        np.asarray(ts.targets), np.asarray(ts.weights),
+                        np.array(['a']), np.array([1]),
+                        np.ones((1, 1), dtype=bool),
+                        np.zeros((num_states, 1, flows.shape[2]+1),
+                                 dtype=np.int64), flows)
+
+def test_critical_times_ignore_self_loops():
+    ts = simple_ts()
+    sources, targets = np.asarray(ts.sources), np.asarray(ts.targets)
+    loop = np.flatnonzero(sources == targets)[0]
+    move = np.flatnonzero(sources != targets)[0]
+    flows = np.zeros((len(sources), 1, 7), dtype=np.int64)
+    flows[loop, 0, :] = 1 # one agent waits at all times
+    flows[move, 0, 3] = 1 # and another departs at coarse time 3
+
+    ast = CATLFormula.from_formula(SPECIFICATION)
+    mask = critical_times(ast, coarse_solution(ts, flows), 2, 14, 1)
+    assert np.flatnonzero(mask).tolist() == [5, 6, 7, 9, 10, 11, 12, 13, 14]
+
+def test_fine_variables_fixed():
+    ts = simple_ts()
+    m = route_planning_multiresolution(ts, AGENTS, SPECIFICATION, 2, radius=1)
+    assert m.SolCount > 0
+    assert m._rho.X >= 0
+
+    state_vars = m._variables.state_vars
+    handles = state_vars.ravel().tolist()
+    lower = np.array(m.getAttr('LB', handles)).reshape(state_vars.shape)
+    upper = np.array(m.getAttr('UB', handles)).reshape(state_vars.shape)
+    fixed = (lower == upper).all(axis=(0, 1))
+    assert fixed.any()
+    assert not fixed.all()
+    # the fixed variables are set to the solution of the coarse problem
+    values = np.rint(m.getAttr('X', handles)).reshape(state_vars.shape)
+    assert (values[:, :, fixed] == lower[:, :, fixed]).all()
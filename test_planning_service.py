@@ -0,0 +1,107 @@
+'''
+ Copyright (C) 2020 Cristian Ioan Vasile <cvasile@lehigh.edu>
+ Explainable Robotics Lab (ERL), Autonomous and Intelligent Robotics (AIR) Lab,
+ Lehigh University
+ See license.txt file for license information.
+'''
+
+import os
+import json
+import asyncio
+
+import pytest
+
+pytest.importorskip('gurobipy')
+
+import planning_service
+from planning_service import LRUCache, PlanningService
+
+
+TS_DIRECTORY = os.path.dirname(os.path.abspath(__file__))
+AGENTS = [['q1', ['a']], ['q2', ['a', 'b']]]
+SPECIFICATION = 'F[0, 3] T(1, green, {(a, 2)})'
+
+
+def plan_request(request_id, **options):
+    return {'id': request_id, 'method': 'plan', 'ts': 'simple',
+            'agents': AGENTS, 'formula': SPECIFICATION, 'options': options}
+
+def test_lru_cache():
+    cache = LRUCache(2)
+    cache['a'] = 1
+    cache['b'] = 2
+    assert cache['a'] == 1 # b is now the least recently used
+    cache['c'] = 3
+    assert len(cache) == 2
+    assert 'a' in cache and 'c' in cache and 'b' not in cache
+    cache['a'] = 4
+    cache['d'] = 5
+    assert 'c' not in cache and cache['a'] == 4
+
+def test_worker_caches():
+    planning_service._init_worker(TS_DIRECTORY, None, ts_cache_size=1,
+                                  formula_cache_size=2)
+    ts = planning_service.load_ts('simple')
+    assert planning_service.load_ts('simple') is ts
+    with pytest.raises(ValueError):
+        planning_service.load_ts('missing')
+
+    ast = planning_service.parse_formula(SPECIFICATION)
+    assert planning_service.parse_formula(SPECIFICATION) is ast
+    planning_service.parse_formula('F[0, 2] T(1, red, {(a, 1)})')
+    planning_service.parse_formula('F[0, 2] T(1, blue, {(a, 1)})')
+    assert len(planning_service._formula_cache) == 2
+    assert SPECIFICATION not in planning_service._formula_cache
+
+def test_solve(tmpdir):
+    planning_service._init_worker(TS_DIRECTORY, str(tmpdir))
+    assert not planning_service._model_cache.evict_on_store
+    response = planning_service.solve('simple', AGENTS, SPECIFICATION, {})
+    assert response['status'] == 2
+    assert set(response['team_state']) == {'state', 'time', 'class', 'count'}
+    # the model is cached, and the cached model gives the same plan
+    assert len(os.listdir(str(tmpdir))) == 1
+    assert planning_service.solve('simple', AGENTS, SPECIFICATION, {}) == \
+           response
+
+def test_service(tmpdir):
+    async def run():
+        service = PlanningService(TS_DIRECTORY, workers=1,
+                                  cache_directory=str(tmpdir), cache_size=0)
+        server = await service.start(port=0)
+        port = server.sockets[0].getsockname()[1]
+        try:
+            reader, writer = await asyncio.open_connection('127.0.0.1', port)
+            requests = [plan_request(1), plan_request(2),
+                        plan_request(3, robust=False),
+                        {'id': 4, 'method': 'unknown'},
+                        plan_request(5, unknown=True)]
+            for request in requests:
+                writer.write((json.dumps(request) + '\n').encode('utf-8'))
+            await writer.drain()
+            responses = {}
+            for _ in requests:
+                response = json.loads((await reader.readline()).decode())
+                responses[response['id']] = response
+            writer.write((json.dumps({'id': 6, 'method': 'metrics'}) + '\n')
+                         .encode('utf-8'))
+            await writer.drain()
+            metrics = json.loads((await reader.readline()).decode())
+            writer.close()
+        finally:
+            server.close()
+            await server.wait_closed()
+            service.shutdown()
+        return responses, metrics['result']
+
+    responses, metrics = asyncio.run(run())
+    assert responses[1]['result'] == responses[2]['result']
+    assert responses[1]['result']['status'] == 2
+    assert responses[3]['result']['robustness'] is None
+    assert 'error' in responses[4] and 'error' in responses[5]
+    assert metrics['requests'] == 4
+    assert metrics['coalesced'] == 1
+    assert metrics['errors'] == 1
+    assert metrics['in_flight'] == 0
+    # the service evicts the entries stored by the workers
+    assert os.listdir(str(tmpdir)) == []
@@ -0,0 +1,54 @@
+'''
+ Copyright (C) 2020 Cristian Ioan Vasile <cvasile@lehigh.edu>
+ Explainable Robotics Lab (ERL), Autonomous and Intelligent Robotics (AIR) Lab,
+ Lehigh University
+ See license.txt file for license information.
+'''
+
+import os
+
+import pytest
+
+pytest.importorskip('gurobipy')
+
+from lomap import Ts
+
+from compact_ts import CompactTs
+from portfolio import route_planning_portfolio, DEFAULT_PORTFOLIO
+
+
+SIMPLE_TS = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                         'simple.yaml')
+AGENTS = [('q1', {'a'}), ('q2', {'a', 'b'}), ('q3', {'b'})]
+SPECIFICATION = 'F[0, 3] T(1, green, {(a, 1), (b, 1)})'
+
+
+def simple_ts():
+    return CompactTs.from_ts(Ts.load(SIMPLE_TS))
+
+def test_default_portfolio_shares_objective():
+    assert all(config['robust'] for config in DEFAULT_PORTFOLIO)
+
+def test_portfolio_winner():
+    result = route_planning_portfolio(simple_ts(), AGENTS, SPECIFICATION,
+                                      threads=1)
+    assert result.winner is not None
+    assert result.solution is not None
+    assert result.solution.robustness >= 0
+    # the portfolio returns as soon as the first configuration wins
+    assert result.runs[-1]['name'] == result.winner['name']
+
+def test_portfolio_robust_keyword():
+    ts = simple_ts()
+    # the configuration without a flag uses the keyword argument
+    result = route_planning_portfolio(ts, AGENTS, SPECIFICATION,
+                                      portfolio=({'name': 'default'},),
+                                      threads=1, robust=False)
+    assert result.solution is not None
+    assert result.solution.robustness is None
+    # the flag of the configuration takes precedence
+    result = route_planning_portfolio(ts, AGENTS, SPECIFICATION,
+                                      portfolio=({'name': 'robust',
+                                                  'robust': True},),
+                                      threads=1, robust=False)
+    assert result.solution.robustness is not None
@@ -0,0 +1,89 @@
+'''
+ Copyright (C) 2020 Cristian Ioan Vasile <cvasile@lehigh.edu>
+ Explainable Robotics Lab (ERL), Autonomous and Intelligent Robotics (AIR) Lab,
+ Lehigh University
+ See license.txt file for license information.
+'''
+
+import os
+
+import numpy as np
+import pytest
+
+pytest.importorskip('gurobipy')
+
+from lomap import Ts
+
+from route_planning import build_model, route_planning
+from solution import PlanSolution
+
+
+SIMPLE_TS = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                         'simple.yaml')
+AGENTS = [('q1', {'a'}), ('q2', {'a', 'b'})]
+SPECIFICATION = 'F[0, 3] T(1, green, {(a, 2)})'
+RESOURCES = {'water': {'capacity': {'a': 5}, 'initial': {'q1': 8}}}
+
+
+def test_graph_attributes_opt_in():
+    ts = Ts.load(SIMPLE_TS)
+    m = route_planning(ts, AGENTS, SPECIFICATION)
+    assert m.SolCount > 0
+    assert all('vars' not in d for _, d in ts.g.nodes(data=True))
+    assert all('vars' not in d for _, _, d in ts.g.edges(data=True))
+
+    m = route_planning(ts, AGENTS, SPECIFICATION, graph_attributes=True)
+    variables = m._variables
+    i = variables.ts.state_index['q4']
+    for k in range(variables.time_bound + 1):
+        assert list(ts.g.node['q4']['vars'][k].values()) == \
+               variables.state_vars[i, :, k].tolist()
+    names = set(v.VarName for v in variables.prop_vars.ravel().tolist())
+    assert ts.g.node['q4']['prop_vars']['a'][3]['green'].VarName in names
+
+@pytest.mark.parametrize('specification', [
+    SPECIFICATION,
+    'F[0, 2] T(1, green, {(a, 1), (b, 1)}) && G[0, 3] L(red, {(a, 0)})',
+    'T(1, blue, {(a, 1)}) U[0, 3] T(1, orange, {(b, 1)})',
+    'F[1, 2] T(1, green, {(a, 3)})',
+])
+@pytest.mark.parametrize('robust', [True, False])
+def test_tight_bounds_objective(specification, robust):
+    ts = Ts.load(SIMPLE_TS)
+    tight = route_planning(ts, AGENTS, specification, robust=robust,
+                           travel_time_weight=0.1)
+    loose = route_planning(ts, AGENTS, specification, robust=robust,
+                           travel_time_weight=0.1, tight_bounds=False)
+    assert tight.Status == loose.Status
+    if loose.SolCount > 0:
+        assert tight.ObjVal == pytest.approx(loose.ObjVal)
+
+def test_resource_capability_names():
+    resources = {'a': {'capacity': {'a': 5}, 'initial': {'q1': 8}}}
+    with pytest.raises(ValueError):
+        build_model(Ts.load(SIMPLE_TS), AGENTS,
+                    'F[0, 3] T(1, green, {(b, 1)})', resources=resources)
+
+def test_resource_mission():
+    ts = Ts.load(SIMPLE_TS)
+    # the water exceeds the capacity of an agent, thus both agents carry it
+    m = route_planning(ts, AGENTS,
+                       'F[0, 4] T(1, green, {(a, 1)}, {(water, 6)})',
+                       resources=RESOURCES)
+    assert m.SolCount > 0
+    solution = PlanSolution.from_model(m)
+    assert solution.robustness >= 0
+    assert solution.resources.tolist() == ['water']
+    states = solution.states.tolist()
+    levels = solution.resource_levels[0]
+    assert levels.shape == (len(states), solution.time_bound + 1)
+    q1, green = states.index('q1'), states.index('q4')
+    initial = np.zeros(len(states))
+    initial[q1] = 8
+    assert np.allclose(levels[:, 0], initial)
+    # the water is conserved, and moved from q1 to green
+    assert np.allclose(levels.sum(axis=0), 8)
+    assert levels[green].max() >= 6 - 1e-6
+    arrival = int(np.flatnonzero(levels[green] >= 6 - 1e-6)[0])
+    assert arrival >= 3 # the agent starting at q2 picks up water at q1
+    assert solution.team_state[green, :, arrival].sum() == 2
@@ -66,12 +66,13 @@ def case_simple(ts_filename='simple.yaml'):
                      )
 
     m = route_planning(ts, agents, specification)
-    time_bound = len(ts.g.nodes(data=True)[0][1]['vars']) - 1
+    variables = m._variables.read_values(m)
+    time_bound = variables.time_bound
 
     logging.debug('Planning horizon: %d', time_bound)
 
-    check_initial_states(ts, agents)
-    check_flow_constraints(ts, agents, time_bound)
+    check_initial_states(variables, agents)
+    check_flow_constraints(variables, time_bound)
 
 if __name__ == '__main__':
     case_simple()
@@ -0,0 +1,115 @@
+'''
+ Copyright (C) 2020 Cristian Ioan Vasile <cvasile@lehigh.edu>
+ Explainable Robotics Lab (ERL), Autonomous and Intelligent Robotics (AIR) Lab,
+ Lehigh University
+ See license.txt file for license information.
+'''
+
+import os
+
+import numpy as np
+import pytest
+
+from lomap import Ts
+
+from compact_ts import CompactTs
+from solution import PlanSolution
+from simulation import grow_ring_buffer, simulate
+
+
+SIMPLE_TS = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                         'simple.yaml')
+
+
+def simple_ts(extra_propositions=()):
+    '''Returns the compact transition system of simple.yaml with additional
+    propositions that label no states.
+    '''
+    ts = CompactTs.from_ts(Ts.load(SIMPLE_TS))
+    if not extra_propositions:
+        return ts
+    propositions = np.concatenate([ts.propositions,
+                                   np.array(extra_propositions, dtype=np.str_)])
+    return CompactTs(ts.name, ts.states, propositions, ts.bitsets, ts.indptr,
+                     ts.indices, ts.weights, ts.in_indptr, ts.in_indices)
+
+def waiting_solution(ts, time_bound=3):
+    '''Returns the plan where an agent with capability `a` waits at the state
+    labeled green.
+    '''
+    sources, targets = np.asarray(ts.sources), np.asarray(ts.targets)
+    state = ts.state_index['q4']
+    team_state = np.zeros((ts.num_states, 1, time_bound+1), dtype=np.int64)
+    team_state[state] = 1
+    flows = np.zeros((len(sources), 1, time_bound), dtype=np.int64)
+    flows[np.flatnonzero((sources == state) & (targets == state))] = 1
+    return PlanSolution(np.asarray(ts.states), sources, targets,
+                        np.asarray(ts.weights), np.array(['a']),
+                        np.array([1]), np.ones((1, 1), dtype=bool),
+                        team_state, flows)
+
+def moving_solution(ts, time_bound=8):
+    '''Returns the plan where an agent with capability `a` moves from the state
+    labeled blue to the state labeled green through the state labeled orange,
+    and waits there.
+    '''
+    sources, targets = np.asarray(ts.sources), np.asarray(ts.targets)
+    path = [ts.state_index[u] for u in ('q1', 'q2', 'q4')]
+    path = path + [path[-1]] * (time_bound - 2)
+    team_state = np.zeros((ts.num_states, 1, time_bound+1), dtype=np.int64)
+    flows = np.zeros((len(sources), 1, time_bound), dtype=np.int64)
+    for k, state in enumerate(path):
+        team_state[state, 0, k] = 1
+        if k < time_bound:
+            edge = np.flatnonzero((sources == state)
+                                  & (targets == path[k+1]))[0]
+            flows[edge, 0, k] = 1
+    return PlanSolution(np.asarray(ts.states), sources, targets,
+                        np.asarray(ts.weights), np.array(['a']),
+                        np.array([1]), np.ones((1, 1), dtype=bool),
+                        team_state, flows)
+
+def test_grow_ring_buffer():
+    # the arrivals at times 4, 5, and 6 are stored in slots 1, 2, and 0
+    ring = np.array([[6, 60], [4, 40], [5, 50]])
+    grown = grow_ring_buffer(ring, 4, 5)
+    assert grown.tolist() == [[5, 50], [6, 60], [0, 0], [0, 0], [4, 40]]
+
+@pytest.mark.parametrize('delay, success', [(0, True), (1, True), (2, True),
+                                            (3, False), (4, False)])
+def test_simulate_constant_delays(delay, success):
+    ts = simple_ts()
+    # the agent arrives at green at time 2 + 2 * delay, i.e., the arrivals are
+    # up to 1 + delay time steps ahead
+    result = simulate(ts, moving_solution(ts), 'F[0, 7] T(1, green, {(a, 1)})',
+                      rollouts=5,
+                      delays=lambda rng, weight, size: np.full(size, delay))
+    assert result.successes == (5 if success else 0)
+
+def test_simulate_waiting_plan():
+    ts = simple_ts()
+    result = simulate(ts, waiting_solution(ts), 'F[0, 2] T(1, green, {(a, 1)})',
+                      rollouts=10, seed=1)
+    assert result.probability == 1
+    assert result.robustness.tolist() == [0] * 10
+
+def test_simulate_missing_capability():
+    ts = simple_ts()
+    result = simulate(ts, waiting_solution(ts),
+                      'F[0, 2] T(1, green, {(a, 1), (b, 1)})', rollouts=10)
+    assert result.successes == 0
+    assert result.robustness.tolist() == [-1] * 10
+
+def test_simulate_unlabeled_proposition():
+    ts = simple_ts(['yellow'])
+    result = simulate(ts, waiting_solution(ts),
+                      'F[0, 2] T(1, yellow, {(a, 1)}) || G[0, 1] '
+                      'L(yellow, {(a, 0)})', rollouts=10)
+    assert result.probability == 1
+    assert result.robustness.tolist() == [0] * 10
+
+def test_simulate_resources():
+    ts = simple_ts()
+    with pytest.raises(ValueError):
+        simulate(ts, waiting_solution(ts),
+                 'F[0, 2] T(1, green, {(a, 1)}, {(water, 1)})', rollouts=10)
@@ -0,0 +1,113 @@
+'''
+ Copyright (C) 2020 Cristian Ioan Vasile <cvasile@lehigh.edu>
+ Explainable Robotics Lab (ERL), Autonomous and Intelligent Robotics (AIR) Lab,
+ Lehigh University
+ See license.txt file for license information.
+'''
+
+import os
+
+import numpy as np
+import pytest
+
+from lomap import Ts
+
+from compact_ts import CompactTs
+from solution import PlanSolution
+
+
+SIMPLE_TS = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                         'simple.yaml')
+AGENTS = [('q1', {'a'}), ('q2', {'a', 'b'})]
+SPECIFICATION = 'F[0, 3] T(1, green, {(a, 2)})'
+
+
+def simple_ts():
+    return CompactTs.from_ts(Ts.load(SIMPLE_TS))
+
+def moving_solution(**kwargs):
+    '''Returns the plan where an agent moves from q1 to q2, and waits.'''
+    team_state = np.array([[[1, 0, 0]], [[0, 1, 1]]])
+    flows = np.array([[[0, 0]], [[1, 0]], [[0, 1]]])
+    return PlanSolution(np.array(['q1', 'q2']), np.array([0, 0, 1]),
+                        np.array([0, 1, 1]), np.array([1, 1, 1]),
+                        np.array(['a']), np.array([1]),
+                        np.ones((1, 1), dtype=bool), team_state, flows,
+                        **kwargs)
+
+def assert_equal_solutions(first, second):
+    for name in PlanSolution.ARRAYS + PlanSolution.OPTIONAL_ARRAYS:
+        a, b = getattr(first, name), getattr(second, name)
+        assert (a is None) == (b is None), name
+        if a is not None:
+            assert np.array_equal(a, b), name
+    for name in PlanSolution.SCALARS:
+        assert getattr(first, name) == getattr(second, name), name
+
+@pytest.mark.parametrize('compressed', [True, False])
+def test_npz_round_trip(tmpdir, compressed):
+    filename = str(tmpdir.join('solution.npz'))
+    solution = moving_solution(status=2, objective=1.5, robustness=None,
+                               gap=0.0)
+    solution.save(filename, compressed=compressed)
+    loaded = PlanSolution.load(filename)
+    assert_equal_solutions(solution, loaded)
+    assert loaded.robustness is None
+    assert isinstance(loaded.status, int)
+    assert loaded.time_bound == 2
+    assert loaded.classes == [frozenset(['a'])]
+
+def test_npz_round_trip_resources(tmpdir):
+    filename = str(tmpdir.join('solution.npz'))
+    solution = moving_solution(resources=np.array(['water']),
+                               resource_flows=np.ones((1, 3, 1, 2)),
+                               resource_levels=np.full((1, 2, 3), 0.5))
+    solution.save(filename)
+    assert_equal_solutions(solution, PlanSolution.load(filename))
+
+def test_tables():
+    solution = moving_solution()
+    team_state = solution.team_state_table()
+    assert team_state['state'].tolist() == ['q1', 'q2', 'q2']
+    assert team_state['time'].tolist() == [0, 1, 2]
+    assert team_state['count'].tolist() == [1, 1, 1]
+    flows = solution.flow_table()
+    assert flows['source'].tolist() == ['q1', 'q2']
+    assert flows['target'].tolist() == ['q2', 'q2']
+    assert flows['time'].tolist() == [0, 1]
+
+def test_to_parquet(tmpdir):
+    pd = pytest.importorskip('pandas')
+    try:
+        pd.io.parquet.get_engine('auto')
+    except ImportError:
+        pytest.skip('no Parquet engine')
+    directory = str(tmpdir.join('plan'))
+    moving_solution().to_parquet(directory)
+    flows = pd.read_parquet(os.path.join(directory, 'flows.parquet'))
+    assert flows['source'].tolist() == ['q1', 'q2']
+    classes = pd.read_parquet(os.path.join(directory, 'classes.parquet'))
+    assert classes['class'].tolist() == [1]
+
+def test_from_model():
+    pytest.importorskip('gurobipy')
+    from route_planning import route_planning
+
+    ts = simple_ts()
+    m = route_planning(ts, AGENTS, SPECIFICATION)
+    solution = PlanSolution.from_model(m)
+    variables = m._variables
+    assert solution.team_state.shape == variables.state_vars.shape
+    assert solution.flows.shape == variables.edge_vars.shape
+    assert solution.team_state.dtype == np.int64
+    assert solution.robustness == pytest.approx(m._rho.X)
+    assert solution.objective == pytest.approx(m.ObjVal)
+    assert solution.status == m.Status
+    # the values match the variables of the model
+    assert solution.team_state.ravel().tolist() == \
+           [int(round(v.X)) for v in variables.state_vars.ravel().tolist()]
+    # the agents are conserved, and both agents visit green
+    assert (solution.team_state.sum(axis=(0, 1)) == len(AGENTS)).all()
+    green = ts.state_index['q4']
+    assert solution.team_state[green].sum(axis=0).max() == 2
+    assert solution.classes == [frozenset(g) for g in variables.classes]
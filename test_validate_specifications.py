@@ -0,0 +1,74 @@
+'''
+ Copyright (C) 2020 Cristian Ioan Vasile <cvasile@lehigh.edu>
+ Explainable Robotics Lab (ERL), Autonomous and Intelligent Robotics (AIR) Lab,
+ Lehigh University
+ See license.txt file for license information.
+'''
+
+import os
+import json
+
+from validate_specifications import main
+
+
+SIMPLE_TS = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                         'simple.yaml')
+SPECIFICATIONS = [
+    {'id': 'syntax', 'formula': 'F[0, 3] T(1, green, {a, 1})'},
+    {'id': 'unknown', 'formula': 'F[0, 3] T(1, purple, {(a, 1)})'},
+    {'id': 'bool', 'formula': 'true'},
+    {'id': 'disjunction', 'formula': 'F[0, 3] T(1, green, {(a, 1)}) || true'},
+    'G[0, 2] T(1, red, {(a, 1)}, {(water, 2)})',
+]
+
+
+def run(tmpdir, specifications):
+    '''Runs the command line interface, and returns the exit code and the
+    reports.
+    '''
+    input_filename = str(tmpdir.join('specifications.jsonl'))
+    output_filename = str(tmpdir.join('reports.jsonl'))
+    with open(input_filename, 'w') as fout:
+        for specification in specifications:
+            fout.write(json.dumps(specification) + '\n\n')
+    code = main([input_filename, '-o', output_filename, '--ts', SIMPLE_TS,
+                 '--workers', '1', '--ordered'])
+    with open(output_filename, 'r') as fin:
+        return code, [json.loads(line) for line in fin]
+
+def test_validate_cli(tmpdir):
+    code, reports = run(tmpdir, SPECIFICATIONS)
+    assert code == 1
+    assert [report['id'] for report in reports] == \
+           ['syntax', 'unknown', 'bool', 'disjunction', 9]
+    assert [report['line'] for report in reports] == [1, 3, 5, 7, 9]
+    syntax, unknown, boolean, disjunction, resources = reports
+
+    assert not syntax['valid']
+    error, = syntax['errors']
+    assert error['type'] == 'syntax'
+    assert (error['line'], error['column']) == (1, 21)
+
+    assert not unknown['valid']
+    error, = unknown['errors']
+    assert error['type'] == 'propositions'
+    assert error['unknown'] == ['purple']
+    assert unknown['capabilities'] == ['a']
+
+    assert boolean['valid']
+    assert boolean['bound'] == 0
+    assert boolean['propositions'] == boolean['capabilities'] == \
+           boolean['resources'] == []
+    assert 'stl_size' in boolean
+
+    assert disjunction['valid']
+    assert disjunction['propositions'] == ['green']
+
+    assert resources['valid']
+    assert resources['resources'] == ['water']
+    assert resources['bound'] == 3
+
+def test_validate_cli_valid(tmpdir):
+    code, reports = run(tmpdir, SPECIFICATIONS[2:])
+    assert code == 0
+    assert all(report['valid'] for report in reports)
@@ -0,0 +1,63 @@
+'''
+ Copyright (C) 2020 Cristian Ioan Vasile <cvasile@lehigh.edu>
+ Explainable Robotics Lab (ERL), Autonomous and Intelligent Robotics (AIR) Lab,
+ Lehigh University
+ See license.txt file for license information.
+'''
+
+import os
+
+import numpy as np
+import pytest
+
+matplotlib = pytest.importorskip('matplotlib')
+matplotlib.use('Agg')
+pytest.importorskip('shapely')
+
+from lomap import Ts
+
+from compact_ts import CompactTs
+from solution import PlanSolution
+from visualization import PlanRenderer
+
+
+SIMPLE_TS = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                         'simple.yaml')
+
+
+def moving_solution(ts, time_bound=3):
+    '''Returns the plan where an agent moves from q1 to q2 and waits, and
+    another agent waits at q4.
+    '''
+    index = ts.state_index
+    team_state = np.zeros((ts.num_states, 1, time_bound + 1), dtype=np.int64)
+    flows = np.zeros((ts.num_edges, 1, time_bound), dtype=np.int64)
+    def edge(u, v):
+        return int(np.flatnonzero((ts.sources == index[u])
+                                  & (ts.targets == index[v]))[0])
+    team_state[index['q1'], 0, 0] = 1
+    team_state[index['q2'], 0, 1:] = 1
+    team_state[index['q4'], 0, :] = 1
+    flows[edge('q1', 'q2'), 0, 0] = 1
+    flows[edge('q2', 'q2'), 0, 1:] = 1
+    flows[edge('q4', 'q4'), 0, :] = 1
+    return PlanSolution(ts.states, ts.sources, ts.targets, ts.weights,
+                        np.array(['a']), np.array([1]),
+                        np.ones((1, 1), dtype=bool), team_state, flows)
+
+def test_render_frames():
+    lomap_ts = Ts.load(SIMPLE_TS)
+    solution = moving_solution(CompactTs.from_ts(lomap_ts))
+    renderer = PlanRenderer(lomap_ts, solution, figsize=(4, 3), dpi=50)
+    assert renderer.num_frames == 4
+
+    frames = list(renderer.frames())
+    assert len(frames) == renderer.num_frames
+    for frame in frames:
+        assert frame.shape == (150, 200, 4)
+        assert frame.dtype == np.uint8
+    # the frames are not overwritten by the following frames, and differ at
+    # least in the titles
+    for previous, current in zip(frames, frames[1:]):
+        assert not np.array_equal(previous, current)
+    assert np.array_equal(renderer.render(0), frames[0])
@@ -0,0 +1,183 @@
+'''
+ Copyright (C) 2020 Cristian Ioan Vasile <cvasile@lehigh.edu>
+ Explainable Robotics Lab (ERL), Autonomous and Intelligent Robotics (AIR) Lab,
+ Lehigh University
+ See license.txt file for license information.
+
+ Bulk validation of CaTL specifications.
+
+ The specifications are read from a JSONL file with one JSON object per line
+ with the formula `formula` and an optional identifier `id`, e.g.,
+
+    {"id": "mission-1", "formula": "F[0, 10] T(2, A, {(IR, 1)})"}
+
+ or with one JSON string per line. The formulae are parsed, checked against
+ the transition system, and translated to STL in worker processes, and a
+ report is written for each formula as soon as it is available, e.g.,
+
+    {"id": "mission-1", "line": 1, "valid": true, "errors": [],
+     "bound": 12, "propositions": ["A"], "capabilities": ["IR"],
+     "resources": [], "stl_size": {"variables": 38, "constraints": 108,
+                                   "nonzeros": 274, "signals": 13,
+                                   "variable_signals": {"A_IR": 13}}}
+
+ Syntax errors are reported with their line and column in the formula.
+'''
+
+import os
+import sys
+import json
+import logging
+import argparse
+import multiprocessing as mp
+
+from lomap import Ts
+
+from catl import CATLFormula, CATLSyntaxError
+from catl import catl2stl, stl_encoding_size
+from compact_ts import CompactTs
+
+
+# per worker process state
+_ts_propositions = None
+
+
+def _init_worker(ts_path):
+    '''Initializes the state of a worker process.'''
+    global _ts_propositions
+    if ts_path is not None:
+        _ts_propositions = set(load_ts(ts_path).propositions.tolist())
+
+def load_ts(path):
+    '''Loads the transition system from a compact transition system directory,
+    or from a `lomap` YAML file.
+    '''
+    if os.path.isdir(path):
+        return CompactTs.load(path)
+    return CompactTs.from_ts(Ts.load(path))
+
+def read_specifications(lines):
+    '''Iterates over the pairs (line number, line) of the non-empty lines.'''
+    for number, line in enumerate(lines, 1):
+        if line.strip():
+            yield number, line
+
+def validate(item):
+    '''Validates the specification on the given line of the input file, and
+    returns its report.
+    '''
+    number, line = item
+    report = {'id': None, 'line': number, 'valid': False, 'errors': []}
+    try:
+        specification = json.loads(line)
+        if not isinstance(specification, dict):
+            specification = {'formula': specification}
+        report['id'] = specification.get('id', number)
+        formula = specification['formula']
+    except (ValueError, KeyError, TypeError) as error:
+        report['errors'].append({'type': 'input', 'message': str(error)})
+        return report
+
+    try:
+        ast = CATLFormula.from_formula(formula, strict=True)
+    except CATLSyntaxError as error:
+        report['errors'].append({'type': 'syntax', 'line': error.line,
+                                 'column': error.column,
+                                 'message': error.message})
+        return report
+    except Exception as error:
+        report['errors'].append({'type': 'syntax', 'message': str(error)})
+        return report
+
+    propositions = set(ast.propositions())
+    report['bound'] = ast.bound()
+    report['propositions'] = sorted(propositions)
+    report['capabilities'] = sorted(ast.capabilities())
+    report['resources'] = sorted(ast.resources())
+    if _ts_propositions is not None:
+        unknown = propositions - _ts_propositions
+        if unknown:
+            report['errors'].append({'type': 'propositions',
+                                     'message': 'Unknown propositions!',
+                                     'unknown': sorted(unknown)})
+    try:
+        report['stl_size'] = stl_encoding_size(catl2stl(ast))
+    except Exception as error:
+        report['errors'].append({'type': 'translation',
+                                 'message': str(error)})
+    report['valid'] = not report['errors']
+    return report
+
+def validate_specifications(fin, fout, ts_path=None, processes=None,
+                            chunksize=16, ordered=False):
+    '''Validates the specifications read from the input stream in a pool of
+    worker processes, and writes the reports to the output stream as they
+    become available.
+
+    Input
+    -----
+    - The input stream with one specification per line.
+    - The output stream of the JSONL reports.
+    - The path of the transition system (default: the propositions are not
+    checked).
+    - The number of worker processes (default: the number of CPUs).
+    - The number of specifications sent to a worker at once.
+    - Flag indicating whether to write the reports in the input order.
+
+    Output
+    ------
+    Pair of the numbers of specifications and of invalid specifications.
+    '''
+    pool = mp.Pool(processes, initializer=_init_worker, initargs=(ts_path,))
+    try:
+        imap = pool.imap if ordered else pool.imap_unordered
+        total, invalid = 0, 0
+        for report in imap(validate, read_specifications(fin), chunksize):
+            fout.write(json.dumps(report) + '\n')
+            fout.flush()
+            total += 1
+            invalid += not report['valid']
+        pool.close()
+    finally:
+        pool.terminate()
+        pool.join()
+    return total, invalid
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Bulk validation of CaTL '
+                                     'specifications')
+    parser.add_argument('input', help='JSONL file of specifications, or - for '
+                        'the standard input')
+    parser.add_argument('-o', '--output', default=None,
+                        help='JSONL file of reports (default: standard output)')
+    parser.add_argument('--ts', default=None, help='transition system given '
+                        'as a YAML file or a compact transition system '
+                        'directory')
+    parser.add_argument('--workers', type=int, default=None,
+                        help='number of worker processes')
+    parser.add_argument('--chunksize', type=int, default=16,
+                        help='number of specifications sent to a worker at '
+                        'once')
+    parser.add_argument('--ordered', action='store_true',
+                        help='write the reports in the input order')
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    fin = sys.stdin if args.input == '-' else open(args.input, 'r')
+    fout = sys.stdout if args.output is None else open(args.output, 'w')
+    try:
+        total, invalid = validate_specifications(fin, fout, args.ts,
+                                                 args.workers, args.chunksize,
+                                                 args.ordered)
+    finally:
+        if fin is not sys.stdin:
+            fin.close()
+        if fout is not sys.stdout:
+            fout.close()
+    logging.info('Validated %d specifications, %d invalid', total, invalid)
+    return 1 if invalid else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
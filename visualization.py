@@ -6,12 +6,17 @@
  See license.txt file for license information.
 '''
 
-import itertools as it
+import subprocess
 
 import numpy as np
 import shapely.geometry as geom
+import matplotlib
 import matplotlib.pyplot as plt
-from matplotlib.collections import LineCollection
+from matplotlib.collections import LineCollection, PolyCollection
+from matplotlib.colors import to_rgba
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.image import imsave
 
 
 def drawPoint(viewport, point, color, style=None):
@@ -56,28 +61,72 @@ def drawGraph(viewport, g, node_color='blue', edge_color='black', zorder=2):
     viewport.add_collection(artist)
 
 def drawPolicy(viewport, solution, color='black', alpha_min=1.0, zorder=2):
-    '''Draws the solution path with a fading effect.'''
-    if alpha_min == 1.0:
-        transparency = it.repeat(1.0)
-    else:
-        transparency = np.linspace(alpha_min, 1.0, len(solution)-1)
+    '''Draws the solution path with a fading effect. The arrows are drawn
+    with a single quiver call.
+    '''
+    if len(solution) < 2:
+        return
+    x, y = np.array([(p.x, p.y) for p in solution], dtype=np.float64).T
+    colors = np.tile(to_rgba(color), (len(solution)-1, 1))
+    colors[:, 3] = np.linspace(alpha_min, 1.0, len(solution)-1)
+    viewport.quiver(x[:-1], y[:-1], np.diff(x), np.diff(y), color=colors,
+                    angles='xy', scale_units='xy', scale=1, width=0.005,
+                    zorder=zorder)
 
-    for u, v, a in it.izip(solution, solution[1:], transparency):
-        dx, dy = v.x - u.x, v.y - u.y
-        plt.arrow(u.x, u.y, dx, dy, hold=True, color=color, alpha=a,
-                  length_includes_head=True, head_width=0.08, zorder=zorder)
+def polygon_centroid(shape):
+    '''Returns the centroid of the simple polygon given by its vertices.'''
+    x, y = np.asarray(shape, dtype=np.float64).T
+    xn, yn = np.roll(x, -1), np.roll(y, -1)
+    cross = x * yn - xn * y
+    area = cross.sum() / 2
+    if area == 0:
+        return x.mean(), y.mean()
+    return (((x + xn) * cross).sum() / (6 * area),
+            ((y + yn) * cross).sum() / (6 * area))
 
-def show_environment(ts, save=None, figsize=None):
-    '''Draws the environment and optionally save it to a file.'''
-    fig = plt.figure(figsize=figsize)
-    viewport = fig.add_subplot(111, aspect='equal')
+def drawMap(viewport, ts, labels=True, zorder=1):
+    '''Draws the regions of the environment as a single polygon collection.
+    The positions of the nodes that do not have one are set below the
+    centroids of their regions.
+
+    Input
+    -----
+    - The viewport.
+    - The transition system with the shapes and colors of the regions stored
+    as the `shape` and `color` node attributes.
+    - Flag indicating whether to label the regions with the node names.
+    - The order of the layer.
 
-    for u, d in ts.g.nodes(data=True):
-        center = drawRegion(viewport, shape=d['shape'],
-                            style={'facecolor': d['color']}, text=u)
+    Output
+    ------
+    The polygon collection artist.
+    '''
+    nodes = list(ts.g.nodes(data=True))
+    shapes = [d['shape'] for _, d in nodes]
+    colors = [d.get('color', 'white') for _, d in nodes]
+    artist = PolyCollection(shapes, facecolors=colors, edgecolors='black',
+                            zorder=zorder)
+    viewport.add_collection(artist)
+
+    for (u, d), shape in zip(nodes, shapes):
+        center = polygon_centroid(shape)
         if 'position' not in d:
             d['position'] = (center[0], center[1] - 0.5)
+        if labels:
+            viewport.text(center[0], center[1], u, fontsize=12,
+                          horizontalalignment='center',
+                          verticalalignment='center', zorder=zorder)
+    viewport.autoscale_view()
+    return artist
 
+def show_environment(ts, save=None, figsize=None, show=True, labels=True):
+    '''Draws the environment and optionally save it to a file. The figure is
+    shown if `show` is set.
+    '''
+    fig = plt.figure(figsize=figsize)
+    viewport = fig.add_subplot(111, aspect='equal')
+
+    drawMap(viewport, ts, labels=labels)
     drawGraph(viewport, ts.g)
 
     if save is not None:
@@ -85,4 +134,149 @@ def show_environment(ts, save=None, figsize=None):
                             wspace=0, hspace=0)
         plt.savefig(save, dpi=fig.dpi)
 
-    plt.show()
+    if show:
+        plt.show()
+    else:
+        plt.close(fig)
+
+
+class PlanRenderer(object):
+    '''Headless renderer of plans given as team-state and transition flow
+    tensors, see `PlanSolution`. The map and the transition graph are drawn
+    once and cached, and each frame only redraws the agents on top of the
+    cached background.
+
+    At each time step, the agents at the states are drawn as disks at the
+    node positions with areas proportional to their numbers, and the agents
+    traversing transitions are drawn along the transitions at positions
+    interpolated between the positions of the source and target nodes.
+    '''
+
+    def __init__(self, ts, solution, figsize=None, dpi=100, labels=True,
+                 agent_color='black', agent_size=30):
+        '''Constructor
+
+        Input
+        -----
+        - The transition system with the shapes and colors of the regions, see
+        `drawMap`.
+        - The solution with the team state and transition flows.
+        - The size of the figure in inches, and the resolution.
+        - Flag indicating whether to label the regions with the node names.
+        - The color of the agents, and the marker area of a single agent.
+        '''
+        self.fig = Figure(figsize=figsize, dpi=dpi)
+        self.canvas = FigureCanvasAgg(self.fig)
+        viewport = self.fig.add_subplot(111, aspect='equal')
+        self.fig.subplots_adjust(left=0.05, bottom=0.05, right=0.98, top=0.95)
+        self.viewport = viewport
+        self.agent_size = agent_size
+
+        drawMap(viewport, ts, labels=labels)
+        drawGraph(viewport, ts.g)
+        states = solution.states.tolist()
+        self.positions = np.array([ts.g.node[u]['position'] for u in states],
+                                  dtype=np.float64)
+
+        # totals over agent classes
+        self.team_state = solution.team_state.sum(axis=1)
+        flows = solution.flows.sum(axis=1)
+        moves = solution.sources != solution.targets
+        edges, self.departures = np.nonzero(flows * moves[:, np.newaxis])
+        self.counts = flows[edges, self.departures]
+        self.durations = solution.weights[edges]
+        self.sources = self.positions[solution.sources[edges]]
+        self.targets = self.positions[solution.targets[edges]]
+
+        self.agents = viewport.scatter([], [], c=agent_color, zorder=4,
+                                       animated=True)
+        self.moving = viewport.scatter([], [], c=agent_color, marker='s',
+                                       zorder=4, animated=True)
+        self.transit = LineCollection([], colors=agent_color, zorder=3,
+                                      animated=True)
+        viewport.add_collection(self.transit, autolim=False)
+        self.title = viewport.set_title('', animated=True)
+
+        self.canvas.draw()
+        self.background = self.canvas.copy_from_bbox(self.fig.bbox)
+
+    @property
+    def num_frames(self):
+        return self.team_state.shape[1]
+
+    def render(self, k):
+        '''Renders the frame of time step `k`, and returns it as an RGBA array
+        of shape (height, width, 4). The array is a copy of the canvas buffer,
+        i.e., it is not overwritten by the next frame.
+        '''
+        counts = self.team_state[:, k]
+        present = np.flatnonzero(counts)
+        self.agents.set_offsets(self.positions[present].reshape(-1, 2))
+        self.agents.set_sizes(self.agent_size * counts[present])
+
+        active = (self.departures < k) & (k < self.departures + self.durations)
+        fraction = ((k - self.departures[active])
+                    / self.durations[active].astype(np.float64))[:, np.newaxis]
+        sources, targets = self.sources[active], self.targets[active]
+        self.moving.set_offsets(sources + fraction * (targets - sources))
+        self.moving.set_sizes(self.agent_size * self.counts[active])
+        self.transit.set_segments(np.stack([sources, targets], axis=1))
+        self.transit.set_linewidths(self.counts[active])
+        self.title.set_text('Time {}'.format(k))
+
+        self.canvas.restore_region(self.background)
+        for artist in (self.transit, self.agents, self.moving, self.title):
+            self.viewport.draw_artist(artist)
+        self.canvas.blit(self.fig.bbox)
+        return np.asarray(self.canvas.buffer_rgba()).copy()
+
+    def frames(self):
+        '''Iterates over the rendered frames of all time steps.'''
+        for k in range(self.num_frames):
+            yield self.render(k)
+
+
+def save_animation(ts, solution, filename, fps=4, **kwargs):
+    '''Renders the plan frame by frame, and streams the frames to a video file
+    encoded by `ffmpeg`, or to a sequence of images.
+
+    Input
+    -----
+    - The transition system and the solution, see `PlanRenderer`.
+    - The name of the video file, or a format string with a placeholder for
+    the frame index for image sequences, e.g., `frames/frame_{:04d}.png`.
+    - The number of frames per second of the video.
+    - Other keyword arguments are passed to `PlanRenderer`.
+
+    Output
+    ------
+    The number of frames.
+
+    Note
+    ----
+    The video is encoded by the `ffmpeg` executable given by the
+    `animation.ffmpeg_path` configuration parameter of `matplotlib`.
+    '''
+    renderer = PlanRenderer(ts, solution, **kwargs)
+    if '{' in filename: # image sequence
+        for k, frame in enumerate(renderer.frames()):
+            imsave(filename.format(k), frame)
+        return renderer.num_frames
+
+    width, height = renderer.canvas.get_width_height()
+    command = [matplotlib.rcParams['animation.ffmpeg_path'], '-y',
+               '-loglevel', 'error', '-f', 'rawvideo', '-pix_fmt', 'rgba',
+               '-s', '{}x{}'.format(width, height), '-r', str(fps), '-i', '-',
+               '-vf', 'pad=ceil(iw/2)*2:ceil(ih/2)*2', '-pix_fmt', 'yuv420p',
+               filename]
+    process = subprocess.Popen(command, stdin=subprocess.PIPE)
+    try:
+        for frame in renderer.frames():
+            process.stdin.write(frame.tobytes())
+    finally:
+        process.stdin.close()
+        process.wait()
+    if process.returncode != 0:
+        raise RuntimeError('Video encoding failed with exit code {}!'
+                           .format(process.returncode))
+    return renderer.num_frames